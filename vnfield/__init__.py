@@ -22,3 +22,4 @@
 from . import models
 from . import wizards
 from . import controllers
+from . import cli
@@ -13,7 +13,7 @@
 #############################################################################
 {
     "name": "VN Field Contractor System (CS)",
-    "version": "17.0.2.0.2",
+    "version": "17.0.2.0.3",
     "category": "Project Management",
     "summary": "Multi-site contractor management với Integration System sync",
     "description": """
@@ -49,7 +49,15 @@
         'features/shared/security/ir.model.access.csv',
         'features/shared/security/sync_request_security.xml',
         'features/shared/views/sync_request_views.xml',
+        'features/shared/views/kafka_outbox_views.xml',
+        'features/shared/views/kafka_retry_views.xml',
+        'features/shared/views/sync_request_archive_views.xml',
+        'features/shared/views/kafka_pending_reply_views.xml',
         'features/shared/views/sync_request_menus.xml',
+        'features/shared/data/kafka_outbox_cron.xml',
+        'features/shared/data/kafka_retry_cron.xml',
+        'features/shared/data/sync_request_retention_cron.xml',
+        'features/shared/data/kafka_pending_reply_cron.xml',
         'features/setting/security/ir.model.access.csv',
         'features/setting/views/vnfield_setting_menus.xml',
         'features/setting/wizards/kafka_config_wizard_views.xml',
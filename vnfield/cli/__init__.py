@@ -0,0 +1,10 @@
+# -*- coding: utf-8 -*-
+
+# ═══════════════════════════════════════════════════════════
+# ═            🖥️ VNFIELD ODOO-BIN COMMANDS                  ═
+# ═══════════════════════════════════════════════════════════
+
+# 💡 NOTE(assistant): odoo-bin import các addon có thư mục `cli/` để tìm subcommand
+
+from . import kafka_consumer
+from . import kafka_bench
@@ -0,0 +1,94 @@
+# -*- coding: utf-8 -*-
+
+# ===========================================
+# =    🖥️ ODOO-BIN: VNFIELD KAFKA BENCHMARK   =
+# ===========================================
+
+"""
+Đo throughput pipeline sync Kafka trên broker giả lập in-memory:
+
+    odoo-bin vnfield-kafka-bench -c odoo.conf -d <database> -- \\
+        --messages 5000 --rate 0 --payload-size 512 --batch-size 200
+
+Mọi dữ liệu và cấu hình benchmark bị rollback khi kết thúc. Exit code 1
+nếu có message không được xử lý, hoặc throughput tổng thấp hơn --min-throughput.
+"""
+
+import argparse
+import json
+import logging
+import sys
+from pathlib import Path
+
+from odoo import api, SUPERUSER_ID
+from odoo.cli import Command
+from odoo.modules.registry import Registry
+from odoo.tools import config
+
+from ..features.shared.utils import kafka_benchmark
+
+_logger = logging.getLogger(__name__)
+
+
+class VnfieldKafkaBench(Command):
+    """Benchmark the VN Field Kafka sync pipeline with an in-memory broker"""
+
+    name = 'vnfield-kafka-bench'
+
+    def _parse_bench_args(self, args):
+        parser = argparse.ArgumentParser(prog=f'{Path(sys.argv[0]).name} {self.name} [odoo options] --')
+        parser.add_argument('--messages', type=int, default=1000, help='Total number of messages')
+        parser.add_argument('--rate', type=float, default=0, help='Producer rate in msg/s (0 = unlimited)')
+        parser.add_argument('--payload-size', type=int, default=256, help='Padding bytes per message')
+        parser.add_argument('--batch-size', type=int, default=100, help='Messages per consume batch')
+        parser.add_argument('--actions', default=','.join(kafka_benchmark.ACTIONS),
+                            help='Comma-separated actions to generate')
+        parser.add_argument('--no-approve', action='store_true', help='Skip the action_approve stage')
+        parser.add_argument('--min-throughput', type=float, default=0,
+                            help='Fail when total msg/s is below this value')
+        parser.add_argument('--json', action='store_true', help='Print the report as JSON')
+        return parser.parse_args(args)
+
+    def run(self, args):
+        # 💡 NOTE(assistant): Option của benchmark đứng sau '--', phần trước là option của odoo-bin
+        odoo_args, bench_args = args, []
+        if '--' in args:
+            index = args.index('--')
+            odoo_args, bench_args = args[:index], args[index + 1:]
+        options = self._parse_bench_args(bench_args)
+
+        config.parser.prog = f'{Path(sys.argv[0]).name} {self.name}'
+        config.parse_config(odoo_args, setup_logging=True)
+
+        dbnames = [db for db in (config['db_name'] or '').split(',') if db]
+        if len(dbnames) != 1:
+            sys.exit('Please specify exactly one database with -d/--database')
+
+        actions = [action for action in options.actions.split(',') if action]
+        unknown = set(actions) - set(kafka_benchmark.ACTIONS)
+        if unknown:
+            sys.exit(f'Unknown actions: {", ".join(sorted(unknown))}')
+
+        registry = Registry(dbnames[0])
+        with registry.cursor() as cr:
+            env = api.Environment(cr, SUPERUSER_ID, {})
+            report = kafka_benchmark.KafkaBenchmark(
+                env,
+                messages=options.messages,
+                rate=options.rate,
+                payload_size=options.payload_size,
+                actions=actions,
+                batch_size=options.batch_size,
+                approve=not options.no_approve,
+            ).run()
+
+        print(json.dumps(report, indent=2) if options.json else kafka_benchmark.format_report(report))
+
+        if report['lost']:
+            sys.exit(1)
+        if options.min_throughput and report['total']['throughput'] < options.min_throughput:
+            _logger.error(
+                f"Throughput {report['total']['throughput']:.1f} msg/s is below "
+                f"--min-throughput {options.min_throughput}"
+            )
+            sys.exit(1)
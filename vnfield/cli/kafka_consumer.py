@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+
+# ===========================================
+# =   🖥️ ODOO-BIN: VNFIELD KAFKA CONSUMER    =
+# ===========================================
+
+"""
+Chạy persistent Kafka consumer như một process riêng:
+
+    odoo-bin vnfield-kafka-consumer -c odoo.conf -d <database> [--instance-id <id>]
+
+Mỗi process cần một instance id riêng (group.instance.id của static
+membership): chạy nhiều process trên cùng host thì truyền --instance-id
+khác nhau. Runner không khởi động nếu instance id đang được process khác dùng.
+
+Process giữ consumer subscribe liên tục (static membership), ghi heartbeat
+vào vnfield.kafka.consumer.status và dừng khi nhận SIGINT/SIGTERM hoặc khi
+Kafka Consumer Manager tắt runner (vnfield.kafka.consumer_runner_enabled).
+"""
+
+import argparse
+import logging
+import signal
+import sys
+from pathlib import Path
+
+from odoo import api, SUPERUSER_ID
+from odoo.cli import Command
+from odoo.modules.registry import Registry
+from odoo.tools import config
+
+from ..features.shared.utils import kafka_consumer_runner
+
+_logger = logging.getLogger(__name__)
+
+
+class VnfieldKafkaConsumer(Command):
+    """Run the VN Field persistent Kafka consumer"""
+
+    name = 'vnfield-kafka-consumer'
+
+    def run(self, args):
+        config.parser.prog = f'{Path(sys.argv[0]).name} {self.name}'
+        parser = argparse.ArgumentParser(add_help=False)
+        parser.add_argument('--instance-id', dest='instance_id', default=None,
+                            help='group.instance.id of this process (unique per running consumer)')
+        options, args = parser.parse_known_args(args)
+        config.parse_config(args, setup_logging=True)
+
+        dbnames = [db for db in (config['db_name'] or '').split(',') if db]
+        if len(dbnames) != 1:
+            sys.exit('Please specify exactly one database with -d/--database')
+        dbname = dbnames[0]
+
+        # ▶️ Khởi động từ command line = bật runner (và tắt cron consumer) cho database này
+        registry = Registry(dbname)
+        with registry.cursor() as cr:
+            env = api.Environment(cr, SUPERUSER_ID, {})
+            kafka_consumer_runner.enable_runner(env)
+
+        runner = kafka_consumer_runner.KafkaConsumerRunner(dbname, mode='command', instance_id=options.instance_id)
+
+        def handle_signal(signum, frame):
+            _logger.info(f'Received signal {signum}, stopping Kafka consumer runner...')
+            runner.stop()
+
+        signal.signal(signal.SIGINT, handle_signal)
+        signal.signal(signal.SIGTERM, handle_signal)
+
+        runner.run()
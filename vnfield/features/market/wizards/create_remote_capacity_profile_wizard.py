@@ -335,10 +335,9 @@ class CreateRemoteCapacityProfileWizard(models.TransientModel):
                 }
             }
             
-            # Gửi messages
-            pubsub_service = self.env['vnfield.pubsub.service'].create({})
-            pubsub_service.produce_message(topic, requirement_message)
-            pubsub_service.produce_message(topic, capacity_message)
+            # 📮 Ghi cả hai messages vào outbox một lần; sau commit thread sender publish chung một flush
+            # (cron drain chỉ là lưới an toàn nếu thread chưa gửi được)
+            self.env['vnfield.kafka.outbox'].enqueue_many(topic, [requirement_message, capacity_message])
             
         except Exception as e:
             _logger.error(f"Error sending cross match messages: {e}")
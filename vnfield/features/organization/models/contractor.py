@@ -22,6 +22,11 @@ class Contractor(models.Model):
     name = fields.Char(string='Contractor Name', required=True)
     description = fields.Text(string='Description', help='Mô tả chi tiết về nhà thầu')
     external_id = fields.Char(string='External ID', help='ID trên hệ tích hợp nếu đã đăng ký')
+    is_default_contractor = fields.Boolean(
+        string='Default Contractor',
+        default=False,
+        help='Contractor đại diện cho site này (external_id dùng cho consumer group / client id Kafka)'
+    )
     contractor_type = fields.Selection([
         ('internal', 'Internal - Nội bộ'),
         ('external', 'External - Bên ngoài'), 
@@ -125,7 +130,53 @@ class Contractor(models.Model):
         ✏️ OVERRIDE WRITE: Log lại vals khi ghi dữ liệu vào contractor (debug)
         """
         print(f"[Contractor.write] vals: {vals}")
-        return super().write(vals)
+        if vals.get('is_default_contractor'):
+            if len(self) > 1:
+                raise ValidationError(_(
+                    "❌ Only One Default Contractor!\n"
+                    "Set the default contractor on a single record."
+                ))
+            self._unset_other_default_contractors()
+        result = super().write(vals)
+        if self._SITE_IDENTITY_FIELDS.intersection(vals):
+            self._invalidate_site_identity()
+        return result
+
+    # ─── ▶ Site identity (KafkaUtil) ───
+
+    # 💡 NOTE(assistant): Các field ảnh hưởng tới danh tính Kafka của site
+    _SITE_IDENTITY_FIELDS = {'is_default_contractor', 'external_id'}
+
+    def _unset_other_default_contractors(self):
+        """🏢 Chỉ giữ một default contractor cho mỗi site"""
+        others = self.sudo().search([
+            ('is_default_contractor', '=', True),
+            ('id', 'not in', self.ids),
+        ])
+        if others:
+            super(Contractor, others).write({'is_default_contractor': False})
+
+    @api.constrains('is_default_contractor')
+    def _check_single_default_contractor(self):
+        """🏢 Site chỉ có một default contractor (KafkaUtil đọc danh tính từ record này)"""
+        if not any(self.mapped('is_default_contractor')):
+            return
+        if self.sudo().search_count([('is_default_contractor', '=', True)]) > 1:
+            raise ValidationError(_(
+                "❌ Only One Default Contractor!\n"
+                "Another contractor is already the default contractor of this site."
+            ))
+
+    def _invalidate_site_identity(self):
+        """🧹 Xoá cache site identity của vnfield.kafka.util (mọi worker)"""
+        self.env.registry.clear_cache()
+
+    def unlink(self):
+        had_default = any(self.mapped('is_default_contractor'))
+        result = super().unlink()
+        if had_default:
+            self._invalidate_site_identity()
+        return result
     
     @api.depends('director_id')
     def _compute_director_id_readonly(self):
@@ -142,7 +193,12 @@ class Contractor(models.Model):
         print(vals)
         if 'director_id' not in vals or not vals['director_id']:
             vals['director_id'] = self.env.uid
-        return super().create(vals)
+        if vals.get('is_default_contractor'):
+            self._unset_other_default_contractors()
+        record = super().create(vals)
+        if vals.get('is_default_contractor'):
+            self._invalidate_site_identity()
+        return record
 
     @api.depends('director_id')
     def _compute_project_director_ids_readonly(self):
@@ -2,6 +2,8 @@
 from odoo import models, fields, api, _
 from odoo.exceptions import AccessError
 
+from ...shared.utils import kafka_dispatch
+
 # ===========================================
 # =      👤 EXTEND RES.USERS MODEL           =
 # ===========================================
@@ -260,7 +262,11 @@ class ResUsers(models.Model):
         
         Logic:
         - Kiểm tra user là external/shared và chưa được đăng ký
-        - Produce message đến pubsub service để gửi thông tin user tới external system
+        - Ghi message vào Kafka outbox (cùng transaction) để gửi thông tin user tới external system,
+          chờ reply register_user_map cùng correlation_id (vnfield.kafka.pending.reply)
+        - Hợp đồng reply: external system phải chép 'correlation_id' của message register_user
+          vào payload register_user_map. Nếu không, external_id vẫn được cập nhật nhưng request
+          không được nối và sẽ hết hạn ở trạng thái 'uncorrelated' (không tính là expired)
         - Hiển thị notification thành công/thất bại
         
         Returns:
@@ -323,28 +329,20 @@ class ResUsers(models.Model):
                 # Get topic từ config
                 topic = config_param.get_param('vnfield.kafka.topic', 'vnfield')
                 
-                # Produce message
-                pubsub_service = self.env['vnfield.pubsub.service'].create({})
-                result = pubsub_service.produce_message(topic, message_data)
+                # 📮 Ghi vào outbox trong cùng transaction (kèm correlation_id),
+                # reply register_user_map được nối lại để đo round-trip
+                self.env['vnfield.kafka.pending.reply'].enqueue_request(
+                    topic, message_data, 'register_user_map'
+                )
                 
-                if result and result.get('success'):
-                    return {
-                        'type': 'ir.actions.client',
-                        'tag': 'display_notification',
-                        'params': {
-                            'message': f'Registration request for {record.name} sent successfully to external system!',
-                            'type': 'success',
-                        }
-                    }
-                else:
-                    return {
-                        'type': 'ir.actions.client',
-                        'tag': 'display_notification',
-                        'params': {
-                            'message': f'Failed to send registration request: {result.get("error", "Unknown error") if result else "Service unavailable"}',
-                            'type': 'error',
-                        }
+                return {
+                    'type': 'ir.actions.client',
+                    'tag': 'display_notification',
+                    'params': {
+                        'message': f'Registration request for {record.name} queued for the external system!',
+                        'type': 'success',
                     }
+                }
                     
             except Exception as e:
                 return {
@@ -356,100 +354,33 @@ class ResUsers(models.Model):
                     }
                 }
 
+    # ─────────────────────────────────────────────
+    # ▶ KAFKA ACTION HANDLERS
+    # ─────────────────────────────────────────────
+
     @api.model
-    def consume(self):
-        """
-        Consume message from pubsub_service, xử lý qua message_handler callback.
+    def _kafka_apply_register_user_map(self, sync_request, vals, extra):
         """
-        config_param = self.env['ir.config_parameter'].sudo()
-        topic = config_param.get_param('vnfield.kafka.topic', 'vnfield')
-        system_name = config_param.get_param('vnfield.system_name', 'Unknown System')
+        📨 register_user_map: external system trả về external_id của user đã đăng ký
         
-        pubsub_service = self.env['vnfield.pubsub.service'].create({})
-        print(f"DEBUG: Consuming messages from topic: {topic} with group_id: {system_name}")
+        Message được ingest bởi consumer chung (vnfield.sync.request) và áp
+        dụng ngay (auto_approve) qua kafka_dispatch.
         
-        # Truyền message_handler làm callback cho consume_message
-        return pubsub_service.consume_messages(topic, group_id=system_name, timeout=30, message_handler=self.message_handler)
-
-    def message_handler(self, headers, value):
-        """
-        Xử lý message: lọc message theo destination, chia nhánh action name để gọi handler_* với handle_type='consume'.
-        Chỉ xử lý message có destination trùng với system_name hiện tại.
+        Returns:
+            str: Ghi chú kết quả cho description của sync_request
         """
-        # 🔍 FILTER: Chỉ xử lý message có destination là system này
-        config_param = self.env['ir.config_parameter'].sudo()
-        current_system_name = config_param.get_param('vnfield.system_name', 'Unknown System')
-        message_destination = value.get('destination')
+        external_id = vals.get('external_id')
+        user_id = vals.get('user_id')
         
-        # Bỏ qua message không có destination
-        if not message_destination:
-            return {
-                'result': 'message_ignored', 
-                'reason': 'No destination specified in message'
-            }
-        
-        # Bỏ qua message không dành cho system này
-        if message_destination != current_system_name:
-            return {
-                'result': 'message_ignored',
-                'reason': 'Message not for this system',
-                'current_system': current_system_name,
-                'message_destination': message_destination
-            }
+        if external_id and user_id:
+            # Tìm user và cập nhật external_id
+            user = self.sudo().browse(user_id)
+            if user.exists():
+                user.write({'external_id': external_id})
+                return f"🎉 RESULT: Updated external_id for user {user.name}"
         
-        action_name = value.get('action')
-        vals = value.get('vals', {})
-        extra = value.get('extra', {})
-        
-        # 📨 XỬ LÝ THEO ACTION NAME
-        if action_name == 'register_user_map':
-            # Xử lý response từ external system về việc đăng ký user
-            external_id = vals.get('external_id')
-            user_id = vals.get('user_id')
-            
-            if external_id and user_id:
-                # Tìm user và cập nhật external_id
-                user = self.env['res.users'].sudo().browse(user_id)
-                if user.exists():
-                    user.write({'external_id': external_id})
-                    return {
-                        'result': 'success',
-                        'action': 'register_user_map',
-                        'message': f'Updated external_id for user {user.name}'
-                    }
-            
-            return {
-                'result': 'error',
-                'action': 'register_user_map',
-                'message': 'Missing external_id or user_id in message'
-            }
-        
-        elif action_name == 'create_user':
-            # Tạo sync_request record với JSON content từ message
-            try:
-                sync_request = self.env['vnfield.sync.request'].sudo().create({
-                    'activity_name': f"Create User Request - {vals.get('name', 'Unknown')}",
-                    'description': f"Message content: {str(value)}",  # Lưu toàn bộ message content trong description
-                    'sync_type': 'import',  # Sử dụng 'import' thay vì 'user_sync'
-                    'priority': 'normal',   # Sử dụng 'normal' thay vì 'medium'
-                })
-                
-                return {
-                    'result': 'success',
-                    'action': 'create_user',
-                    'message': f'Created sync_request record with ID: {sync_request.id}',
-                    'sync_request_id': sync_request.id
-                }
-                
-            except Exception as e:
-                return {
-                    'result': 'error',
-                    'action': 'create_user',
-                    'message': f'Failed to create sync_request: {str(e)}'
-                }
-        
-        else:
-            return {
-                'result': 'error',
-                'reason': f'Unknown action: {action_name}'
-            }
\ No newline at end of file
+        return f"{kafka_dispatch.ERROR_PREFIX}Missing external_id or user_id in message"
+
+
+# 🧭 Handler cho message Kafka (xem shared/utils/kafka_dispatch.py)
+kafka_dispatch.register('register_user_map', 'res.users', '_kafka_apply_register_user_map', auto_approve=True)
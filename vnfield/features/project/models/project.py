@@ -3,6 +3,10 @@ import logging
 from odoo import models, fields, api, _
 from odoo.exceptions import ValidationError
 
+from ...shared.utils import kafka_dispatch
+
+_logger = logging.getLogger(__name__)
+
 # ===========================================
 # =         🚀 PROJECT MODEL                =
 # ===========================================
@@ -299,6 +303,15 @@ class Project(models.Model):
         Returns:
             str: Generated project code in format PRJ-YYYY-####
         """
+        return self._generate_project_codes(1)[0]
+
+    def _generate_project_codes(self, count):
+        """
+        🔢 HELPER: Generate `count` project code liên tiếp bằng một lần đọc
+        
+        Returns:
+            list: Codes format PRJ-YYYY-####
+        """
         # 📅 Get current year
         current_year = fields.Date.today().year
         
@@ -321,8 +334,8 @@ class Project(models.Model):
         # 📈 Get next sequence number
         next_number = max(sequence_numbers, default=0) + 1
         
-        # 🏷️ Generate new code
-        return f'PRJ-{current_year}-{next_number:04d}'
+        # 🏷️ Generate new codes
+        return [f'PRJ-{current_year}-{number:04d}' for number in range(next_number, next_number + count)]
 
     # ─────────────────────────────────────────────
     # ▶ ACTION METHODS
@@ -441,19 +454,73 @@ class Project(models.Model):
             'context': {'default_project_id': self.id}
         }
 
+    # ─────────────────────────────────────────────
+    # ▶ KAFKA ACTION HANDLERS
+    # ─────────────────────────────────────────────
+
+    @api.model
+    def _kafka_apply_match_capacity_profile(self, sync_requests):
+        """
+        🏗️ match_capacity_profile: tạo project outsource khi sync_request được duyệt
+        
+        Batch handler: mọi project của các sync_request được tạo bằng một
+        lần create([...]).
+        
+        Args:
+            sync_requests (vnfield.sync.request): Các request đang được duyệt
+        
+        Returns:
+            dict: {sync_request.id: ghi chú kết quả cho description}
+        """
+        notes = {}
+        vals_list = []
+        sources = []
+        for sync_request in sync_requests:
+            vals = sync_request._load_message_payload().get('vals', {})
+            requirement_id = vals.get('requirement_id')
+            capacity_profile_id = vals.get('capacity_profile_id')
+            requirement_title = vals.get('requirement_title', f'Requirement {requirement_id}')
+            
+            if not (requirement_id and capacity_profile_id):
+                _logger.warning(f"⚠️ Missing requirement_id or capacity_profile_id in sync_request ID: {sync_request.id}")
+                notes[sync_request.id] = f"{kafka_dispatch.ERROR_PREFIX}Missing requirement_id or capacity_profile_id"
+                continue
+            
+            # Project mới (không cần kiểm tra requirement vì là remote)
+            vals_list.append({
+                'name': f"Project for {requirement_title}",
+                'source_task_id': vals.get('task_id'),  # Lưu task_id từ message
+                'is_outsourced': True,  # Đánh dấu là project outsource
+                'description': f"Project created from capacity profile match\nRequirement: {requirement_title}\nRemote Requirement ID: {requirement_id}\nCapacity Profile ID: {capacity_profile_id}\nCreated by sync request: {sync_request.activity_name}",
+            })
+            sources.append(sync_request)
+        
+        projects = self.sudo().create(vals_list)
+        for sync_request, project in zip(sources, projects):
+            notes[sync_request.id] = f"🎉 RESULT: Created project '{project.name}' (ID: {project.id})"
+        if projects:
+            _logger.info(f"✅ Created {len(projects)} projects from {len(sync_requests)} sync_requests")
+        return notes
+
     # ─────────────────────────────────────────────
     # ▶ OVERRIDE METHODS
     # ─────────────────────────────────────────────
     
-    @api.model
-    def create(self, vals):
-        # Tự động generate code nếu chưa có
-        if not vals.get('code'):
-            vals['code'] = self._generate_project_code()
+    @api.model_create_multi
+    def create(self, vals_list):
+        # Tự động generate code nếu chưa có (một lần đọc cho cả batch)
+        missing_code = [vals for vals in vals_list if not vals.get('code')]
+        for vals, code in zip(missing_code, self._generate_project_codes(len(missing_code))):
+            vals['code'] = code
         
         # Nếu chưa gán owner_contractor_id thì lấy contractor của user tạo
-        if not vals.get('owner_contractor_id'):
-            contractor = getattr(self.env.user, 'contractor_id', False)
-            if contractor:
+        contractor = getattr(self.env.user, 'contractor_id', False)
+        for vals in vals_list:
+            if not vals.get('owner_contractor_id') and contractor:
                 vals['owner_contractor_id'] = contractor.id
-        return super().create(vals)
+        return super().create(vals_list)
+
+
+# 🧭 Handler cho message Kafka (xem shared/utils/kafka_dispatch.py)
+kafka_dispatch.register('match_capacity_profile', 'vnfield.project', '_kafka_apply_match_capacity_profile',
+                        batch=True)
@@ -71,9 +71,8 @@ class TaskAssignmentWizard(models.TransientModel):
             # Get topic từ config
             topic = config_param.get_param('vnfield.kafka.topic', 'vnfield')
             
-            # Produce message
-            pubsub_service = self.env['vnfield.pubsub.service'].create({})
-            result = pubsub_service.produce_message(topic, message_data)
+            # 📮 Ghi vào outbox - chỉ được publish nếu transaction commit
+            self.env['vnfield.kafka.outbox'].enqueue(topic, message_data)
             
             # # Update sync_request state based on message result
             # if result and result.get('success'):
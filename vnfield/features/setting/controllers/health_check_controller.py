@@ -1,11 +1,19 @@
 # -*- coding: utf-8 -*-
 from odoo import http
 from odoo.http import request
+from odoo.modules.module import get_manifest
+import hmac
 import json
 import logging
 
+from ...shared.utils import kafka_metrics
+
 _logger = logging.getLogger(__name__)
 
+# 💡 NOTE(assistant): /vnfield/metrics và phần kafka của /vnfield/status yêu cầu
+# ?token=... hoặc header "Authorization: Bearer ..."; chưa đặt token → bị từ chối
+METRICS_TOKEN_PARAM = 'vnfield.metrics_token'
+
 class HealthCheckController(http.Controller):
     """
     🔗 HEALTH CHECK CONTROLLER
@@ -96,23 +104,32 @@ class HealthCheckController(http.Controller):
         """
         try:
             # Get basic system information
-            config_param = request.env['ir.config_parameter'].sudo()
+            metrics = kafka_metrics.snapshot_all()
             
             response_data = {
                 'status': 'active',
                 'server_name': 'VNField Server',
                 'application': 'vnfield',
-                'version': '17.0.2.0.0',
+                'version': get_manifest('vnfield').get('version', 'unknown'),
                 'database': request.env.cr.dbname,
-                'uptime': 'running',
+                'uptime': round(metrics['uptime'], 1),
                 'endpoints': {
                     'health': '/vnfield/health',
                     'ping': '/vnfield/ping', 
-                    'status': '/vnfield/status'
+                    'status': '/vnfield/status',
+                    'metrics': '/vnfield/metrics'
                 },
                 'timestamp': http.request.env['ir.config_parameter'].sudo().get_param('database.create_date', 'unknown')
             }
             
+            # 📊 Kafka pipeline: counter/timing gộp từ mọi process + lag/outbox từ database
+            if self._check_metrics_token():
+                response_data['kafka'] = dict(
+                    request.env['vnfield.kafka.consumer.status'].sudo()._get_pipeline_status(),
+                    metrics=request.env['vnfield.kafka.metric.snapshot'].sudo()._get_merged_metrics(),
+                    process=metrics,
+                )
+            
             _logger.info("Server status endpoint accessed successfully")
             
             return request.make_response(
@@ -142,4 +159,48 @@ class HealthCheckController(http.Controller):
                     'Cache-Control': 'no-cache'
                 },
                 status=200
-            )
\ No newline at end of file
+            )
+
+    @http.route('/vnfield/metrics', type='http', auth='none', methods=['GET'], csrf=False)
+    def metrics(self):
+        """
+        📈 PROMETHEUS METRICS ENDPOINT
+        
+        Counter / timing gộp từ snapshot của mọi process chạy pipeline (cron
+        worker, runner, thread sender — vnfield.kafka.metric.snapshot) cùng gauge
+        đọc từ database (lag theo partition, độ sâu outbox / retry queue).
+        
+        Returns:
+            HTTP Response: 200 với Prometheus text format, 403 nếu sai token
+        """
+        if not self._check_metrics_token():
+            return request.make_response('forbidden', headers={'Content-Type': 'text/plain'}, status=403)
+        try:
+            gauges = request.env['vnfield.kafka.consumer.status'].sudo()._get_pipeline_gauges()
+        except Exception as e:
+            _logger.error(f"Metrics endpoint could not read pipeline status: {str(e)}")
+            gauges = []
+        try:
+            data = request.env['vnfield.kafka.metric.snapshot'].sudo()._get_merged_metrics()
+        except Exception as e:
+            _logger.error(f"Metrics endpoint could not read process snapshots: {str(e)}")
+            data = None
+        return request.make_response(
+            kafka_metrics.render_prometheus(extra_gauges=gauges, data=data),
+            headers={
+                'Content-Type': 'text/plain; version=0.0.4; charset=utf-8',
+                'Cache-Control': 'no-cache'
+            },
+            status=200
+        )
+
+    def _check_metrics_token(self):
+        """🔐 So khớp token (vnfield.metrics_token); chưa cấu hình token → từ chối"""
+        expected = request.env['ir.config_parameter'].sudo().get_param(METRICS_TOKEN_PARAM)
+        if not expected:
+            return False
+        provided = request.params.get('token') or ''
+        authorization = request.httprequest.headers.get('Authorization', '')
+        if authorization.startswith('Bearer '):
+            provided = authorization[len('Bearer '):]
+        return hmac.compare_digest(provided.encode(), expected.encode())
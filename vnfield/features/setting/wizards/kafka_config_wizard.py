@@ -23,6 +23,8 @@ import odoo
 from odoo import models, fields, api, _
 from odoo.exceptions import UserError, ValidationError
 
+from ...shared.utils import kafka_codec, kafka_partition_pool, kafka_transport
+
 _logger = logging.getLogger(__name__)
 
 
@@ -57,6 +59,30 @@ class KafkaConfigWizard(models.TransientModel):
         ('SASL_SSL', 'SASL_SSL')
     ], string='Security Protocol', default='PLAINTEXT', required=True,
        help='Giao thức bảo mật cho kết nối Kafka')
+    
+    transport = fields.Selection([
+        (kafka_transport.TRANSPORT_KAFKA, 'Kafka (confluent_kafka)'),
+        (kafka_transport.TRANSPORT_MEMORY, 'In-memory (offline / CI)'),
+    ], string='Transport', default=kafka_transport.TRANSPORT_KAFKA, required=True,
+       help='In-memory: broker giả lập trong process, không cần Kafka server '
+            '(chỉ dùng cho test / benchmark, message mất khi restart)')
+    
+    memory_partitions = fields.Integer(
+        string='In-memory Partitions',
+        default=3,
+        help='Số partition của topic tự tạo trong broker giả lập'
+    )
+    
+    @api.constrains('transport', 'memory_partitions')
+    def _check_transport(self):
+        """✅ Transport phải dùng được trên server"""
+        for record in self:
+            if not kafka_transport.is_available(record.transport):
+                raise ValidationError(_(
+                    'The %s transport requires the confluent-kafka Python library'
+                ) % record.transport)
+            if record.memory_partitions <= 0:
+                raise ValidationError(_('In-memory partitions must be > 0'))
 
     # ─────────────────────────────────────────────
     # ▶ SASL Authentication Fields
@@ -129,6 +155,21 @@ class KafkaConfigWizard(models.TransientModel):
         default=5,
         help='Thời gian chờ để tạo batch (milliseconds)'
     )
+    
+    producer_codec = fields.Selection([
+        ('json', 'JSON (orjson nếu có)'),
+        ('msgpack', 'MessagePack'),
+    ], string='Payload Codec', default='json',
+       help='Định dạng serialize payload; consumer decode theo header content-type')
+    
+    producer_compression_type = fields.Selection([
+        ('none', 'None'),
+        ('gzip', 'gzip'),
+        ('snappy', 'Snappy'),
+        ('lz4', 'LZ4'),
+        ('zstd', 'Zstandard'),
+    ], string='Compression', default='none',
+       help='Nén batch phía producer (compression.type của librdkafka)')
 
     # ─────────────────────────────────────────────
     # ▶ Consumer Configuration Fields
@@ -141,10 +182,26 @@ class KafkaConfigWizard(models.TransientModel):
     ], string='Auto Offset Reset', default='earliest',
        help='Chiến lược reset offset khi không tìm thấy offset')
     
+    consumer_catchup_policy = fields.Selection([
+        ('reset', 'Auto Offset Reset'),
+        ('hours', 'Last N Hours'),
+        ('checkpoint', 'Stored Checkpoint'),
+        ('latest', 'Latest Only'),
+    ], string='New Group Catch-up', default='reset',
+       help='Vị trí bắt đầu của consumer group mới (chưa commit offset): theo Auto Offset Reset, '
+            'từ N giờ trước, từ offset đã áp dụng vào database (không có → N giờ trước), hoặc chỉ message mới')
+    
+    consumer_catchup_hours = fields.Integer(
+        string='Catch-up Window (hours)',
+        default=24,
+        help='Số giờ đọc lại cho catch-up policy Last N Hours / Stored Checkpoint'
+    )
+    
     consumer_auto_commit = fields.Boolean(
         string='Enable Auto Commit',
         default=True,
-        help='Tự động commit offset sau khi consume message'
+        help='Tự động commit offset sau khi consume message. Tắt để commit offset '
+             'thủ công chỉ sau khi database commit (at-least-once, offset lưu trong vnfield.kafka.offset)'
     )
     
     consumer_session_timeout = fields.Integer(
@@ -174,6 +231,79 @@ class KafkaConfigWizard(models.TransientModel):
         default=10,
         help='Hệ số nhân với timeout để tính tổng thời gian consume tối đa'
     )
+    
+    consumer_batch_size = fields.Integer(
+        string='Batch Size',
+        default=100,
+        help='Số message tối đa mỗi lần consume() và mỗi lần gọi batch handler'
+    )
+
+    consumer_concurrency = fields.Integer(
+        string='Partition Concurrency',
+        default=1,
+        help='Số thread xử lý song song theo partition (mỗi thread một cursor riêng, '
+             'thứ tự trong mỗi partition được giữ nguyên). 1 = xử lý tuần tự'
+    )
+
+    priority_lanes = fields.Boolean(
+        string='Priority Lanes',
+        default=False,
+        help='Tách message bulk sang topic riêng (<topic><suffix>); consumer đọc lane interactive '
+             'trước khi lane bulk có backlog. Cần tạo topic bulk trước khi bật'
+    )
+
+    bulk_topic_suffix = fields.Char(
+        string='Bulk Topic Suffix',
+        default='.bulk',
+        help='Suffix của topic lane bulk, gắn sau vnfield.kafka.topic'
+    )
+
+    interactive_lane_weight = fields.Integer(
+        string='Interactive Lane Weight',
+        default=4,
+        help='Số lượt poll chỉ đọc lane interactive (bulk bị pause) mỗi chu kỳ khi lane interactive có message'
+    )
+
+    bulk_lane_weight = fields.Integer(
+        string='Bulk Lane Weight',
+        default=1,
+        help='Số lượt poll đọc cả lane bulk mỗi chu kỳ (bulk không bị bỏ đói khi interactive bận)'
+    )
+
+    retry_max_attempts = fields.Integer(
+        string='Max Retry Attempts',
+        default=5,
+        help='Số lần thử handler tối đa trước khi message được đưa sang dead-letter topic'
+    )
+
+    retry_backoff_base = fields.Integer(
+        string='Retry Backoff (seconds)',
+        default=30,
+        help='Thời gian chờ trước lần thử lại đầu tiên, nhân đôi sau mỗi lần lỗi'
+    )
+
+    dlq_topic = fields.Char(
+        string='Dead-letter Topic',
+        help='Topic nhận message hết số lần thử (để trống: <topic gốc>.dlq)'
+    )
+
+    sync_request_archive_after_days = fields.Integer(
+        string='Archive After (days)',
+        default=30,
+        help='Sync request approved / rejected được archive sau số ngày này (0 = tắt)'
+    )
+
+    sync_request_cold_after_days = fields.Integer(
+        string='Move to Cold Archive After (days)',
+        default=90,
+        help='Sync request đã archive được chuyển sang bảng kho lạnh sau số ngày này (0 = giữ ở bảng chính)'
+    )
+
+    sync_request_retention_chunk_size = fields.Integer(
+        string='Retention Chunk Size',
+        default=1000,
+        help='Số sync request mỗi chunk (mỗi chunk một transaction) của cron retention'
+    )
 
     # ─────────────────────────────────────────────
     # ▶ Status và Control Fields
@@ -251,6 +381,15 @@ class KafkaConfigWizard(models.TransientModel):
             if record.producer_batch_size <= 0:
                 raise ValidationError(_('Producer batch size must be > 0'))
     
+    @api.constrains('producer_codec')
+    def _check_producer_codec(self):
+        """✅ Codec phải có thư viện trên server"""
+        for record in self:
+            if record.producer_codec and not kafka_codec.is_available(record.producer_codec):
+                raise ValidationError(_(
+                    'The %s codec requires the msgpack Python library on every Odoo worker'
+                ) % record.producer_codec)
+    
     @api.constrains('consumer_session_timeout', 'consumer_heartbeat_interval')
     def _check_consumer_timeouts(self):
         """✅ Validate consumer timeouts"""
@@ -264,7 +403,10 @@ class KafkaConfigWizard(models.TransientModel):
                     'Heartbeat interval must be less than session timeout'
                 ))
     
-    @api.constrains('consumer_max_no_message_retries', 'consumer_max_total_time_multiplier')
+    @api.constrains('consumer_max_no_message_retries', 'consumer_max_total_time_multiplier',
+                    'consumer_batch_size', 'consumer_concurrency',
+                    'retry_max_attempts', 'retry_backoff_base', 'consumer_catchup_hours',
+                    'interactive_lane_weight', 'bulk_lane_weight', 'bulk_topic_suffix', 'priority_lanes')
     def _check_consumer_retry_config(self):
         """✅ Validate consumer retry configuration"""
         for record in self:
@@ -272,6 +414,32 @@ class KafkaConfigWizard(models.TransientModel):
                 raise ValidationError(_('Max no-message retries must be > 0'))
             if record.consumer_max_total_time_multiplier <= 0:
                 raise ValidationError(_('Max total time multiplier must be > 0'))
+            if record.consumer_batch_size <= 0:
+                raise ValidationError(_('Consumer batch size must be > 0'))
+            if not 1 <= record.consumer_concurrency <= kafka_partition_pool.MAX_CONCURRENCY:
+                raise ValidationError(_(
+                    'Partition concurrency must be between 1 and %s'
+                ) % kafka_partition_pool.MAX_CONCURRENCY)
+            if record.retry_max_attempts <= 0:
+                raise ValidationError(_('Max retry attempts must be > 0'))
+            if record.retry_backoff_base <= 0:
+                raise ValidationError(_('Retry backoff must be > 0'))
+            if record.consumer_catchup_hours <= 0:
+                raise ValidationError(_('Catch-up window must be > 0 hours'))
+            if record.interactive_lane_weight <= 0 or record.bulk_lane_weight <= 0:
+                raise ValidationError(_('Lane weights must be > 0'))
+            if record.priority_lanes and not (record.bulk_topic_suffix or '').strip():
+                raise ValidationError(_('Bulk topic suffix is required when priority lanes are enabled'))
+
+    @api.constrains('sync_request_archive_after_days', 'sync_request_cold_after_days',
+                    'sync_request_retention_chunk_size')
+    def _check_sync_request_retention(self):
+        """✅ Validate sync request retention configuration"""
+        for record in self:
+            if record.sync_request_archive_after_days < 0 or record.sync_request_cold_after_days < 0:
+                raise ValidationError(_('Retention days must be >= 0'))
+            if record.sync_request_retention_chunk_size <= 0:
+                raise ValidationError(_('Retention chunk size must be > 0'))
 
     # ─────────────────────────────────────────────
     # ▶ Data Loading Methods
@@ -286,6 +454,8 @@ class KafkaConfigWizard(models.TransientModel):
         param_mappings = {
             'bootstrap_servers': 'kafka.bootstrap_servers',
             'security_protocol': 'kafka.security_protocol',
+            'transport': 'kafka.transport',
+            'memory_partitions': 'kafka.memory_partitions',
             'sasl_mechanism': 'kafka.sasl_mechanism',
             'sasl_username': 'kafka.sasl_username',
             'sasl_password': 'kafka.sasl_password',
@@ -296,12 +466,28 @@ class KafkaConfigWizard(models.TransientModel):
             'producer_retries': 'kafka.producer_retries',
             'producer_batch_size': 'kafka.producer_batch_size',
             'producer_linger_ms': 'kafka.producer_linger_ms',
+            'producer_codec': 'kafka.producer_codec',
+            'producer_compression_type': 'kafka.producer_compression_type',
             'consumer_auto_offset_reset': 'kafka.consumer_auto_offset_reset',
+            'consumer_catchup_policy': 'kafka.consumer_catchup_policy',
+            'consumer_catchup_hours': 'kafka.consumer_catchup_hours',
             'consumer_auto_commit': 'kafka.consumer_auto_commit',
             'consumer_session_timeout': 'kafka.consumer_session_timeout',
             'consumer_heartbeat_interval': 'kafka.consumer_heartbeat_interval',
             'consumer_max_no_message_retries': 'kafka.consumer_max_no_message_retries',
             'consumer_max_total_time_multiplier': 'kafka.consumer_max_total_time_multiplier',
+            'consumer_batch_size': 'kafka.consumer_batch_size',
+            'consumer_concurrency': 'kafka.consumer_concurrency',
+            'priority_lanes': 'vnfield.kafka.priority_lanes',
+            'bulk_topic_suffix': 'vnfield.kafka.bulk_topic_suffix',
+            'interactive_lane_weight': 'vnfield.kafka.interactive_lane_weight',
+            'bulk_lane_weight': 'vnfield.kafka.bulk_lane_weight',
+            'retry_max_attempts': 'vnfield.kafka.retry_max_attempts',
+            'retry_backoff_base': 'vnfield.kafka.retry_backoff_base',
+            'dlq_topic': 'vnfield.kafka.dlq_topic',
+            'sync_request_archive_after_days': 'vnfield.sync_request.archive_after_days',
+            'sync_request_cold_after_days': 'vnfield.sync_request.cold_after_days',
+            'sync_request_retention_chunk_size': 'vnfield.sync_request.retention_chunk_size',
         }
         
         config_param = self.env['ir.config_parameter'].sudo()
@@ -313,12 +499,17 @@ class KafkaConfigWizard(models.TransientModel):
                     # 🔄 Convert string values to appropriate types
                     if field_name in ['producer_retries', 'producer_batch_size', 'producer_linger_ms',
                                     'consumer_session_timeout', 'consumer_heartbeat_interval',
-                                    'consumer_max_no_message_retries', 'consumer_max_total_time_multiplier']:
+                                    'consumer_max_no_message_retries', 'consumer_max_total_time_multiplier',
+                                    'consumer_batch_size', 'consumer_concurrency',
+                                    'retry_max_attempts', 'retry_backoff_base', 'memory_partitions',
+                                    'sync_request_archive_after_days', 'sync_request_cold_after_days',
+                                    'sync_request_retention_chunk_size', 'consumer_catchup_hours',
+                                    'interactive_lane_weight', 'bulk_lane_weight']:
                         try:
                             res[field_name] = int(param_value)
                         except (ValueError, TypeError):
                             pass  # Keep default value
-                    elif field_name == 'consumer_auto_commit':
+                    elif field_name in ('consumer_auto_commit', 'priority_lanes'):
                         res[field_name] = param_value.lower() == 'true'
                     else:
                         res[field_name] = param_value
@@ -340,6 +531,8 @@ class KafkaConfigWizard(models.TransientModel):
             param_mappings = {
                 'kafka.bootstrap_servers': self.bootstrap_servers,
                 'kafka.security_protocol': self.security_protocol,
+                'kafka.transport': self.transport,
+                'kafka.memory_partitions': str(self.memory_partitions),
                 'kafka.sasl_mechanism': self.sasl_mechanism,
                 'kafka.sasl_username': self.sasl_username or '',
                 'kafka.sasl_password': self.sasl_password or '',
@@ -350,12 +543,28 @@ class KafkaConfigWizard(models.TransientModel):
                 'kafka.producer_retries': str(self.producer_retries),
                 'kafka.producer_batch_size': str(self.producer_batch_size),
                 'kafka.producer_linger_ms': str(self.producer_linger_ms),
+                'kafka.producer_codec': self.producer_codec,
+                'kafka.producer_compression_type': self.producer_compression_type,
                 'kafka.consumer_auto_offset_reset': self.consumer_auto_offset_reset,
+                'kafka.consumer_catchup_policy': self.consumer_catchup_policy,
+                'kafka.consumer_catchup_hours': str(self.consumer_catchup_hours),
                 'kafka.consumer_auto_commit': 'true' if self.consumer_auto_commit else 'false',
                 'kafka.consumer_session_timeout': str(self.consumer_session_timeout),
                 'kafka.consumer_heartbeat_interval': str(self.consumer_heartbeat_interval),
                 'kafka.consumer_max_no_message_retries': str(self.consumer_max_no_message_retries),
                 'kafka.consumer_max_total_time_multiplier': str(self.consumer_max_total_time_multiplier),
+                'kafka.consumer_batch_size': str(self.consumer_batch_size),
+                'kafka.consumer_concurrency': str(self.consumer_concurrency),
+                'vnfield.kafka.priority_lanes': 'true' if self.priority_lanes else 'false',
+                'vnfield.kafka.bulk_topic_suffix': (self.bulk_topic_suffix or '').strip(),
+                'vnfield.kafka.interactive_lane_weight': str(self.interactive_lane_weight),
+                'vnfield.kafka.bulk_lane_weight': str(self.bulk_lane_weight),
+                'vnfield.kafka.retry_max_attempts': str(self.retry_max_attempts),
+                'vnfield.kafka.retry_backoff_base': str(self.retry_backoff_base),
+                'vnfield.kafka.dlq_topic': self.dlq_topic or '',
+                'vnfield.sync_request.archive_after_days': str(self.sync_request_archive_after_days),
+                'vnfield.sync_request.cold_after_days': str(self.sync_request_cold_after_days),
+                'vnfield.sync_request.retention_chunk_size': str(self.sync_request_retention_chunk_size),
             }
             
             # 🔁 Save all parameters
@@ -477,6 +686,8 @@ class KafkaConfigWizard(models.TransientModel):
         self.write({
             'bootstrap_servers': 'localhost:9092',
             'security_protocol': 'PLAINTEXT',
+            'transport': kafka_transport.TRANSPORT_KAFKA,
+            'memory_partitions': 3,
             'sasl_mechanism': 'PLAIN',
             'sasl_username': '',
             'sasl_password': '',
@@ -487,12 +698,28 @@ class KafkaConfigWizard(models.TransientModel):
             'producer_retries': 3,
             'producer_batch_size': 16384,
             'producer_linger_ms': 5,
+            'producer_codec': 'json',
+            'producer_compression_type': 'none',
             'consumer_auto_offset_reset': 'earliest',
+            'consumer_catchup_policy': 'reset',
+            'consumer_catchup_hours': 24,
             'consumer_auto_commit': True,
             'consumer_session_timeout': 30000,
             'consumer_heartbeat_interval': 10000,
             'consumer_max_no_message_retries': 3,
             'consumer_max_total_time_multiplier': 10,
+            'consumer_batch_size': 100,
+            'consumer_concurrency': 1,
+            'priority_lanes': False,
+            'bulk_topic_suffix': '.bulk',
+            'interactive_lane_weight': 4,
+            'bulk_lane_weight': 1,
+            'retry_max_attempts': 5,
+            'retry_backoff_base': 30,
+            'dlq_topic': '',
+            'sync_request_archive_after_days': 30,
+            'sync_request_cold_after_days': 90,
+            'sync_request_retention_chunk_size': 1000,
             'connection_status': '',
         })
         
@@ -560,13 +787,13 @@ class KafkaConfigWizard(models.TransientModel):
                 topic = 'vnfield_pubsub_test'
                 
                 _logger.info(f"📤 About to publish message: {test_message}")
-                success = pubsub_service.produce_message(topic, test_message)
-                _logger.info(f"📤 Publish result: {success}")
+                delivery = pubsub_service.produce_many(topic, [test_message])[0]
+                _logger.info(f"📤 Publish result: {delivery}")
                 
-                if not success:
+                if not delivery['delivered']:
                     self.write({
                         'test_status': 'failed',
-                        'test_message': 'Failed to publish test message'
+                        'test_message': f"Failed to publish test message: {delivery['error']}"
                     })
                     return self._show_notification(
                         'Kafka Test Failed',
@@ -588,9 +815,11 @@ class KafkaConfigWizard(models.TransientModel):
                 )
                 
                 # ─────────────── 🔄 CONSUME LOOP (No Thread) ───────────────
+                # 💡 NOTE(assistant): Đọc thẳng từ offset của message vừa gửi,
+                # không replay lịch sử topic bằng một group mới
                 unique_group_id = f'test_consumer_{int(time.time())}'
-                _logger.info(f"🔥 Starting consumer with unique group: {unique_group_id}")
-                _logger.info(f"🔥 This consumer will read from BEGINNING of topic to find all messages")
+                start_offsets = {(topic, delivery['partition']): delivery['offset']}
+                _logger.info(f"🔥 Starting consumer with unique group: {unique_group_id} at {start_offsets}")
                 
                 found_message = False
                 start_time = time.time()
@@ -605,7 +834,8 @@ class KafkaConfigWizard(models.TransientModel):
                         topic,
                         group_id=unique_group_id,
                         timeout=1.0,
-                        max_messages=10
+                        max_messages=10,
+                        start_offsets=start_offsets,
                     )
                     
                     _logger.info(f"🔄 Consumed {len(messages)} messages in this batch")
@@ -4,6 +4,8 @@ from odoo import models, fields, api, _
 from odoo.exceptions import ValidationError, UserError
 import logging
 
+from ...shared.utils import kafka_consumer_runner
+
 _logger = logging.getLogger(__name__)
 
 
@@ -23,6 +25,10 @@ class KafkaCronManagerWizard(models.TransientModel):
     
     📋 UNIVERSAL CONSUMER:
     - vnfield.kafka.universal.consumer: Universal consumer cho tất cả VNField messages
+    
+    🏃 PERSISTENT RUNNER:
+    - Consumer sống lâu (background thread hoặc `odoo-bin vnfield-kafka-consumer`)
+    - Thay thế cron mỗi phút, tránh rebalance mỗi lần chạy
     """
     _name = 'vnfield.kafka.cron.manager'
     _description = 'Kafka Cron Job Manager'
@@ -63,6 +69,15 @@ class KafkaCronManagerWizard(models.TransientModel):
     consumer_active = fields.Boolean('� VNField Consumer', compute='_compute_consumer_status')
     consumer_id = fields.Many2one('ir.cron', string='Consumer Cron Job', compute='_compute_consumer_status')
     topic_name = fields.Char('VNField Topic', default=lambda self: self._get_topic_default())
+    routing_mode = fields.Selection([
+        ('shared', 'Shared Topic'),
+        ('keyed', 'Keyed Partitions'),
+        ('topic', 'Per-Site Topics'),
+    ], string='🧭 Routing Mode', default=lambda self: self._get_routing_mode_default(),
+        help='shared: mọi site đọc chung một topic | keyed: partition riêng theo destination | '
+             'topic: topic riêng <prefix>.<destination>.<topic>')
+    topic_prefix = fields.Char('Topic Prefix', default=lambda self: self._get_topic_prefix_default(),
+                               help='Prefix cho topic riêng của site (routing mode = topic)')
     last_run = fields.Datetime('Last Run', compute='_compute_consumer_status')
     next_run = fields.Datetime('Next Run', compute='_compute_consumer_status')
 
@@ -71,6 +86,14 @@ class KafkaCronManagerWizard(models.TransientModel):
         param = self.env['ir.config_parameter'].sudo()
         return param.get_param('vnfield.kafka.topic', 'vnfield')
 
+    @api.model
+    def _get_routing_mode_default(self):
+        return self.env['vnfield.pubsub.service']._get_routing_settings()['mode']
+
+    @api.model
+    def _get_topic_prefix_default(self):
+        return self.env['vnfield.pubsub.service']._get_routing_settings()['prefix']
+
     def write(self, vals):
         # Update topic config parameter when topic_name is changed
         if 'topic_name' in vals:
@@ -86,6 +109,17 @@ class KafkaCronManagerWizard(models.TransientModel):
             param.set_param('vnfield.kafka.topic', vals['topic_name'])
         return super().create(vals)
     
+    # ═══════════════════════════════════════════
+    # 🏃 PERSISTENT CONSUMER RUNNER
+    # ═══════════════════════════════════════════
+    
+    runner_enabled = fields.Boolean('🏃 Runner Enabled', compute='_compute_runner_status',
+                                    help='System parameter vnfield.kafka.consumer_runner_enabled')
+    runner_local_thread = fields.Boolean('🧵 Thread In This Worker', compute='_compute_runner_status',
+                                         help='Runner thread đang chạy trong process xử lý request này')
+    runner_status_ids = fields.Many2many('vnfield.kafka.consumer.status', string='Runners',
+                                         compute='_compute_runner_status')
+    
     # ═══════════════════════════════════════════
     # 📊 CONSUMER STATISTICS
     # ═══════════════════════════════════════════
@@ -153,7 +187,7 @@ class KafkaCronManagerWizard(models.TransientModel):
         return {
             'vnfield_universal': {
                 'model': 'vnfield.sync.request',
-                'cron_name': 'Kafka Consumer - VNField Universal',
+                'cron_name': kafka_consumer_runner.CRON_CONSUMER_NAME,
                 'cron_code': 'env["vnfield.sync.request"].consume()',
                 'topic_suffix': 'vnfield',
                 'description': 'Universal consumer for all VNField messages',
@@ -204,6 +238,18 @@ class KafkaCronManagerWizard(models.TransientModel):
             record.last_run = cron_job.lastcall if cron_job else False
             record.next_run = cron_job.nextcall if cron_job else False
     
+    @api.depends()
+    def _compute_runner_status(self):
+        """🏃 Compute trạng thái persistent consumer runner"""
+        config_param = self.env['ir.config_parameter'].sudo()
+        enabled = config_param.get_param(kafka_consumer_runner.ENABLED_PARAM, 'false').lower() == 'true'
+        local_thread = bool(kafka_consumer_runner.get_thread_runner(self.env.cr.dbname))
+        statuses = self.env['vnfield.kafka.consumer.status'].sudo().search([])
+        for record in self:
+            record.runner_enabled = enabled
+            record.runner_local_thread = local_thread
+            record.runner_status_ids = statuses
+    
     @api.depends('consumer_active')
     def _compute_statistics(self):
         """📈 Compute consumer statistics"""
@@ -329,6 +375,11 @@ class KafkaCronManagerWizard(models.TransientModel):
                 # 🔄 Cập nhật hoặc tạo mới config parameter
                 ConfigParam.set_param('vnfield.kafka.topic', self.topic_name)
                 _logger.info(f"✅ Updated topic config: vnfield.kafka.topic = {self.topic_name}")
+            if self.routing_mode:
+                ConfigParam.set_param('vnfield.kafka.routing_mode', self.routing_mode)
+            if self.topic_prefix:
+                ConfigParam.set_param('vnfield.kafka.topic_prefix', self.topic_prefix)
+            _logger.info(f"✅ Updated routing config: mode = {self.routing_mode}, prefix = {self.topic_prefix}")
             
             return {
                 'type': 'ir.actions.client',
@@ -594,6 +645,78 @@ class KafkaCronManagerWizard(models.TransientModel):
         """⏹️ Stop Universal Consumer"""
         return self.action_stop_consumer('vnfield_universal')
     # ═══════════════════════════════════════════
+    # 🏃 PERSISTENT RUNNER ACTIONS
+    # ═══════════════════════════════════════════
+    
+    def action_start_runner(self):
+        """
+        ▶️ Start persistent consumer runner
+        
+        - Bật vnfield.kafka.consumer_runner_enabled
+        - Tắt cron universal consumer (tránh 2 consumer cùng group)
+        - Khởi động background thread trong worker hiện tại (sau khi transaction commit)
+        """
+        self.ensure_one()
+        dbname = self.env.cr.dbname
+        if kafka_consumer_runner.get_thread_runner(dbname) is None:
+            runner_name = kafka_consumer_runner.KafkaConsumerRunner(dbname, mode='thread').get_instance_name(self.env)
+            duplicate = kafka_consumer_runner.find_live_runner(self.env, runner_name)
+            if duplicate:
+                raise UserError(_(
+                    "Runner '%(name)s' is already running on %(host)s (pid %(pid)s). "
+                    "Stop it first or give each process its own instance id."
+                ) % {'name': runner_name, 'host': duplicate.hostname, 'pid': duplicate.pid})
+        kafka_consumer_runner.enable_runner(self.env)
+        
+        # 💡 NOTE(assistant): Start thread sau khi request commit để runner đọc được flag mới;
+        # action lỗi → rollback → không có thread nào được start
+        @self.env.cr.postcommit.add
+        def start_runner_after_commit():
+            kafka_consumer_runner.start_thread_runner(dbname)
+        
+        return {
+            'type': 'ir.actions.client',
+            'tag': 'display_notification',
+            'params': {
+                'type': 'success',
+                'title': _('Runner Started'),
+                'message': _('Persistent Kafka consumer runner started. '
+                             'With prefork workers prefer: odoo-bin vnfield-kafka-consumer -d %s') % dbname,
+                'sticky': False,
+            }
+        }
+    
+    def action_stop_runner(self):
+        """
+        ⏹️ Stop persistent consumer runner
+        
+        Tắt flag → mọi runner (thread ở worker khác, odoo-bin command) tự dừng
+        ở heartbeat kế tiếp; thread trong worker này dừng ngay.
+        Cron universal consumer (nếu do runner tắt) được bật lại khi runner cuối cùng dừng.
+        """
+        self.ensure_one()
+        kafka_consumer_runner.disable_runner(self.env)
+        dbname = self.env.cr.dbname
+        
+        # 💡 NOTE(assistant): Dừng thread sau commit → khi dừng, runner đọc được flag đã tắt
+        # và bật lại cron consumer
+        @self.env.cr.postcommit.add
+        def stop_runner_after_commit():
+            kafka_consumer_runner.stop_thread_runner(dbname)
+        
+        return {
+            'type': 'ir.actions.client',
+            'tag': 'display_notification',
+            'params': {
+                'type': 'success',
+                'title': _('Runner Stopped'),
+                'message': _('Persistent Kafka consumer runners will stop within one heartbeat interval; '
+                             'the cron consumer is reactivated once they have stopped'),
+                'sticky': False,
+            }
+        }
+    
+    # ═══════════════════════════════════════════
     # 🔧 UTILITY METHODS
     # ═══════════════════════════════════════════
     
@@ -618,6 +741,7 @@ class KafkaCronManagerWizard(models.TransientModel):
         self.ensure_one()
         self._compute_consumer_status()
         self._compute_statistics()
+        self._compute_runner_status()
         
         return {
             'type': 'ir.actions.client',
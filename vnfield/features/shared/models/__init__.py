@@ -5,4 +5,12 @@
 # ═══════════════════════════════════════════════
 
 from . import pubsub_service
-from . import sync_request
\ No newline at end of file
+from . import sync_request
+from . import sync_request_archive
+from . import kafka_outbox
+from . import kafka_consumer_status
+from . import kafka_offset
+from . import kafka_util
+from . import kafka_retry
+from . import kafka_pending_reply
+from . import kafka_metric_snapshot
@@ -0,0 +1,182 @@
+# -*- coding: utf-8 -*-
+
+# ===========================================
+# =      📡 KAFKA CONSUMER RUNNER STATUS     =
+# ===========================================
+
+"""
+┌────────────────────────────────────────────┐
+│  🧰 CHỨC NĂNG: TRẠNG THÁI CONSUMER RUNNER   │
+│                                            │
+│ - Mỗi runner (thread hoặc odoo-bin) ghi    │
+│   heartbeat vào một row của bảng này       │
+│ - Wizard Kafka Consumer Manager đọc để     │
+│   monitor mà không cần chung process       │
+│ - Lag theo partition + throughput, export  │
+│   qua /vnfield/status và /vnfield/metrics  │
+└────────────────────────────────────────────┘
+"""
+
+import json
+import logging
+from datetime import timedelta
+
+from odoo import models, fields, api
+
+_logger = logging.getLogger(__name__)
+
+
+class KafkaConsumerStatus(models.Model):
+    """
+    📡 Heartbeat của các persistent consumer runner
+    """
+
+    _name = 'vnfield.kafka.consumer.status'
+    _description = 'Kafka Consumer Runner Status'
+    _order = 'last_heartbeat desc'
+
+    name = fields.Char(string='Runner', required=True, readonly=True,
+                       help='Định danh runner (group.instance.id)')
+    hostname = fields.Char(string='Host', readonly=True)
+    pid = fields.Integer(string='PID', readonly=True)
+    mode = fields.Selection([
+        ('thread', 'Background Thread'),
+        ('command', 'odoo-bin Command'),
+        ('cron', 'Cron Consumer'),      # Lag / throughput của lần cron consume gần nhất
+    ], string='Mode', readonly=True)
+    group_id = fields.Char(string='Group ID', readonly=True)
+    topics = fields.Char(string='Topics', readonly=True)
+    state = fields.Selection([
+        ('running', 'Running'),
+        ('stopped', 'Stopped'),
+        ('error', 'Error'),
+    ], string='Status', default='running', readonly=True)
+    started_at = fields.Datetime(string='Started At', readonly=True)
+    last_heartbeat = fields.Datetime(string='Last Heartbeat', readonly=True)
+    messages_processed = fields.Integer(string='Messages Processed', readonly=True)
+    messages_skipped = fields.Integer(string='Messages Skipped', readonly=True,
+                                      help='Message của system khác, bị loại từ header destination')
+    last_error = fields.Text(string='Last Error', readonly=True)
+    throughput = fields.Float(string='Messages / sec', readonly=True, digits=(16, 2),
+                              help='Số message xử lý mỗi giây giữa hai heartbeat gần nhất')
+    total_lag = fields.Integer(string='Consumer Lag', readonly=True,
+                               help='Tổng (high watermark - committed offset) của các partition được assign')
+    partition_lag = fields.Text(string='Partition Lag', readonly=True,
+                                help='JSON: topic, partition, committed, high_watermark, lag')
+    is_alive = fields.Boolean(string='Alive', compute='_compute_is_alive',
+                              help='Heartbeat gần đây (trong 3 lần heartbeat interval)')
+
+    _sql_constraints = [
+        ('name_uniq', 'unique(name)', 'Runner name must be unique!'),
+    ]
+
+    @api.depends('last_heartbeat', 'state')
+    def _compute_is_alive(self):
+        """💓 Runner còn sống nếu heartbeat chưa quá hạn"""
+        interval = self.env['vnfield.pubsub.service']._get_settings().get_int(
+            'vnfield.kafka.consumer_runner_heartbeat', 10
+        )
+        threshold = fields.Datetime.now() - timedelta(seconds=interval * 3)
+        for record in self:
+            record.is_alive = bool(
+                record.state == 'running'
+                and record.last_heartbeat
+                and record.last_heartbeat >= threshold
+            )
+
+    @api.model
+    def _get_live_runners(self):
+        """
+        💓 Runner đang chạy và còn heartbeat (mọi process)
+
+        Returns:
+            vnfield.kafka.consumer.status: Record có is_alive
+        """
+        return self.sudo().search([('state', '=', 'running')]).filtered('is_alive')
+
+    @api.model
+    def _report(self, name, vals):
+        """
+        📝 Upsert trạng thái runner theo name
+
+        Args:
+            name (str): Định danh runner
+            vals (dict): Các giá trị cần ghi
+        """
+        vals = dict(vals, last_heartbeat=fields.Datetime.now())
+        record = self.sudo().search([('name', '=', name)], limit=1)
+        if record:
+            record.write(vals)
+        else:
+            record = self.sudo().create(dict(vals, name=name))
+        return record
+
+    # ─────────────────────────────────────────────
+    # ▶ Pipeline Status (/vnfield/status, /vnfield/metrics)
+    # ─────────────────────────────────────────────
+
+    @api.model
+    def _get_pipeline_status(self):
+        """
+        📊 Số liệu pipeline đọc từ database (nhìn được từ mọi worker)
+
+        Returns:
+            dict: runners (lag / throughput), outbox, retry queue và pending reply theo state
+        """
+        runners = []
+        for record in self.sudo().search([]):
+            runners.append({
+                'name': record.name,
+                'hostname': record.hostname,
+                'mode': record.mode,
+                'group_id': record.group_id,
+                'state': record.state,
+                'alive': record.is_alive,
+                'last_heartbeat': fields.Datetime.to_string(record.last_heartbeat) if record.last_heartbeat else None,
+                'messages_processed': record.messages_processed,
+                'messages_skipped': record.messages_skipped,
+                'throughput': record.throughput,
+                'total_lag': record.total_lag,
+                'partitions': json.loads(record.partition_lag) if record.partition_lag else [],
+            })
+        return {
+            'runners': runners,
+            'outbox': self._count_by_state('vnfield_kafka_outbox'),
+            'retry': self._count_by_state('vnfield_kafka_retry'),
+            'pending_replies': self._count_by_state('vnfield_kafka_pending_reply'),
+        }
+
+    def _count_by_state(self, table):
+        """🔢 Đếm row theo state (một query GROUP BY)"""
+        self.env.cr.execute(f"SELECT state, count(*) FROM {table} GROUP BY state")
+        return dict(self.env.cr.fetchall())
+
+    @api.model
+    def _get_pipeline_gauges(self, status=None):
+        """
+        📈 Số liệu database dạng gauge cho kafka_metrics.render_prometheus
+
+        Returns:
+            list: List tuple (name, dict labels, value)
+        """
+        status = status or self._get_pipeline_status()
+        dbname = self.env.cr.dbname
+        gauges = []
+        for state, count in status['outbox'].items():
+            gauges.append(('outbox_messages', {'dbname': dbname, 'state': state}, count))
+        for state, count in status['retry'].items():
+            gauges.append(('retry_messages', {'dbname': dbname, 'state': state}, count))
+        for state, count in status['pending_replies'].items():
+            gauges.append(('pending_replies', {'dbname': dbname, 'state': state}, count))
+        for runner in status['runners']:
+            labels = {'dbname': dbname, 'runner': runner['name']}
+            if runner['mode'] != 'cron':
+                # Cron consumer đóng sau mỗi lần chạy → không có khái niệm alive
+                gauges.append(('runner_alive', labels, int(runner['alive'])))
+            gauges.append(('runner_throughput', labels, runner['throughput']))
+            for partition in runner['partitions']:
+                partition_labels = dict(labels, topic=partition['topic'], partition=partition['partition'])
+                gauges.append(('consumer_lag', partition_labels, partition['lag']))
+                gauges.append(('committed_offset', partition_labels, partition['committed']))
+                gauges.append(('high_watermark', partition_labels, partition['high_watermark']))
+        return gauges
@@ -0,0 +1,28 @@
+# -*- coding: utf-8 -*-
+
+# ===========================================
+# =        🔢 KAFKA FIELD TYPES              =
+# ===========================================
+
+"""
+┌────────────────────────────────────────────┐
+│  🧰 CHỨC NĂNG: FIELD DÙNG CHO DỮ LIỆU KAFKA │
+│                                            │
+│ - BigInteger: offset Kafka là int64, cột   │
+│   int4 của fields.Integer tràn ở 2^31-1    │
+└────────────────────────────────────────────┘
+"""
+
+from odoo import fields
+
+
+class BigInteger(fields.Integer):
+    """
+    🔢 fields.Integer lưu bằng cột bigint
+
+    Cột int4 có sẵn được ALTER sang int8 khi update module (column_cast_from);
+    phía Python vẫn là int như fields.Integer.
+    """
+
+    column_type = ('int8', 'int8')
+    column_cast_from = ('int4',)
@@ -0,0 +1,156 @@
+# -*- coding: utf-8 -*-
+
+# ===========================================
+# =     📊 KAFKA METRICS SNAPSHOT (PER PROC)  =
+# ===========================================
+
+"""
+┌────────────────────────────────────────────┐
+│  🧰 CHỨC NĂNG: METRIC XUYÊN PROCESS         │
+│                                            │
+│ - kafka_metrics chỉ đếm trong process      │
+│ - Process nào chạy pipeline (cron consume, │
+│   runner, outbox drain / sender, retry,    │
+│   dispatch) ghi snapshot của nó vào một    │
+│   row (host:pid), tối đa mỗi N giây        │
+│ - /vnfield/metrics gộp mọi row còn mới     │
+│   → HTTP worker không consume vẫn thấy số  │
+└────────────────────────────────────────────┘
+
+Row của process không còn ghi quá vnfield.kafka.metrics_retention giây bị
+bỏ qua khi gộp và bị xoá ở lần ghi kế tiếp.
+"""
+
+import json
+import logging
+import os
+import socket
+import time
+from datetime import timedelta
+
+from odoo import models, fields, api, SUPERUSER_ID
+from odoo.modules.registry import Registry
+
+from ..utils import kafka_metrics
+
+_logger = logging.getLogger(__name__)
+
+# 💡 NOTE(assistant): Lần ghi gần nhất theo (dbname) của process hiện tại (throttle)
+_last_published = {}
+
+
+class KafkaMetricSnapshot(models.Model):
+    """
+    📊 Snapshot kafka_metrics của một process (mỗi process một row)
+    """
+
+    _name = 'vnfield.kafka.metric.snapshot'
+    _description = 'Kafka Metrics Snapshot'
+    _order = 'published_at desc'
+    _rec_name = 'process_key'
+
+    process_key = fields.Char(string='Process', required=True, readonly=True, help='<hostname>:<pid>')
+    hostname = fields.Char(string='Host', readonly=True)
+    pid = fields.Integer(string='PID', readonly=True)
+    snapshot = fields.Json(string='Snapshot', readonly=True, help='kafka_metrics.snapshot_all()')
+    published_at = fields.Datetime(string='Published At', readonly=True, index=True)
+
+    _sql_constraints = [
+        ('process_key_uniq', 'unique(process_key)', 'Process key must be unique!'),
+    ]
+
+    def _get_snapshot_settings(self):
+        """🔧 Đọc cấu hình ghi snapshot từ system parameters"""
+        settings = self.env['vnfield.pubsub.service']._get_settings()
+        return {
+            'interval': settings.get_int('vnfield.kafka.metrics_publish_interval', 15),
+            'retention': settings.get_int('vnfield.kafka.metrics_retention', 86400),
+        }
+
+    @staticmethod
+    def _process_info():
+        hostname = socket.gethostname()
+        return {'process_key': f'{hostname}:{os.getpid()}', 'hostname': hostname, 'pid': os.getpid()}
+
+    @api.model
+    def _publish(self, force=False):
+        """
+        📤 Ghi snapshot của process hiện tại (upsert, tối đa mỗi interval giây)
+
+        Không bao giờ raise: metric không được làm hỏng transaction của pipeline.
+
+        Returns:
+            bool: True nếu đã ghi
+        """
+        dbname = self.env.cr.dbname
+        settings = self._get_snapshot_settings()
+        now = time.time()
+        if not force and now - _last_published.get(dbname, 0) < settings['interval']:
+            return False
+        _last_published[dbname] = now
+        process = self._process_info()
+        try:
+            with self.env.cr.savepoint(flush=False):
+                self.env.cr.execute("""
+                    INSERT INTO vnfield_kafka_metric_snapshot
+                        (process_key, hostname, pid, snapshot, published_at,
+                         create_uid, create_date, write_uid, write_date)
+                    VALUES (%(process_key)s, %(hostname)s, %(pid)s, %(snapshot)s, (now() AT TIME ZONE 'UTC'),
+                            %(uid)s, (now() AT TIME ZONE 'UTC'), %(uid)s, (now() AT TIME ZONE 'UTC'))
+                    ON CONFLICT (process_key) DO UPDATE
+                       SET snapshot = EXCLUDED.snapshot,
+                           published_at = EXCLUDED.published_at,
+                           write_uid = EXCLUDED.write_uid,
+                           write_date = EXCLUDED.write_date
+                """, dict(process, snapshot=json.dumps(kafka_metrics.snapshot_all(), default=str), uid=self.env.uid))
+                self.env.cr.execute("""
+                    DELETE FROM vnfield_kafka_metric_snapshot
+                     WHERE published_at < (now() AT TIME ZONE 'UTC') - %s * interval '1 second'
+                """, [settings['retention']])
+        except Exception as e:
+            _logger.warning(f'Could not publish Kafka metrics snapshot: {e}')
+            return False
+        return True
+
+    @api.model
+    def _publish_after_commit(self):
+        """
+        ⏭️ Ghi snapshot sau khi transaction hiện tại commit, bằng cursor riêng
+
+        Dùng trong method nghiệp vụ (approve, outbox sender): upsert row của
+        process không nằm trong transaction của người dùng → các transaction
+        đồng thời trong cùng process không phải chờ lock row snapshot.
+        """
+        postcommit = self.env.cr.postcommit
+        if postcommit.data.get('vnfield.kafka.metric.snapshot.publish'):
+            return
+        postcommit.data['vnfield.kafka.metric.snapshot.publish'] = True
+        dbname = self.env.cr.dbname
+
+        @postcommit.add
+        def publish_snapshot():
+            try:
+                with Registry(dbname).cursor() as cr:
+                    api.Environment(cr, SUPERUSER_ID, {})['vnfield.kafka.metric.snapshot']._publish()
+            except Exception as e:
+                _logger.warning(f'Could not publish Kafka metrics snapshot: {e}')
+
+    @api.model
+    def _get_merged_metrics(self):
+        """
+        🧮 Metric gộp của mọi process còn mới (process hiện tại lấy số liệu trực tiếp)
+
+        Returns:
+            dict: Format kafka_metrics.merge_snapshots()
+        """
+        settings = self._get_snapshot_settings()
+        current = self._process_info()
+        threshold = fields.Datetime.now() - timedelta(seconds=settings['retention'])
+        records = self.sudo().search([('published_at', '>=', threshold)], order='published_at asc')
+        snapshots = [
+            ({'hostname': record.hostname, 'pid': record.pid}, record.snapshot or {})
+            for record in records
+            if record.process_key != current['process_key']
+        ]
+        snapshots.append(({'hostname': current['hostname'], 'pid': current['pid']}, kafka_metrics.snapshot_all()))
+        return kafka_metrics.merge_snapshots(snapshots)
@@ -0,0 +1,131 @@
+# -*- coding: utf-8 -*-
+
+# ===========================================
+# =        📍 KAFKA APPLIED OFFSETS          =
+# ===========================================
+
+"""
+┌────────────────────────────────────────────┐
+│  🧰 CHỨC NĂNG: OFFSET ĐÃ ÁP DỤNG VÀO DB     │
+│                                            │
+│ - Ghi offset cuối cùng của mỗi partition   │
+│   trong CÙNG transaction với sync_request  │
+│ - Commit offset lên Kafka chỉ sau khi DB   │
+│   commit (at-least-once)                   │
+│ - Khi được assign partition, consumer seek │
+│   tới offset đã lưu nếu broker bị tụt lại  │
+└────────────────────────────────────────────┘
+
+Chỉ dùng khi kafka.consumer_auto_commit = false.
+"""
+
+import logging
+
+from odoo import models, fields, api
+
+from .kafka_fields import BigInteger
+
+_logger = logging.getLogger(__name__)
+
+
+class KafkaOffset(models.Model):
+    """
+    📍 Offset cuối cùng đã ingest cho mỗi (group, topic, partition)
+    """
+
+    _name = 'vnfield.kafka.offset'
+    _description = 'Kafka Applied Offset'
+    _order = 'consumer_group, topic, partition'
+    _rec_name = 'topic'
+
+    consumer_group = fields.Char(string='Consumer Group', required=True, readonly=True)
+    topic = fields.Char(string='Topic', required=True, readonly=True)
+    partition = fields.Integer(string='Partition', required=True, readonly=True)
+    offset = BigInteger(string='Last Applied Offset', required=True, readonly=True,
+                        help='Offset của message cuối cùng đã được commit vào database')
+
+    _sql_constraints = [
+        ('group_topic_partition_uniq', 'unique(consumer_group, topic, partition)',
+         'Offset must be unique per consumer group, topic and partition!'),
+    ]
+
+    @api.model
+    def _record_offsets(self, consumer_group, offsets):
+        """
+        📝 Upsert offset đã áp dụng (trong transaction hiện tại)
+
+        Offset không bao giờ lùi lại: giữ GREATEST giữa giá trị cũ và mới.
+
+        Args:
+            consumer_group (str): group.id của consumer
+            offsets (dict): {(topic, partition): offset của message cuối cùng}
+        """
+        if not offsets:
+            return
+        values = []
+        params = []
+        for (topic, partition), offset in offsets.items():
+            values.append("(%s, %s, %s, %s, %s, (now() AT TIME ZONE 'UTC'), %s, (now() AT TIME ZONE 'UTC'))")
+            params.extend([consumer_group, topic, partition, offset, self.env.uid, self.env.uid])
+        self.env.cr.execute(f"""
+            INSERT INTO vnfield_kafka_offset
+                (consumer_group, topic, partition, "offset", create_uid, create_date, write_uid, write_date)
+            VALUES {', '.join(values)}
+            ON CONFLICT (consumer_group, topic, partition) DO UPDATE
+               SET "offset" = GREATEST(vnfield_kafka_offset."offset", EXCLUDED."offset"),
+                   write_uid = EXCLUDED.write_uid,
+                   write_date = EXCLUDED.write_date
+        """, params)
+
+    @api.model
+    def _get_offsets(self, consumer_group, topic_partitions):
+        """
+        🔍 Đọc offset đã áp dụng
+
+        Args:
+            consumer_group (str): group.id của consumer
+            topic_partitions (list): List tuple (topic, partition)
+
+        Returns:
+            dict: {(topic, partition): offset}
+        """
+        if not topic_partitions:
+            return {}
+        topics = list({topic for topic, _partition in topic_partitions})
+        self.env.cr.execute("""
+            SELECT topic, partition, "offset" FROM vnfield_kafka_offset
+             WHERE consumer_group = %s AND topic IN %s
+        """, [consumer_group, tuple(topics)])
+        wanted = set(topic_partitions)
+        return {
+            (topic, partition): offset
+            for topic, partition, offset in self.env.cr.fetchall()
+            if (topic, partition) in wanted
+        }
+
+    @api.model
+    def _get_checkpoints(self, topic_partitions):
+        """
+        📌 Checkpoint cho group mới: offset lớn nhất đã áp dụng vào database
+        này, của bất kỳ consumer group nào (catch-up policy 'checkpoint')
+
+        Args:
+            topic_partitions (list): List tuple (topic, partition)
+
+        Returns:
+            dict: {(topic, partition): offset}
+        """
+        if not topic_partitions:
+            return {}
+        topics = list({topic for topic, _partition in topic_partitions})
+        self.env.cr.execute("""
+            SELECT topic, partition, MAX("offset") FROM vnfield_kafka_offset
+             WHERE topic IN %s
+             GROUP BY topic, partition
+        """, [tuple(topics)])
+        wanted = set(topic_partitions)
+        return {
+            (topic, partition): offset
+            for topic, partition, offset in self.env.cr.fetchall()
+            if (topic, partition) in wanted
+        }
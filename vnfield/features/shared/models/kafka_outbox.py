@@ -0,0 +1,425 @@
+# -*- coding: utf-8 -*-
+
+# ===========================================
+# =         📮 KAFKA OUTBOX                  =
+# ===========================================
+
+"""
+┌────────────────────────────────────────────┐
+│  🧰 CHỨC NĂNG: TRANSACTIONAL OUTBOX         │
+│                                            │
+│ - Ghi event vào bảng trong cùng transaction│
+│ - Cron drain publish theo batch lớn        │
+│ - Đánh dấu delivered, retry khi lỗi        │
+└────────────────────────────────────────────┘
+
+Các action ORM (đăng ký user, map user, auto-matching) không gọi Kafka
+trực tiếp nữa mà ghi vào outbox. Nếu transaction rollback thì row outbox
+cũng biến mất → không còn "phantom event"; request UI trả về ngay mà
+không phải chờ broker.
+
+Sau khi transaction commit, cr.postcommit giao id vừa ghi cho thread nền
+(utils/kafka_outbox_sender.py) để publish ngay thay vì chờ lần chạy cron
+kế tiếp; cron drain vẫn là lưới an toàn cho message thread chưa gửi được.
+"""
+
+import json
+import logging
+from datetime import timedelta
+
+from odoo import models, fields, api, tools, _
+
+from ..utils import kafka_codec, kafka_lanes, kafka_metrics, kafka_outbox_sender
+
+_logger = logging.getLogger(__name__)
+
+
+class KafkaOutbox(models.Model):
+    """
+    📮 Kafka Outbox
+
+    Mỗi record là một message chờ publish lên Kafka.
+    Workflow: pending → delivered (hoặc failed sau khi hết số lần retry)
+    """
+
+    _name = 'vnfield.kafka.outbox'
+    _description = 'Kafka Outbox Message'
+    _order = 'id desc'
+    _rec_name = 'action'
+
+    # ─────────────────────────────────────────────
+    # ▶ Fields
+    # ─────────────────────────────────────────────
+
+    topic = fields.Char(string='Topic', required=True, readonly=True)
+    message_key = fields.Char(string='Key', readonly=True)
+    payload = fields.Text(string='Payload', required=True, readonly=True,
+                          help='Nội dung message đã serialize (JSON)')
+    headers = fields.Text(string='Headers', readonly=True,
+                          help='Headers của message (JSON object)')
+    action = fields.Char(string='Action', readonly=True,
+                         help='Tên action lấy từ payload (để tra cứu)')
+    priority = fields.Selection([
+        (kafka_lanes.PRIORITY_INTERACTIVE, 'Interactive'),    # Thao tác người dùng, gửi trước
+        (kafka_lanes.PRIORITY_BULK, 'Bulk'),                  # Sync hàng loạt, chỉ cron drain
+    ], string='Priority', default=kafka_lanes.PRIORITY_INTERACTIVE, required=True, readonly=True)
+
+    state = fields.Selection([
+        ('pending', 'Pending'),         # Chờ publish
+        ('delivered', 'Delivered'),     # Broker đã xác nhận
+        ('failed', 'Failed'),           # Hết số lần retry
+    ], string='Status', default='pending', required=True, index=True, readonly=True)
+
+    attempt_count = fields.Integer(string='Attempts', default=0, readonly=True)
+    next_attempt_at = fields.Datetime(string='Next Attempt', readonly=True,
+                                      help='Thời điểm sớm nhất được retry')
+    delivered_at = fields.Datetime(string='Delivered At', readonly=True)
+    last_error = fields.Text(string='Last Error', readonly=True)
+
+    def init(self):
+        """📇 Index partial cho drain theo lane: chỉ row pending, theo (priority, id)"""
+        tools.create_index(
+            self.env.cr, 'vnfield_kafka_outbox_pending_lane_idx', self._table,
+            ['priority', 'id'], where="state = 'pending'",
+        )
+
+    # ─────────────────────────────────────────────
+    # ▶ Enqueue API
+    # ─────────────────────────────────────────────
+
+    @api.model
+    def _prepare_outbox_vals(self, topic, message, key=None, headers=None, priority=None):
+        """
+        📝 vals của một outbox record (message_id, routing headers, topic/key, lane)
+
+        Returns:
+            dict: vals cho create()
+        """
+        priority = kafka_lanes.normalize_priority(priority)
+        # 🚦 Topic của lane trước, routing theo destination sau
+        topic = self.env['vnfield.pubsub.service']._lane_topic(topic, priority)
+        if isinstance(message, dict):
+            action = message.get('action')
+            pubsub_service = self.env['vnfield.pubsub.service']
+            # 🆔 message_id để consumer dedupe khi deliver lại
+            message = pubsub_service._ensure_message_id(message)
+            # 🏷️ destination/action/source → headers để consumer lọc không cần decode
+            headers = pubsub_service._build_routing_headers(message, headers)
+            # 🧭 Topic/key theo destination (vnfield.kafka.routing_mode)
+            topic, key = pubsub_service._route_message(topic, message, key)
+            payload = json.dumps(message, ensure_ascii=False, default=str)
+        else:
+            action = False
+            payload = message
+
+        return {
+            'topic': topic,
+            'message_key': key or False,
+            'payload': payload,
+            'headers': json.dumps(headers, ensure_ascii=False) if headers else False,
+            'action': action or False,
+            'priority': priority,
+        }
+
+    @api.model
+    def enqueue(self, topic, message, key=None, headers=None, priority=None):
+        """
+        📥 Ghi message vào outbox trong transaction hiện tại
+
+        Args:
+            topic (str): Topic đích
+            message (dict|str): Nội dung message
+            key (str, optional): Key cho message
+            headers (dict, optional): Headers cho message
+            priority (str, optional): 'interactive' (mặc định) | 'bulk'
+
+        Returns:
+            vnfield.kafka.outbox: Record vừa tạo
+        """
+        return self.enqueue_many(topic, [message], keys=[key], headers=headers, priority=priority)
+
+    @api.model
+    def enqueue_many(self, topic, messages, keys=None, headers=None, priority=None):
+        """
+        📥 Ghi nhiều message vào outbox bằng MỘT create([...])
+
+        Dùng cho các emitter gửi nhiều message cùng lúc (vd: cross-match gửi
+        cho cả hai phía); cron drain publish cả nhóm trong một lần flush.
+
+        Args:
+            topic (str): Topic đích
+            messages (list): List message (dict|str)
+            keys (list, optional): Key tương ứng từng message
+            headers (dict|list, optional): Headers dùng chung, hoặc list headers
+                tương ứng từng message
+            priority (str, optional): 'interactive' (mặc định) | 'bulk' — bulk đi
+                vào topic của lane bulk và chỉ được gửi bởi cron drain
+
+        Returns:
+            vnfield.kafka.outbox: Các record vừa tạo (cùng thứ tự messages)
+        """
+        messages = list(messages)
+        keys = list(keys) if keys is not None else [None] * len(messages)
+        if headers is None or isinstance(headers, dict):
+            headers = [headers] * len(messages)
+        vals_list = [
+            self._prepare_outbox_vals(topic, message, key, message_headers, priority)
+            for message, key, message_headers in zip(messages, keys, headers)
+        ]
+        records = self.sudo().create(vals_list)
+        _logger.debug(f'Queued {len(records)} outbox messages for topic {topic}')
+        # 🚦 Backfill bulk không chiếm thread sender của message interactive
+        if kafka_lanes.normalize_priority(priority) == kafka_lanes.PRIORITY_INTERACTIVE:
+            self._send_after_commit(records.ids)
+        return records
+
+    @api.model
+    def _send_after_commit(self, outbox_ids):
+        """
+        ⏭️ Gửi outbox ngay sau khi transaction hiện tại commit
+
+        Mọi id của cùng transaction được gom vào một callback cr.postcommit;
+        rollback làm Odoo bỏ callback nên không có gì được gửi. Id thuộc
+        savepoint đã rollback không còn row pending nên sender bỏ qua.
+        """
+        settings = self._get_drain_settings()
+        if not settings['send_on_commit'] or not outbox_ids:
+            return
+        postcommit = self.env.cr.postcommit
+        pending_ids = postcommit.data.get('vnfield.kafka.outbox.send_ids')
+        if pending_ids is not None:
+            pending_ids.extend(outbox_ids)
+            return
+        pending_ids = postcommit.data['vnfield.kafka.outbox.send_ids'] = list(outbox_ids)
+        dbname = self.env.cr.dbname
+        queue_size = settings['sender_queue_size']
+
+        @postcommit.add
+        def submit_to_sender():
+            kafka_outbox_sender.submit(dbname, pending_ids, queue_size=queue_size)
+
+    # ─────────────────────────────────────────────
+    # ▶ Drain Worker
+    # ─────────────────────────────────────────────
+
+    def _get_drain_settings(self):
+        """🔧 Đọc cấu hình drain từ system parameters"""
+        settings = self.env['vnfield.pubsub.service']._get_settings()
+        return {
+            'batch_size': settings.get_int('vnfield.kafka.outbox_batch_size', 500),
+            'max_attempts': settings.get_int('vnfield.kafka.outbox_max_attempts', 10),
+            'flush_timeout': settings.get_float('vnfield.kafka.outbox_flush_timeout', 30),
+            'send_on_commit': settings.get_bool('vnfield.kafka.outbox_send_on_commit', True),
+            'sender_queue_size': settings.get_int('vnfield.kafka.outbox_sender_queue_size',
+                                                  kafka_outbox_sender.DEFAULT_QUEUE_SIZE),
+        }
+
+    def _lock_pending_batch(self, batch_size):
+        """
+        🔒 Lấy một batch outbox đến hạn, khoá row (SKIP LOCKED)
+
+        Nhiều cron worker có thể drain song song mà không publish trùng.
+        Lane interactive được lấy trước, bulk lấp phần còn lại của batch →
+        message của người dùng không phải chờ sau backlog bulk.
+        """
+        outbox_ids = []
+        for priority in kafka_lanes.PRIORITIES:
+            remaining = batch_size - len(outbox_ids)
+            if remaining <= 0:
+                break
+            self.env.cr.execute("""
+                SELECT id FROM vnfield_kafka_outbox
+                 WHERE state = 'pending'
+                   AND priority = %s
+                   AND (next_attempt_at IS NULL OR next_attempt_at <= (now() AT TIME ZONE 'UTC'))
+                 ORDER BY id
+                 LIMIT %s
+                   FOR UPDATE SKIP LOCKED
+            """, [priority, remaining])
+            outbox_ids.extend(row[0] for row in self.env.cr.fetchall())
+        return self.browse(outbox_ids)
+
+    def _lock_pending_ids(self, outbox_ids):
+        """🔒 Khoá các outbox id còn pending (SKIP LOCKED: cron đang gửi thì bỏ qua)"""
+        self.env.cr.execute("""
+            SELECT id FROM vnfield_kafka_outbox
+             WHERE id IN %s
+               AND state = 'pending'
+             ORDER BY id
+               FOR UPDATE SKIP LOCKED
+        """, [tuple(outbox_ids)])
+        return self.browse([row[0] for row in self.env.cr.fetchall()])
+
+    @api.model
+    def _send_committed(self, outbox_ids):
+        """
+        🚚 Publish các outbox vừa commit (gọi từ thread sender, cursor riêng)
+
+        Returns:
+            int: Số message đã deliver
+        """
+        batch = self._lock_pending_ids(outbox_ids)
+        if not batch:
+            return 0
+        settings = self._get_drain_settings()
+        try:
+            results = batch._publish_batch(settings['flush_timeout'])
+        except Exception as e:
+            _logger.error(f'Outbox post-commit send failed: {e}')
+            results = {record.id: str(e) for record in batch}
+        delivered = batch._apply_results(results, settings['max_attempts'])
+        self.env['vnfield.kafka.metric.snapshot']._publish_after_commit()
+        return delivered
+
+    def _publish_batch(self, flush_timeout):
+        """
+        📤 Publish các record trong self, flush một lần cho cả batch
+
+        Returns:
+            dict: {outbox_id: error_string hoặc None nếu delivered}
+        """
+        pubsub_service = self.env['vnfield.pubsub.service'].create({})
+        pubsub_service._check_kafka_availability()
+        producer = pubsub_service._get_producer(pubsub_service._get_producer_config())
+        codec = pubsub_service._get_codec()
+
+        results = {}
+
+        def make_callback(outbox_id):
+            def delivery_report(err, msg):
+                results[outbox_id] = str(err) if err is not None else None
+            return delivery_report
+
+        for record in self:
+            produce_kwargs = {
+                'topic': record.topic,
+                'key': record.message_key.encode('utf-8') if record.message_key else None,
+                'callback': make_callback(record.id),
+            }
+            try:
+                headers = json.loads(record.headers) if record.headers else None
+                is_object = record.payload.lstrip().startswith('{')
+                if codec == kafka_codec.CODEC_JSON or not is_object:
+                    # Payload đã là JSON (hoặc string thô) → gửi nguyên văn
+                    produce_kwargs['value'] = record.payload.encode('utf-8')
+                    produce_kwargs['headers'] = headers
+                    if is_object:
+                        produce_kwargs['headers'] = dict(
+                            headers or {}, **{kafka_codec.CONTENT_TYPE_HEADER: kafka_codec.CONTENT_TYPES[codec]}
+                        )
+                else:
+                    produce_kwargs['value'], produce_kwargs['headers'] = pubsub_service._encode_payload(
+                        json.loads(record.payload), headers, codec
+                    )
+                # 🎯 keyed routing: partition cố định theo destination
+                partition = pubsub_service._resolve_partition(producer, record.topic, record.message_key)
+                if partition is not None:
+                    produce_kwargs['partition'] = partition
+                try:
+                    producer.produce(**produce_kwargs)
+                except BufferError:
+                    producer.poll(1)
+                    producer.produce(**produce_kwargs)
+            except Exception as e:
+                results[record.id] = str(e)
+
+        producer.flush(timeout=flush_timeout)
+
+        # Message chưa có delivery report sau flush → coi như lỗi, sẽ retry
+        for record in self:
+            results.setdefault(record.id, 'Delivery not confirmed before flush timeout')
+        return results
+
+    def _apply_results(self, results, max_attempts):
+        """✍️ Ghi kết quả publish: delivered ghi một lần, lỗi thì lên lịch retry"""
+        now = fields.Datetime.now()
+        delivered = self.filtered(lambda r: results.get(r.id) is None)
+        if delivered:
+            delivered.write({
+                'state': 'delivered',
+                'delivered_at': now,
+                'last_error': False,
+            })
+        for record in self - delivered:
+            attempts = record.attempt_count + 1
+            # ⏱️ Exponential backoff: 30s, 60s, 120s ... tối đa 1 giờ
+            delay = min(30 * (2 ** (attempts - 1)), 3600)
+            record.write({
+                'attempt_count': attempts,
+                'state': 'failed' if attempts >= max_attempts else 'pending',
+                'next_attempt_at': now + timedelta(seconds=delay),
+                'last_error': results[record.id],
+            })
+        dbname = self.env.cr.dbname
+        kafka_metrics.incr('outbox_delivered', len(delivered), dbname=dbname)
+        kafka_metrics.incr('delivery_failures', len(self - delivered), dbname=dbname)
+        return len(delivered)
+
+    @api.model
+    def _cron_drain_outbox(self, max_batches=20):
+        """
+        ⏰ Cron: publish outbox theo batch lớn
+
+        Mỗi batch được commit riêng để giải phóng lock và không mất kết quả
+        nếu batch sau lỗi.
+
+        Args:
+            max_batches (int): Số batch tối đa trong một lần chạy cron
+
+        Returns:
+            int: Tổng số message đã deliver
+        """
+        settings = self._get_drain_settings()
+        total_delivered = 0
+
+        for _i in range(max_batches):
+            batch = self._lock_pending_batch(settings['batch_size'])
+            if not batch:
+                break
+            try:
+                results = batch._publish_batch(settings['flush_timeout'])
+            except Exception as e:
+                _logger.error(f'Outbox drain failed: {e}')
+                results = {record.id: str(e) for record in batch}
+            total_delivered += batch._apply_results(results, settings['max_attempts'])
+            self.env.cr.commit()
+            if len(batch) < settings['batch_size']:
+                break
+
+        if total_delivered:
+            _logger.info(f'Outbox drain delivered {total_delivered} messages')
+        self.env['vnfield.kafka.metric.snapshot']._publish()
+        return total_delivered
+
+    # ─────────────────────────────────────────────
+    # ▶ UI Actions
+    # ─────────────────────────────────────────────
+
+    def action_retry(self):
+        """🔁 Đưa message failed về pending để drain lại ngay"""
+        self.filtered(lambda r: r.state == 'failed').write({
+            'state': 'pending',
+            'attempt_count': 0,
+            'next_attempt_at': False,
+        })
+        return True
+
+    @api.model
+    def action_drain_now(self):
+        """
+        🚀 Yêu cầu cron drain chạy ngay (không chờ lịch)
+
+        Drain commit theo từng batch nên chạy trong cron worker, không chạy
+        trên cursor của request UI.
+        """
+        self.env.ref('vnfield.cron_kafka_outbox_drain').sudo()._trigger()
+        return {
+            'type': 'ir.actions.client',
+            'tag': 'display_notification',
+            'params': {
+                'title': _('Outbox Drain Scheduled'),
+                'message': _('The outbox drain cron will run shortly'),
+                'type': 'info',
+                'sticky': False,
+            }
+        }
@@ -0,0 +1,316 @@
+# -*- coding: utf-8 -*-
+
+# ===========================================
+# =    🔗 KAFKA REQUEST / REPLY CORRELATION   =
+# ===========================================
+
+"""
+┌────────────────────────────────────────────┐
+│  🧰 CHỨC NĂNG: THEO DÕI ROUND-TRIP          │
+│                                            │
+│ - Message request mang correlation_id      │
+│   (payload + header), bên trả lời gửi lại  │
+│   đúng correlation_id trong reply          │
+│ - Mỗi request chờ reply là một row, có     │
+│   expires_at (index partial khi pending)   │
+│ - Reply ingest → đo latency theo từng chặng│
+│   (outbox, site đối tác, đường về)         │
+│ - Cron đánh dấu expired khi quá hạn        │
+└────────────────────────────────────────────┘
+
+Ví dụ: action_register_user gửi register_user và chờ register_user_map.
+Latency được ghi vào row (xem theo pivot / graph) và vào histogram
+kafka_metrics theo label pair (request->reply) + partner (destination).
+
+Hợp đồng reply: site đối tác phải chép nguyên correlation_id của request
+(field payload 'correlation_id', cũng có ở header) vào payload của reply.
+Partner chưa làm việc này thì reply vẫn được ingest bình thường nhưng không
+nối được với request. Khi một cặp (action_pair, partner) chưa từng trả về
+reply có correlation_id, row quá hạn được đánh dấu 'uncorrelated' thay vì
+'expired' và không tính vào replies_expired → không báo động giả.
+"""
+
+import logging
+import uuid
+from datetime import datetime, timedelta, timezone
+
+from odoo import models, fields, api, tools, _
+
+from ..utils import kafka_metrics
+
+_logger = logging.getLogger(__name__)
+
+# 💡 NOTE(assistant): Field envelope dùng để nối request và reply
+CORRELATION_FIELD = 'correlation_id'
+
+
+class KafkaPendingReply(models.Model):
+    """
+    🔗 Kafka Pending Reply
+
+    Mỗi record là một request cross-site đang (hoặc đã) chờ reply.
+    Workflow: pending → replied, hoặc pending → expired / uncorrelated (→ late nếu reply đến sau hạn)
+    """
+
+    _name = 'vnfield.kafka.pending.reply'
+    _description = 'Kafka Pending Reply'
+    _order = 'id desc'
+    _rec_name = 'correlation_id'
+
+    # ─────────────────────────────────────────────
+    # ▶ Fields
+    # ─────────────────────────────────────────────
+
+    correlation_id = fields.Char(string='Correlation ID', required=True, readonly=True, index=True)
+    request_action = fields.Char(string='Request Action', required=True, readonly=True)
+    reply_action = fields.Char(string='Expected Reply', required=True, readonly=True)
+    action_pair = fields.Char(string='Action Pair', readonly=True,
+                              help='request_action->reply_action (label của histogram)')
+    partner = fields.Char(string='Partner Site', readonly=True, index=True,
+                          help='Destination của request (site trả lời)')
+    outbox_id = fields.Many2one('vnfield.kafka.outbox', string='Outbox Message', readonly=True,
+                                ondelete='set null')
+    reply_sync_request_id = fields.Many2one('vnfield.sync.request', string='Reply Sync Request',
+                                            readonly=True, ondelete='set null')
+
+    state = fields.Selection([
+        ('pending', 'Pending'),         # Chờ reply
+        ('replied', 'Replied'),         # Reply đến trước hạn
+        ('expired', 'Expired'),         # Quá hạn, chưa có reply
+        ('uncorrelated', 'No Correlated Reply'),  # Quá hạn, partner chưa từng gửi lại correlation_id
+        ('late', 'Late Reply'),         # Reply đến sau khi đã expired
+    ], string='Status', default='pending', required=True, index=True, readonly=True)
+
+    expires_at = fields.Datetime(string='Expires At', required=True, readonly=True)
+    replied_at = fields.Datetime(string='Replied At', readonly=True)
+
+    # ⏱️ Latency theo chặng (giây)
+    roundtrip_seconds = fields.Float(string='Round Trip (s)', readonly=True, group_operator='avg',
+                                     help='Từ lúc ghi request đến khi reply được ingest')
+    outbox_seconds = fields.Float(string='Outbox Wait (s)', readonly=True, group_operator='avg',
+                                  help='Từ lúc ghi outbox đến khi broker xác nhận request')
+    remote_seconds = fields.Float(string='Partner Time (s)', readonly=True, group_operator='avg',
+                                  help='Từ lúc request được publish đến khi partner produce reply')
+    transit_seconds = fields.Float(string='Reply Transit (s)', readonly=True, group_operator='avg',
+                                   help='Từ lúc partner produce reply đến khi reply được ingest')
+
+    _sql_constraints = [
+        ('correlation_id_uniq', 'unique(correlation_id)', 'Correlation ID must be unique!'),
+    ]
+
+    def init(self):
+        """📇 Index partial cho sweeper: chỉ row pending, theo expires_at"""
+        tools.create_index(
+            self.env.cr, 'vnfield_kafka_pending_reply_expiry_idx', self._table,
+            ['expires_at'], where="state = 'pending'",
+        )
+        # Sweeper kiểm tra partner đã từng trả reply có correlation_id chưa
+        tools.create_index(
+            self.env.cr, 'vnfield_kafka_pending_reply_answered_idx', self._table,
+            ['action_pair', 'partner'], where="state IN ('replied', 'late')",
+        )
+
+    def _get_reply_settings(self):
+        """🔧 Đọc cấu hình reply tracking từ system parameters"""
+        settings = self.env['vnfield.pubsub.service']._get_settings()
+        return {
+            'timeout': settings.get_int('vnfield.kafka.reply_timeout', 3600),
+            'batch_size': settings.get_int('vnfield.kafka.reply_sweep_batch_size', 500),
+        }
+
+    # ─────────────────────────────────────────────
+    # ▶ Request API
+    # ─────────────────────────────────────────────
+
+    @api.model
+    def enqueue_request(self, topic, message, reply_action, key=None, headers=None, timeout=None):
+        """
+        📤 Ghi request vào outbox kèm correlation_id và đăng ký chờ reply
+
+        Reply chỉ được nối nếu partner chép correlation_id vào payload reply
+        (xem hợp đồng reply ở đầu module).
+
+        Args:
+            topic (str): Topic đích
+            message (dict): Payload request (phải có 'action')
+            reply_action (str): Action của reply mong đợi (vd: register_user_map)
+            key (str, optional): Key cho message
+            headers (dict, optional): Headers cho message
+            timeout (int, optional): Số giây chờ reply (mặc định vnfield.kafka.reply_timeout)
+
+        Returns:
+            vnfield.kafka.outbox: Outbox record của request
+        """
+        message = dict(message)
+        message.setdefault(CORRELATION_FIELD, uuid.uuid4().hex)
+        outbox = self.env['vnfield.kafka.outbox'].enqueue(topic, message, key=key, headers=headers)
+        if timeout is None:
+            timeout = self._get_reply_settings()['timeout']
+        self.sudo().create({
+            'correlation_id': message[CORRELATION_FIELD],
+            'request_action': message['action'],
+            'reply_action': reply_action,
+            'action_pair': f"{message['action']}->{reply_action}",
+            'partner': message.get('destination') or False,
+            'outbox_id': outbox.id,
+            'expires_at': fields.Datetime.now() + timedelta(seconds=timeout),
+        })
+        return outbox
+
+    # ─────────────────────────────────────────────
+    # ▶ Reply Matching
+    # ─────────────────────────────────────────────
+
+    @staticmethod
+    def _kafka_timestamp(timestamp):
+        """🕒 Timestamp Kafka (type, ms) hoặc ms → datetime UTC naive (None nếu không có)"""
+        if isinstance(timestamp, (tuple, list)):
+            timestamp = timestamp[1] if timestamp and timestamp[0] else None
+        if not timestamp or timestamp <= 0:
+            return None
+        return datetime.fromtimestamp(timestamp / 1000.0, timezone.utc).replace(tzinfo=None)
+
+    @api.model
+    def _resolve_replies(self, replies):
+        """
+        📥 Nối reply vừa ingest với request đang chờ và ghi latency
+
+        Args:
+            replies (list): List dict correlation_id, action, timestamp (Kafka
+                timestamp của reply, có thể None), sync_request_id
+
+        Returns:
+            int: Số request được nối với reply
+        """
+        by_correlation = {reply['correlation_id']: reply for reply in replies if reply.get('correlation_id')}
+        if not by_correlation:
+            return 0
+        records = self.sudo().search([
+            ('correlation_id', 'in', list(by_correlation)),
+            ('state', 'in', ('pending', 'expired', 'uncorrelated')),
+        ])
+        now = fields.Datetime.now()
+        dbname = self.env.cr.dbname
+        resolved = 0
+        for record in records:
+            reply = by_correlation[record.correlation_id]
+            if reply.get('action') != record.reply_action:
+                continue
+            produced_at = self._kafka_timestamp(reply.get('timestamp'))
+            published_at = record.outbox_id.delivered_at if record.outbox_id else None
+            vals = {
+                'state': 'replied' if record.state == 'pending' else 'late',
+                'replied_at': now,
+                'reply_sync_request_id': reply.get('sync_request_id') or False,
+                'roundtrip_seconds': (now - record.create_date).total_seconds(),
+            }
+            if published_at:
+                vals['outbox_seconds'] = max((published_at - record.create_date).total_seconds(), 0.0)
+            if produced_at:
+                vals['transit_seconds'] = max((now - produced_at).total_seconds(), 0.0)
+                if published_at:
+                    vals['remote_seconds'] = max((produced_at - published_at).total_seconds(), 0.0)
+            record.write(vals)
+
+            labels = {'dbname': dbname, 'pair': record.action_pair, 'partner': record.partner or ''}
+            kafka_metrics.incr('replies_received' if vals['state'] == 'replied' else 'replies_late', **labels)
+            for stage in ('roundtrip', 'outbox', 'remote', 'transit'):
+                if f'{stage}_seconds' in vals:
+                    kafka_metrics.observe_histogram(f'reply_{stage}_seconds', vals[f'{stage}_seconds'], **labels)
+            resolved += 1
+        return resolved
+
+    # ─────────────────────────────────────────────
+    # ▶ Timeout Sweeper
+    # ─────────────────────────────────────────────
+
+    def _expire_due_batch(self, batch_size):
+        """
+        ⌛ Đánh dấu một batch request quá hạn (SKIP LOCKED)
+
+        Cặp (action_pair, partner) đã từng có reply được nối → 'expired';
+        chưa từng có (partner chưa theo hợp đồng reply) → 'uncorrelated'.
+        """
+        self.env.cr.execute("""
+            UPDATE vnfield_kafka_pending_reply AS request
+               SET state = CASE WHEN EXISTS (
+                           SELECT 1 FROM vnfield_kafka_pending_reply answered
+                            WHERE answered.state IN ('replied', 'late')
+                              AND answered.action_pair = request.action_pair
+                              AND answered.partner IS NOT DISTINCT FROM request.partner
+                       ) THEN 'expired' ELSE 'uncorrelated' END,
+                   write_uid = %s,
+                   write_date = (now() AT TIME ZONE 'UTC')
+             WHERE id IN (
+                    SELECT id FROM vnfield_kafka_pending_reply
+                     WHERE state = 'pending'
+                       AND expires_at <= (now() AT TIME ZONE 'UTC')
+                     ORDER BY expires_at
+                     LIMIT %s
+                       FOR UPDATE SKIP LOCKED
+             )
+            RETURNING action_pair, partner, state
+        """, [self.env.uid, batch_size])
+        return self.env.cr.fetchall()
+
+    @api.model
+    def _cron_expire_pending_replies(self, max_batches=10):
+        """
+        ⏰ Cron: đánh dấu expired các request không có reply trong thời hạn
+
+        Mỗi batch được commit riêng để giải phóng lock. Chỉ row 'expired'
+        được tính vào replies_expired; row 'uncorrelated' (partner chưa gửi
+        lại correlation_id) được đếm riêng bằng replies_uncorrelated.
+
+        Returns:
+            int: Tổng số request đã quá hạn (expired + uncorrelated)
+        """
+        settings = self._get_reply_settings()
+        dbname = self.env.cr.dbname
+        counts = {}
+        for _i in range(max_batches):
+            rows = self._expire_due_batch(settings['batch_size'])
+            self.env.cr.commit()
+            for row in rows:
+                counts[row] = counts.get(row, 0) + 1
+            if len(rows) < settings['batch_size']:
+                break
+        if counts:
+            self.invalidate_model(['state'])
+        for (action_pair, partner, state), count in counts.items():
+            labels = {'dbname': dbname, 'pair': action_pair or '', 'partner': partner or ''}
+            if state == 'expired':
+                kafka_metrics.incr('replies_expired', count, **labels)
+                _logger.warning(f'{count} {action_pair} requests to {partner} expired without a reply')
+            else:
+                kafka_metrics.incr('replies_uncorrelated', count, **labels)
+                _logger.info(
+                    f'{count} {action_pair} requests to {partner} timed out; the partner has never '
+                    f'returned a correlated reply'
+                )
+        self.env['vnfield.kafka.metric.snapshot']._publish()
+        return sum(counts.values())
+
+    # ─────────────────────────────────────────────
+    # ▶ UI Actions
+    # ─────────────────────────────────────────────
+
+    @api.model
+    def action_expire_now(self):
+        """
+        🚀 Yêu cầu cron sweeper chạy ngay (không chờ lịch)
+
+        Sweeper commit theo từng batch nên chạy trong cron worker, không chạy
+        trên cursor của request UI.
+        """
+        self.env.ref('vnfield.cron_kafka_pending_reply_expire').sudo()._trigger()
+        return {
+            'type': 'ir.actions.client',
+            'tag': 'display_notification',
+            'params': {
+                'title': _('Pending Reply Check Scheduled'),
+                'message': _('The pending reply sweeper cron will run shortly'),
+                'type': 'info',
+                'sticky': False,
+            }
+        }
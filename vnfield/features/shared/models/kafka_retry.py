@@ -0,0 +1,365 @@
+# -*- coding: utf-8 -*-
+
+# ===========================================
+# =     🔁 KAFKA RETRY QUEUE / DEAD LETTER    =
+# ===========================================
+
+"""
+┌────────────────────────────────────────────┐
+│  🧰 CHỨC NĂNG: RETRY + DEAD-LETTER TOPIC    │
+│                                            │
+│ - Message có handler lỗi được ghi vào bảng │
+│   trong CÙNG transaction với batch         │
+│ - Cron chạy lại handler, exponential       │
+│   backoff giữa các lần thử                 │
+│ - Hết số lần thử → publish sang DLQ topic  │
+│   (qua outbox) và đánh dấu dead            │
+└────────────────────────────────────────────┘
+
+Message lỗi không làm dừng stream chính: offset vẫn được commit vì message
+đã được lưu an toàn ở đây. Handler được lưu dưới dạng (model, method) để
+cron gọi lại trong environment của nó.
+
+Message không thể thử lại (payload không decode được, hoặc handler không
+phải method của model) được ghi thẳng ở trạng thái dead và đưa sang DLQ
+topic trong cùng transaction → offset được commit mà message không mất.
+"""
+
+import base64
+import json
+import logging
+from datetime import timedelta
+
+from odoo import models, fields, api, _
+
+from ..utils import kafka_metrics
+from .kafka_fields import BigInteger
+
+_logger = logging.getLogger(__name__)
+
+# 💡 NOTE(assistant): Header thêm vào message khi đưa sang DLQ topic
+DLQ_HEADERS_PREFIX = 'x-vnfield-'
+
+
+class KafkaRetry(models.Model):
+    """
+    🔁 Kafka Retry Queue
+
+    Mỗi record là một message có handler lỗi.
+    Workflow: pending → resolved (handler thành công) hoặc dead (hết số lần thử)
+    """
+
+    _name = 'vnfield.kafka.retry'
+    _description = 'Kafka Retry Message'
+    _order = 'id desc'
+    _rec_name = 'action'
+
+    # ─────────────────────────────────────────────
+    # ▶ Fields
+    # ─────────────────────────────────────────────
+
+    topic = fields.Char(string='Topic', required=True, readonly=True)
+    partition = fields.Integer(string='Partition', readonly=True)
+    offset = BigInteger(string='Offset', readonly=True)
+    message_key = fields.Char(string='Key', readonly=True)
+    message_uid = fields.Char(string='Message UID', readonly=True, index=True)
+    payload = fields.Text(string='Payload', readonly=True,
+                          help='Nội dung message đã decode (JSON)')
+    headers = fields.Text(string='Headers', readonly=True,
+                          help='Headers của message (JSON object)')
+    action = fields.Char(string='Action', readonly=True,
+                         help='Tên action lấy từ payload (để tra cứu)')
+
+    handler_model = fields.Char(string='Handler Model', readonly=True,
+                                help='Rỗng khi message không thể gọi lại handler (dead letter ngay)')
+    handler_method = fields.Char(string='Handler Method', readonly=True)
+    handler_kind = fields.Selection([
+        ('message', 'Message Handler'),     # handler(headers, value[, message_info])
+        ('batch', 'Batch Handler'),         # handler([(headers, value, message_info)])
+        ('undecodable', 'Undecodable Payload'),     # Decode lỗi, payload thô (base64) → DLQ
+        ('unbound', 'Non-model Handler'),   # Handler không phải method của model → DLQ
+    ], string='Handler Kind', default='message', required=True, readonly=True)
+
+    state = fields.Selection([
+        ('pending', 'Pending'),         # Chờ thử lại
+        ('resolved', 'Resolved'),       # Handler đã thành công
+        ('dead', 'Dead Letter'),        # Hết số lần thử, đã đưa sang DLQ
+    ], string='Status', default='pending', required=True, index=True, readonly=True)
+
+    attempt_count = fields.Integer(string='Attempts', default=1, readonly=True)
+    next_attempt_at = fields.Datetime(string='Next Attempt', readonly=True,
+                                      help='Thời điểm sớm nhất được thử lại')
+    resolved_at = fields.Datetime(string='Resolved At', readonly=True)
+    dlq_topic = fields.Char(string='Dead-letter Topic', readonly=True)
+    last_error = fields.Text(string='Last Error', readonly=True)
+
+    # ─────────────────────────────────────────────
+    # ▶ Settings
+    # ─────────────────────────────────────────────
+
+    def _get_retry_settings(self):
+        """🔧 Đọc cấu hình retry từ system parameters"""
+        settings = self.env['vnfield.pubsub.service']._get_settings()
+        return {
+            'batch_size': settings.get_int('vnfield.kafka.retry_batch_size', 100),
+            'max_attempts': settings.get_int('vnfield.kafka.retry_max_attempts', 5),
+            'backoff_base': settings.get_int('vnfield.kafka.retry_backoff_base', 30),
+            'backoff_max': settings.get_int('vnfield.kafka.retry_backoff_max', 3600),
+            'dlq_topic': settings.get('vnfield.kafka.dlq_topic'),
+        }
+
+    @staticmethod
+    def _backoff_delay(attempts, settings):
+        """⏱️ Exponential backoff: base, 2*base, 4*base ... tối đa backoff_max (giây)"""
+        return min(settings['backoff_base'] * (2 ** (attempts - 1)), settings['backoff_max'])
+
+    # ─────────────────────────────────────────────
+    # ▶ Enqueue API
+    # ─────────────────────────────────────────────
+
+    @staticmethod
+    def _text_headers(headers):
+        """🏷️ Header Kafka (bytes) → string để lưu JSON"""
+        return {
+            name: value.decode('utf-8', errors='replace') if isinstance(value, bytes) else value
+            for name, value in (headers or {}).items()
+        }
+
+    @api.model
+    def _enqueue_failures(self, handler_ref, failures, handler_kind='message'):
+        """
+        📥 Ghi các message có handler lỗi vào retry queue (transaction hiện tại)
+
+        Args:
+            handler_ref (tuple): (model, method) của handler
+            failures (list): List tuple (headers, value, message_info, error)
+            handler_kind (str): 'message' hoặc 'batch'
+
+        Returns:
+            vnfield.kafka.retry: Các record vừa tạo
+        """
+        if not failures:
+            return self.browse()
+        settings = self._get_retry_settings()
+        next_attempt_at = fields.Datetime.now() + timedelta(seconds=self._backoff_delay(1, settings))
+        vals_list = [
+            dict(self._prepare_failure_vals(headers, value, message_info, error),
+                 handler_model=handler_ref[0],
+                 handler_method=handler_ref[1],
+                 handler_kind=handler_kind,
+                 next_attempt_at=next_attempt_at)
+            for headers, value, message_info, error in failures
+        ]
+        records = self.sudo().create(vals_list)
+        kafka_metrics.incr('messages_failed', len(records), dbname=self.env.cr.dbname)
+        _logger.warning(f'Queued {len(records)} failed Kafka messages for retry')
+        return records
+
+    @api.model
+    def _enqueue_dead_letters(self, failures, handler_kind):
+        """
+        ☠️ Ghi message không thể thử lại và đưa thẳng sang DLQ (transaction hiện tại)
+
+        Args:
+            failures (list): List tuple (headers, value, message_info, error);
+                với 'undecodable', value là payload thô (bytes) → lưu base64
+            handler_kind (str): 'undecodable' hoặc 'unbound'
+
+        Returns:
+            vnfield.kafka.retry: Các record vừa tạo (state dead)
+        """
+        if not failures:
+            return self.browse()
+        vals_list = []
+        for headers, value, message_info, error in failures:
+            if handler_kind == 'undecodable':
+                headers = dict(headers or {}, **{f'{DLQ_HEADERS_PREFIX}payload-encoding': 'base64'})
+                vals = self._prepare_failure_vals(headers, None, message_info, error)
+                vals['payload'] = base64.b64encode(value or b'').decode('ascii')
+            else:
+                vals = self._prepare_failure_vals(headers, value, message_info, error)
+            vals_list.append(dict(vals, handler_kind=handler_kind))
+        records = self.sudo().create(vals_list)
+        kafka_metrics.incr('messages_failed', len(records), dbname=self.env.cr.dbname)
+        records._dead_letter(self._get_retry_settings())
+        return records
+
+    def _prepare_failure_vals(self, headers, value, message_info, error):
+        """📦 Vals chung của một message lỗi (topic/partition/offset, payload JSON, headers)"""
+        headers = self._text_headers(headers)
+        return {
+            'topic': message_info['topic'],
+            'partition': message_info['partition'],
+            'offset': message_info['offset'],
+            'message_key': message_info.get('key') or False,
+            'message_uid': (isinstance(value, dict) and value.get('message_id')) or
+                           (headers or {}).get('message_id') or False,
+            'payload': json.dumps(value, ensure_ascii=False, default=str),
+            'headers': json.dumps(headers, ensure_ascii=False, default=str) if headers else False,
+            'action': (isinstance(value, dict) and value.get('action')) or
+                      (headers or {}).get('action') or False,
+            'last_error': str(error),
+        }
+
+    # ─────────────────────────────────────────────
+    # ▶ Retry Worker
+    # ─────────────────────────────────────────────
+
+    def _lock_due_batch(self, batch_size):
+        """🔒 Lấy một batch retry đến hạn, khoá row (SKIP LOCKED)"""
+        self.env.cr.execute("""
+            SELECT id FROM vnfield_kafka_retry
+             WHERE state = 'pending'
+               AND (next_attempt_at IS NULL OR next_attempt_at <= (now() AT TIME ZONE 'UTC'))
+             ORDER BY id
+             LIMIT %s
+               FOR UPDATE SKIP LOCKED
+        """, [batch_size])
+        return self.browse([row[0] for row in self.env.cr.fetchall()])
+
+    def _get_message(self):
+        """📦 Dựng lại (headers, value, message_info) như lúc consume"""
+        self.ensure_one()
+        message_info = {
+            'topic': self.topic,
+            'partition': self.partition,
+            'offset': self.offset,
+            'key': self.message_key or None,
+            'timestamp': None,
+        }
+        headers = json.loads(self.headers) if self.headers else {}
+        value = json.loads(self.payload) if self.payload else None
+        return headers, value, message_info
+
+    def _run_handler(self):
+        """🎯 Gọi lại handler gốc cho message này (raise nếu lỗi)"""
+        self.ensure_one()
+        headers, value, message_info = self._get_message()
+        handler = getattr(self.env[self.handler_model], self.handler_method)
+        if self.handler_kind == 'batch':
+            return handler([(headers, value, message_info)])[0]
+        return self.env['vnfield.pubsub.service']._call_message_handler(handler, headers, value, message_info)
+
+    def _dead_letter(self, settings):
+        """
+        ☠️ Đưa message sang DLQ topic qua outbox (cùng transaction)
+
+        DLQ topic: vnfield.kafka.dlq_topic hoặc '<topic gốc>.dlq'. Payload được
+        giữ nguyên, thông tin lỗi nằm trong headers x-vnfield-*.
+        """
+        outbox = self.env['vnfield.kafka.outbox']
+        for record in self:
+            dlq_topic = settings['dlq_topic'] or f'{record.topic}.dlq'
+            headers = json.loads(record.headers) if record.headers else {}
+            headers.update({
+                f'{DLQ_HEADERS_PREFIX}original-topic': record.topic,
+                f'{DLQ_HEADERS_PREFIX}original-partition': str(record.partition),
+                f'{DLQ_HEADERS_PREFIX}original-offset': str(record.offset),
+                f'{DLQ_HEADERS_PREFIX}attempts': str(record.attempt_count),
+                f'{DLQ_HEADERS_PREFIX}error': (record.last_error or '')[:1000],
+            })
+            # Payload string → outbox gửi nguyên văn, không routing lại theo destination
+            outbox.enqueue(dlq_topic, record.payload or '', key=record.message_key, headers=headers)
+            record.write({'state': 'dead', 'dlq_topic': dlq_topic})
+        kafka_metrics.incr('messages_dead_lettered', len(self), dbname=self.env.cr.dbname)
+        _logger.error(f'Moved {len(self)} Kafka messages to the dead-letter topic')
+
+    def _process_retries(self, settings):
+        """
+        🔁 Chạy lại handler cho các record trong self
+
+        Mỗi message một savepoint: message lỗi không ảnh hưởng message khác.
+
+        Returns:
+            int: Số message đã resolved
+        """
+        now = fields.Datetime.now()
+        resolved = self.browse()
+        dead = self.browse()
+        for record in self:
+            try:
+                with self.env.cr.savepoint():
+                    record._run_handler()
+                resolved |= record
+            except Exception as e:
+                attempts = record.attempt_count + 1
+                _logger.warning(
+                    f'Retry {attempts} failed for {record.topic}[{record.partition}] '
+                    f'offset {record.offset}: {e}'
+                )
+                record.write({
+                    'attempt_count': attempts,
+                    'next_attempt_at': now + timedelta(seconds=self._backoff_delay(attempts, settings)),
+                    'last_error': str(e),
+                })
+                if attempts >= settings['max_attempts']:
+                    dead |= record
+        if resolved:
+            resolved.write({'state': 'resolved', 'resolved_at': now, 'next_attempt_at': False})
+            kafka_metrics.incr('messages_retried', len(resolved), dbname=self.env.cr.dbname)
+        if dead:
+            dead._dead_letter(settings)
+        return len(resolved)
+
+    @api.model
+    def _cron_process_retries(self, max_batches=10):
+        """
+        ⏰ Cron: thử lại các message đến hạn theo batch
+
+        Mỗi batch được commit riêng để giải phóng lock và giữ kết quả nếu
+        batch sau lỗi.
+
+        Args:
+            max_batches (int): Số batch tối đa trong một lần chạy cron
+
+        Returns:
+            int: Tổng số message đã resolved
+        """
+        settings = self._get_retry_settings()
+        total_resolved = 0
+
+        for _i in range(max_batches):
+            batch = self._lock_due_batch(settings['batch_size'])
+            if not batch:
+                break
+            total_resolved += batch._process_retries(settings)
+            self.env.cr.commit()
+            if len(batch) < settings['batch_size']:
+                break
+
+        if total_resolved:
+            _logger.info(f'Kafka retry queue resolved {total_resolved} messages')
+        self.env['vnfield.kafka.metric.snapshot']._publish()
+        return total_resolved
+
+    # ─────────────────────────────────────────────
+    # ▶ UI Actions
+    # ─────────────────────────────────────────────
+
+    def action_retry_now(self):
+        """🔁 Đưa message về pending và cho phép thử lại ngay (bỏ qua message không có handler)"""
+        self.filtered(lambda r: r.state != 'resolved' and r.handler_model).write({
+            'state': 'pending',
+            'next_attempt_at': False,
+        })
+        return True
+
+    @api.model
+    def action_process_now(self):
+        """
+        🚀 Yêu cầu cron retry chạy ngay (không chờ lịch)
+
+        Retry commit theo từng batch nên chạy trong cron worker, không chạy
+        trên cursor của request UI.
+        """
+        self.env.ref('vnfield.cron_kafka_retry_process').sudo()._trigger()
+        return {
+            'type': 'ir.actions.client',
+            'tag': 'display_notification',
+            'params': {
+                'title': _('Retry Queue Scheduled'),
+                'message': _('The retry queue cron will run shortly'),
+                'type': 'info',
+                'sticky': False,
+            }
+        }
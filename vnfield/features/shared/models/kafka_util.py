@@ -8,11 +8,17 @@
 
 import json
 import logging
-from confluent_kafka import Producer, Consumer, KafkaError
-from odoo import models, fields, api
+from collections import namedtuple
+
+from odoo import models, fields, api, tools
+
+from ..utils import kafka_producer_pool
 
 _logger = logging.getLogger(__name__)
 
+# 💡 NOTE(assistant): Danh tính Kafka của site (bất biến, cache theo database)
+SiteIdentity = namedtuple('SiteIdentity', ['external_id', 'consumer_group', 'client_id'])
+
 # ═══════════════════════════════════════════════════════════
 # ═             📡 KAFKA UTILITY CLASS                     ═
 # ═══════════════════════════════════════════════════════════
@@ -21,49 +27,62 @@ class KafkaUtil(models.TransientModel):
     _name = 'vnfield.kafka.util'
     _description = 'Kafka Utility for Producer and Consumer Operations'
 
+    def _get_settings(self):
+        """⚡ Snapshot system parameters (xem PubSubService._get_settings)"""
+        return self.env['vnfield.pubsub.service']._get_settings()
+
     @api.model
     def get_bootstrap_servers(self):
         """
         📊 Get Bootstrap Server từ system parameters
         """
-        return self.env['ir.config_parameter'].sudo().get_param(
-            'vnfield.kafka.bootstrap_servers', 
-            default='localhost:9092'
-        )
-    
+        return self._get_settings().get('vnfield.kafka.bootstrap_servers', 'localhost:9092')
+
+    # ─────────────── 🪪 SITE IDENTITY ───────────────
+
     @api.model
-    def get_consumer_group_id(self):
+    def get_site_identity(self):
         """
-        🎯 Get Consumer Group ID từ external_id của default contractor
+        🪪 Danh tính Kafka của site: external_id của default contractor,
+        consumer group và client id prefix
+        
+        Được memoize theo database; cache bị xoá khi contractor hoặc
+        system parameter thay đổi (registry.clear_cache).
+        
+        Returns:
+            SiteIdentity: (external_id, consumer_group, client_id)
         """
+        return self._load_site_identity()
+
+    @api.model
+    @tools.ormcache()
+    def _load_site_identity(self):
+        """🔄 Tính danh tính site (một search contractor cho mỗi lần nạp cache)"""
+        settings = self._get_settings()
+        base_group = settings.get('vnfield.kafka.consumer_group_id', 'vnfield_cs_consumer')
+        prefix = settings.get('vnfield.kafka.topic_prefix', 'vnfield_cs')
+        external_id = None
         try:
             # ─────────────── 🔍 FIND DEFAULT CONTRACTOR ───────────────
-            default_contractor = self.env['vnfield.contractor'].search([
+            default_contractor = self.env['vnfield.contractor'].sudo().search([
                 ('is_default_contractor', '=', True)
             ], limit=1)
-            
-            if default_contractor and default_contractor.external_id:
-                # ─────────────── 🏗️ BUILD GROUP ID WITH EXTERNAL_ID ───────────────
-                base_group = self.env['ir.config_parameter'].sudo().get_param(
-                    'vnfield.kafka.consumer_group_id', 
-                    default='vnfield_cs_consumer'
-                )
-                return f"{base_group}_{default_contractor.external_id}"
-            else:
-                # ─────────────── ⚠️ FALLBACK TO SYSTEM PARAMETER ───────────────
-                _logger.warning('⚠️ No default contractor with external_id found, using system parameter')
-                return self.env['ir.config_parameter'].sudo().get_param(
-                    'vnfield.kafka.consumer_group_id', 
-                    default='vnfield_cs_consumer'
-                )
-                
+            external_id = default_contractor.external_id or None
         except Exception as e:
-            _logger.error(f'❌ Error getting consumer group ID: {str(e)}')
-            # ─────────────── 🛡️ SAFE FALLBACK ───────────────
-            return self.env['ir.config_parameter'].sudo().get_param(
-                'vnfield.kafka.consumer_group_id', 
-                default='vnfield_cs_consumer'
-            )
+            _logger.error(f'❌ Error getting default contractor external_id: {str(e)}')
+
+        if not external_id:
+            # ─────────────── ⚠️ FALLBACK TO SYSTEM PARAMETER ───────────────
+            _logger.warning('⚠️ No default contractor with external_id found, using system parameter')
+            return SiteIdentity(None, base_group, prefix)
+        return SiteIdentity(external_id, f"{base_group}_{external_id}", f"{prefix}_{external_id}")
+
+    @api.model
+    def get_consumer_group_id(self):
+        """
+        🎯 Get Consumer Group ID từ external_id của default contractor
+        """
+        return self.get_site_identity().consumer_group
     
     @api.model
     def get_default_contractor_external_id(self):
@@ -73,60 +92,35 @@ class KafkaUtil(models.TransientModel):
         Returns:
             int|None: External ID của default contractor hoặc None nếu không tìm thấy
         """
-        try:
-            default_contractor = self.env['vnfield.contractor'].search([
-                ('is_default_contractor', '=', True)
-            ], limit=1)
-            
-            if default_contractor and default_contractor.external_id:
-                return default_contractor.external_id
-            else:
-                _logger.warning('⚠️ No default contractor with external_id found')
-                return None
-                
-        except Exception as e:
-            _logger.error(f'❌ Error getting default contractor external_id: {str(e)}')
-            return None
+        return self.get_site_identity().external_id
     
     @api.model
     def get_consumer_timeout(self):
         """
         ⏱️ Get Consumer Timeout từ system parameters
         """
-        return float(self.env['ir.config_parameter'].sudo().get_param(
-            'vnfield.kafka.consumer_timeout', 
-            default='5.0'
-        ))
+        return self._get_settings().get_float('vnfield.kafka.consumer_timeout', 5.0)
     
     @api.model
     def get_max_messages(self):
         """
         📊 Get Max Messages Per Consumption từ system parameters
         """
-        return int(self.env['ir.config_parameter'].sudo().get_param(
-            'vnfield.kafka.max_messages', 
-            default='10'
-        ))
+        return self._get_settings().get_int('vnfield.kafka.max_messages', 10)
     
     @api.model
     def get_producer_retries(self):
         """
         🔄 Get Producer Retries từ system parameters
         """
-        return int(self.env['ir.config_parameter'].sudo().get_param(
-            'vnfield.kafka.producer_retries', 
-            default='3'
-        ))
+        return self._get_settings().get_int('vnfield.kafka.producer_retries', 3)
     
     @api.model
     def get_topic_prefix(self):
         """
         📡 Get Topic Prefix từ system parameters
         """
-        return self.env['ir.config_parameter'].sudo().get_param(
-            'vnfield.kafka.topic_prefix', 
-            default='vnfield_cs'
-        )
+        return self._get_settings().get('vnfield.kafka.topic_prefix', 'vnfield_cs')
     
     @api.model
     def build_topic_name(self, base_name, include_contractor_id=False):
@@ -185,14 +179,9 @@ class KafkaUtil(models.TransientModel):
         """
         try:
             # ─────────────── 🔧 PRODUCER CONFIGURATION ───────────────
-            contractor_external_id = self.get_default_contractor_external_id()
-            client_id = f'{self.get_topic_prefix()}_producer'
-            if contractor_external_id:
-                client_id = f'{self.get_topic_prefix()}_{contractor_external_id}_producer'
-            
             producer_config = {
                 'bootstrap.servers': self.get_bootstrap_servers(),
-                'client.id': client_id,
+                'client.id': f'{self.get_site_identity().client_id}_producer',
                 'acks': 'all',
                 'retries': self.get_producer_retries(),
                 'retry.backoff.ms': 100,
@@ -200,7 +189,12 @@ class KafkaUtil(models.TransientModel):
                 'request.timeout.ms': 25000
             }
             
-            producer = Producer(producer_config)
+            # 🏊 Producer dùng chung của worker (không tạo mới mỗi message)
+            transport = self.env['vnfield.pubsub.service']._get_transport()
+            producer = kafka_producer_pool.get_producer(
+                dict(producer_config, **{kafka_producer_pool.TRANSPORT_KEY: transport.name}),
+                lambda config: transport.Producer(kafka_producer_pool.client_config(config)),
+            )
             
             # ─────────────── 📝 MESSAGE PREPARATION ───────────────
             message_value = json.dumps(message, ensure_ascii=False, default=str)
@@ -263,9 +257,7 @@ class KafkaUtil(models.TransientModel):
         try:
             # ─────────────── 🔧 CONSUMER CONFIGURATION ───────────────
             contractor_external_id = self.get_default_contractor_external_id()
-            client_id = f'{self.get_topic_prefix()}_consumer'
-            if contractor_external_id:
-                client_id = f'{self.get_topic_prefix()}_{contractor_external_id}_consumer'
+            client_id = f'{self.get_site_identity().client_id}_consumer'
             
             consumer_config = {
                 'bootstrap.servers': self.get_bootstrap_servers(),
@@ -278,7 +270,8 @@ class KafkaUtil(models.TransientModel):
                 'heartbeat.interval.ms': 10000
             }
             
-            consumer = Consumer(consumer_config)
+            transport = self.env['vnfield.pubsub.service']._get_transport()
+            consumer = transport.Consumer(consumer_config)
             
             # ─────────────── 📡 SUBSCRIBE TO TOPICS ───────────────
             consumer.subscribe(topics)
@@ -295,7 +288,7 @@ class KafkaUtil(models.TransientModel):
                     break
                     
                 if msg.error():
-                    if msg.error().code() == KafkaError._PARTITION_EOF:
+                    if msg.error().code() == transport.KafkaError._PARTITION_EOF:
                         _logger.info(f'📄 End of partition reached: {msg.topic()} [{msg.partition()}]')
                         continue
                     else:
@@ -361,10 +354,7 @@ class KafkaUtil(models.TransientModel):
         
         try:
             # ─────────────── 🧪 TEST PRODUCER CONNECTION ───────────────
-            contractor_external_id = self.get_default_contractor_external_id()
-            client_id = f'{self.get_topic_prefix()}_test_producer'
-            if contractor_external_id:
-                client_id = f'{self.get_topic_prefix()}_{contractor_external_id}_test_producer'
+            client_id = f'{self.get_site_identity().client_id}_test_producer'
             
             producer_config = {
                 'bootstrap.servers': self.get_bootstrap_servers(),
@@ -373,7 +363,7 @@ class KafkaUtil(models.TransientModel):
                 'api.version.request.timeout.ms': 5000
             }
             
-            producer = Producer(producer_config)
+            producer = self.env['vnfield.pubsub.service']._get_transport().Producer(producer_config)
             
             # Test bằng cách request metadata
             metadata = producer.list_topics(timeout=5)
@@ -403,14 +393,15 @@ class KafkaUtil(models.TransientModel):
 🔗 PYTHON DEPENDENCIES:
 - json: JSON serialization/deserialization cho message payload
 - logging: Error và info logging cho debugging và monitoring
-- confluent_kafka.Producer: Kafka message producer với delivery reports
-- confluent_kafka.Consumer: Kafka message consumer với auto-commit
-- confluent_kafka.KafkaError: Error handling cho connection và message errors
+- kafka_transport (qua vnfield.pubsub.service._get_transport()): Producer, Consumer,
+  KafkaError của confluent_kafka hoặc broker giả lập in-memory (kafka.transport)
 
 🔗 ODOO DEPENDENCIES:
 - odoo.models.TransientModel: Base class cho utility model không lưu vào database
 - odoo.fields: Field definitions (reserved cho future enhancements)
 - odoo.api: API decorators (@api.model) cho static method calls
+- odoo.tools.ormcache: Memoize site identity (xoá khi contractor / parameter thay đổi)
+- kafka_producer_pool: Producer dùng chung của worker cho produce()
 - self.env['ir.config_parameter']: System parameters access cho configuration
 
 🔗 KAFKA INTEGRATION DEPENDENCIES:
@@ -433,6 +424,7 @@ class KafkaUtil(models.TransientModel):
 - vnfield.contractor: Default contractor model với is_default_contractor field
 - external_id: External system mapping field cho contractor identification
 - is_default_contractor: Boolean field để identify default contractor cho site này
+  (write/create/unlink contractor xoá cache site identity)
 
 🔗 BUSINESS LOGIC DEPENDENCIES:
 - CS-IS communication: Message exchange giữa Contractor và Integration Systems
@@ -19,9 +19,14 @@ Created: 2025-08-20
 Author: GitHub Copilot
 """
 
-from odoo import api, fields, models, _
+from odoo import api, fields, models, tools, _
 from odoo.exceptions import UserError, ValidationError
+from datetime import timedelta
+import json
 import logging
+import uuid
+
+from ..utils import kafka_dispatch, kafka_metrics
 
 _logger = logging.getLogger(__name__)
 
@@ -66,9 +71,44 @@ class SyncRequest(models.Model):
         help='Mô tả chi tiết về yêu cầu đồng bộ'
     )
     
-    message_payload = fields.Text(
+    message_payload = fields.Json(
         string='Message Payload',
-        help='Nội dung tin nhắn gốc từ Kafka topic'
+        help='Nội dung tin nhắn gốc từ Kafka topic (jsonb)'
+    )
+    
+    message_payload_display = fields.Text(
+        string='Message Payload (JSON)',
+        compute='_compute_message_payload_display',
+        help='Payload định dạng JSON dễ đọc cho form view'
+    )
+    
+    # 💡 NOTE(assistant): Tách từ payload khi ingest → filter / group by không cần đọc jsonb
+    action = fields.Char(
+        string='Action',
+        readonly=True,
+        index=True,
+        help='Tên action của message (vd: match_capacity_profile)'
+    )
+    
+    source = fields.Char(
+        string='Source',
+        readonly=True,
+        index=True,
+        help='System gửi message'
+    )
+    
+    destination = fields.Char(
+        string='Destination',
+        readonly=True,
+        index=True,
+        help='System nhận message'
+    )
+    
+    message_uid = fields.Char(
+        string='Message ID',
+        readonly=True,
+        copy=False,
+        help='Định danh message Kafka (message_id hoặc topic:partition:offset) để dedupe khi deliver lại'
     )
     
     state = fields.Selection([
@@ -91,6 +131,11 @@ class SyncRequest(models.Model):
     # ==========================================
     #  METADATA FIELDS - THÔNG TIN BỔ SUNG
     # ==========================================
+    _sql_constraints = [
+        ('message_uid_uniq', 'unique(message_uid)',
+         'Mỗi message Kafka chỉ tạo một sync request!'),
+    ]
+    
     # ==========================================
     # 📅 COMPUTED FIELDS - TRƯỜNG TÍNH TOÁN
     # ==========================================
@@ -104,6 +149,14 @@ class SyncRequest(models.Model):
             else:
                 record.display_create_date = ''
     
+    @api.depends('message_payload')
+    def _compute_message_payload_display(self):
+        """Payload JSON dạng indent cho form view"""
+        for record in self:
+            record.message_payload_display = json.dumps(
+                record.message_payload, ensure_ascii=False, indent=2, default=str
+            ) if record.message_payload else False
+    
     display_create_date = fields.Char(
         string='Created On',
         compute='_compute_display_create_date',
@@ -129,81 +182,124 @@ class SyncRequest(models.Model):
     # ==========================================
     
     def action_approve(self):
-        """Phê duyệt yêu cầu đồng bộ và xử lý business logic"""
-        for record in self:
-            if record.state != 'draft':
-                raise UserError(_("Chỉ có thể phê duyệt yêu cầu ở trạng thái Draft!"))
-            
-            # 🎯 XỬ LÝ BUSINESS LOGIC theo action type
-            try:
-                # Parse message payload để lấy thông tin action
-                import ast
-                if record.message_payload:
-                    try:
-                        message_data = ast.literal_eval(record.message_payload)
-                        action_name = message_data.get('action')
-                        vals = message_data.get('vals', {})
-                        extra = message_data.get('extra', {})
-                        
-                        # 🏗️ XỬ LÝ MATCH CAPACITY PROFILE - tạo project mới
-                        if action_name == 'match_capacity_profile':
-                            requirement_id = vals.get('requirement_id')
-                            capacity_profile_id = vals.get('capacity_profile_id')
-                            requirement_title = vals.get('requirement_title', f'Requirement {requirement_id}')
-                            task_id = vals.get('task_id')
-                            
-                            if requirement_id and capacity_profile_id:
-                                # Tạo project name từ requirement title
-                                project_name = f"Project for {requirement_title}"
-                                
-                                # Tạo project mới (không cần kiểm tra requirement vì là remote)
-                                project = self.env['vnfield.project'].sudo().create({
-                                    'name': project_name,
-                                    'source_task_id': task_id,  # Lưu task_id từ message
-                                    'is_outsourced': True,  # Đánh dấu là project outsource
-                                    'description': f"Project created from capacity profile match\nRequirement: {requirement_title}\nRemote Requirement ID: {requirement_id}\nCapacity Profile ID: {capacity_profile_id}\nCreated by sync request: {record.activity_name}",
-                                })
-                                
-                                _logger.info(f"✅ Created project ID: {project.id} from sync_request ID: {record.id}")
-                                
-                                # Cập nhật description của sync_request để ghi lại kết quả
-                                record.description = f"{record.description}\n\n🎉 RESULT: Created project '{project.name}' (ID: {project.id})"
-                                
-                            else:
-                                _logger.warning(f"⚠️ Missing requirement_id or capacity_profile_id in message")
-                                record.description = f"{record.description}\n\n❌ ERROR: Missing requirement_id or capacity_profile_id"
-                        
-                        # 🔄 XỬ LÝ CÁC ACTION KHÁC - có thể thêm sau
-                        elif action_name == 'register_user_map':
-                            _logger.info(f"📝 Approved register_user_map action for sync_request ID: {record.id}")
-                            
-                        elif action_name == 'create_user':
-                            _logger.info(f"📝 Approved create_user action for sync_request ID: {record.id}")
-                            
-                        else:
-                            _logger.info(f"📝 Approved unknown action '{action_name}' for sync_request ID: {record.id}")
-                            
-                    except (ValueError, SyntaxError) as e:
-                        _logger.error(f"❌ Failed to parse message_payload: {str(e)}")
-                        record.description = f"{record.description}\n\n❌ ERROR: Failed to parse message payload"
-                        
-            except Exception as e:
-                _logger.error(f"❌ Error during approve processing: {str(e)}")
-                record.description = f"{record.description}\n\n❌ ERROR: {str(e)}"
-                
-            # ✅ CẬP NHẬT STATE cuối cùng
-            record.state = 'approved'
-            
+        """
+        Phê duyệt yêu cầu đồng bộ và xử lý business logic
+        
+        Business logic của từng action nằm ở handler đã đăng ký trong
+        kafka_dispatch (tra cứu O(1) theo tên action), không còn if/elif ở đây.
+        """
+        if any(record.state != 'draft' for record in self):
+            raise UserError(_("Chỉ có thể phê duyệt yêu cầu ở trạng thái Draft!"))
+        self._approve()
         return True
     
+    def _approve(self):
+        """
+        ✅ Duyệt cả recordset theo lô
+        
+        - Gom request theo cột action → mỗi action một lần gọi handler
+          (batch handler tạo mọi project bằng một create([...]))
+        - Lỗi của từng request được ghi vào description, không dừng cả lô
+        - description: một câu UPDATE; state: một lần write
+        
+        Returns:
+            dict: {sync_request.id: ghi chú của handler}
+        """
+        by_action = {}
+        for record in self.filtered('message_payload'):
+            by_action.setdefault(record.action, []).append(record.id)
+        
+        notes = {}
+        for action_name, record_ids in by_action.items():
+            notes.update(kafka_dispatch.dispatch(self.env, action_name, self.browse(record_ids)))
+        
+        self._append_description_notes(notes)
+        # ✅ CẬP NHẬT STATE cuối cùng
+        self.write({'state': 'approved'})
+        # 📊 Counter actions_* của process này → nhìn được từ /vnfield/metrics (ghi sau commit)
+        self.env['vnfield.kafka.metric.snapshot']._publish_after_commit()
+        return notes
+    
+    def _append_description_notes(self, notes):
+        """
+        📝 Ghi thêm ghi chú vào description của nhiều request bằng một câu UPDATE
+        
+        Args:
+            notes (dict): {sync_request.id: ghi chú} (ghi chú rỗng bị bỏ qua)
+        """
+        notes = {record_id: note for record_id, note in notes.items() if note}
+        if not notes:
+            return
+        self.flush_model(['description'])
+        self.env.cr.execute(f"""
+            UPDATE vnfield_sync_request AS request
+               SET description = concat_ws(E'\\n\\n', request.description, note.text)
+              FROM (VALUES {', '.join(['(%s, %s)'] * len(notes))}) AS note(id, text)
+             WHERE request.id = note.id
+        """, [value for item in notes.items() for value in item])
+        self.browse(list(notes)).invalidate_recordset(['description'])
+    
+    def action_bulk_approve(self):
+        """
+        ✅ Duyệt hàng loạt từ list view (bỏ qua request không ở Draft)
+        
+        Returns:
+            dict: Notification tổng kết số request đã duyệt / bị lỗi
+        """
+        drafts = self.filtered(lambda record: record.state == 'draft')
+        notes = drafts._approve()
+        errors = [note for note in notes.values() if note and note.startswith(kafka_dispatch.ERROR_PREFIX)]
+        return {
+            'type': 'ir.actions.client',
+            'tag': 'display_notification',
+            'params': {
+                'title': _('Sync Requests Approved'),
+                'message': _('%(approved)s approved, %(errors)s with errors, %(skipped)s skipped (not draft)') % {
+                    'approved': len(drafts),
+                    'errors': len(errors),
+                    'skipped': len(self) - len(drafts),
+                },
+                'type': 'warning' if errors else 'success',
+                'sticky': bool(errors),
+            }
+        }
+    
+    def _load_message_payload(self):
+        """
+        📭 Nội dung message gốc (jsonb → dict, không cần parse lại)
+        
+        Returns:
+            dict: Nội dung message gốc ({} nếu payload không phải object)
+        """
+        self.ensure_one()
+        payload = self.message_payload
+        return payload if isinstance(payload, dict) else {}
+
     def action_reject(self):
         """Từ chối yêu cầu đồng bộ"""
-        for record in self:
-            if record.state != 'draft':
-                raise UserError(_("Chỉ có thể từ chối yêu cầu ở trạng thái Draft!"))
-            record.state = 'rejected'
+        if any(record.state != 'draft' for record in self):
+            raise UserError(_("Chỉ có thể từ chối yêu cầu ở trạng thái Draft!"))
+        self.write({'state': 'rejected'})
         return True
     
+    def action_bulk_reject(self):
+        """❌ Từ chối hàng loạt từ list view (bỏ qua request không ở Draft)"""
+        drafts = self.filtered(lambda record: record.state == 'draft')
+        drafts.write({'state': 'rejected'})
+        return {
+            'type': 'ir.actions.client',
+            'tag': 'display_notification',
+            'params': {
+                'title': _('Sync Requests Rejected'),
+                'message': _('%(rejected)s rejected, %(skipped)s skipped (not draft)') % {
+                    'rejected': len(drafts),
+                    'skipped': len(self) - len(drafts),
+                },
+                'type': 'info',
+                'sticky': False,
+            }
+        }
+    
     def action_archive(self):
         """Lưu trữ yêu cầu đồng bộ"""
         # Handle both single and multiple records properly
@@ -222,29 +318,87 @@ class SyncRequest(models.Model):
     # 🔄 KAFKA CONSUME METHOD
     # ==========================================
     
+    @api.model
+    def _get_consumer_subscription(self):
+        """
+        📡 Topics và group id của universal consumer
+        
+        Dùng chung cho cron consume() và persistent consumer runner để cả hai
+        luôn join cùng một consumer group. Topics phụ thuộc
+        vnfield.kafka.routing_mode (topic mode → chỉ topic riêng của site)
+        và vnfield.kafka.priority_lanes (thêm topic của lane bulk).
+        
+        Returns:
+            tuple: (list topics, str group_id) — topic lane interactive đứng trước
+        """
+        pubsub_service = self.env['vnfield.pubsub.service']
+        settings = pubsub_service._get_settings()
+        topic = settings.get('vnfield.kafka.topic', 'vnfield')
+        system_name = settings.get('vnfield.system_name', 'Unknown System')
+        topics = []
+        for lane_topic in pubsub_service._get_lane_base_topics(topic):
+            topics.extend(pubsub_service._get_site_topics(lane_topic, system_name))
+        return topics, system_name
+
+    @api.model
+    def _get_consumer_partition_key(self):
+        """
+        🔑 Routing key của site (keyed mode): consumer chỉ assign partition của key này
+        
+        Returns:
+            str: system_name nếu routing_mode = keyed, ngược lại None
+        """
+        pubsub_service = self.env['vnfield.pubsub.service']
+        system_name = pubsub_service._get_settings().get('vnfield.system_name', 'Unknown System')
+        return pubsub_service._get_site_partition_key(system_name)
+
     @api.model
     def consume(self):
         """
         Consume message from pubsub_service, xử lý qua message_handler callback.
+        
+        Không làm gì khi persistent runner đang bật: runner (cooperative-sticky)
+        và consumer của cron (assignor mặc định) cùng group sẽ bị broker từ chối
+        (INCONSISTENT_GROUP_PROTOCOL).
         """
-        config_param = self.env['ir.config_parameter'].sudo()
-        topic = config_param.get_param('vnfield.kafka.topic', 'vnfield')
-        system_name = config_param.get_param('vnfield.system_name', 'Unknown System')
+        if self.env['vnfield.pubsub.service']._get_settings().get_bool('vnfield.kafka.consumer_runner_enabled'):
+            _logger.debug('Persistent Kafka consumer runner is enabled, skipping cron consume')
+            return []
+        # Runner đã bị tắt nhưng chưa tới heartbeat kế tiếp → chưa join group
+        if self.env['vnfield.kafka.consumer.status']._get_live_runners():
+            _logger.debug('Persistent Kafka consumer runners are still stopping, skipping cron consume')
+            return []
+        topics, group_id = self._get_consumer_subscription()
         
         pubsub_service = self.env['vnfield.pubsub.service'].create({})
-        print(f"DEBUG: Consuming messages from topic: {topic} with group_id: {system_name}")
+        settings = pubsub_service._get_settings()
+        # 📦 Mỗi lần chạy lấy nhiều batch (deadline timeout × multiplier vẫn giới hạn thời gian)
+        batch_size = settings.get_int('kafka.consumer_batch_size', 100)
+        max_messages = settings.get_int('kafka.consumer_max_messages_per_run', batch_size * 100)
+        _logger.debug(f"Consuming messages from topics: {topics} with group_id: {group_id}")
         
-        # Truyền message_handler làm callback cho consume_message
-        return pubsub_service.consume_messages(topic, group_id=system_name, timeout=10, message_handler=self.message_handler)
+        # Truyền message_batch_handler: mỗi batch chỉ một lần create([...])
+        messages = pubsub_service.consume_messages(
+            topics, group_id=group_id, timeout=10, max_messages=max_messages,
+            message_handler=self.message_handler,
+            batch_handler=self.message_batch_handler,
+            # group_id chính là system_name → lọc sẵn theo header destination
+            destination_filter=group_id,
+            partition_key=self._get_consumer_partition_key(),
+            # 📉 Lag theo partition của cron → /vnfield/status và /vnfield/metrics
+            status_name=f'{group_id}-cron',
+        )
+        # 📊 Counter / timing của cron worker → nhìn được từ /vnfield/metrics
+        self.env['vnfield.kafka.metric.snapshot']._publish()
+        return messages
 
-    def message_handler(self, headers, value):
+    def _check_message_destination(self, value, current_system_name):
         """
-        Xử lý message: lọc message theo destination, chia nhánh action name để gọi handler_* với handle_type='consume'.
-        Chỉ xử lý message có destination trùng với system_name hiện tại.
+        🔍 FILTER: Chỉ xử lý message có destination là system này
+        
+        Returns:
+            dict: Kết quả 'message_ignored' nếu bỏ qua, None nếu message hợp lệ
         """
-        # 🔍 FILTER: Chỉ xử lý message có destination là system này
-        config_param = self.env['ir.config_parameter'].sudo()
-        current_system_name = config_param.get_param('vnfield.system_name', 'Unknown System')
         message_destination = value.get('destination')
         
         # Bỏ qua message không có destination
@@ -262,61 +416,402 @@ class SyncRequest(models.Model):
                 'current_system': current_system_name,
                 'message_destination': message_destination
             }
+        return None
+
+    @api.model
+    def _get_message_uid(self, headers, value, message_info=None):
+        """
+        🆔 Định danh ổn định của message để dedupe
+        
+        Ưu tiên: message_id trong payload → header message_id → topic:partition:offset.
+        Message cũ không có định danh nào nhận một uid ngẫu nhiên (không dedupe được).
+        """
+        message_uid = value.get('message_id')
+        if not message_uid and headers:
+            message_uid = headers.get('message_id')
+            if isinstance(message_uid, bytes):
+                message_uid = message_uid.decode('utf-8', errors='replace')
+        if not message_uid and message_info:
+            message_uid = f"{message_info['topic']}:{message_info['partition']}:{message_info['offset']}"
+        return message_uid or f'local:{uuid.uuid4().hex}'
+
+    @api.model
+    def _insert_sync_requests(self, vals_list):
+        """
+        💾 Bulk INSERT ... ON CONFLICT (message_uid) DO NOTHING
+        
+        Một câu lệnh cho cả batch, message đã ingest trước đó (redelivery,
+        replay) bị bỏ qua mà không cần query kiểm tra từng message, kể cả
+        khi request đã được chuyển sang vnfield.sync.request.archive.
+        
+        Args:
+            vals_list (list): vals từ _prepare_sync_request_vals (có message_uid)
+            
+        Returns:
+            dict: {message_uid: id} của các sync_request thực sự được tạo
+        """
+        if not vals_list:
+            return {}
+        rows = []
+        params = []
+        for vals in vals_list:
+            rows.append("(%s, %s, %s::jsonb, %s, %s, %s, %s, true, %s, %s, %s, (now() AT TIME ZONE 'UTC'), %s, (now() AT TIME ZONE 'UTC'))")
+            params.extend([
+                vals['activity_name'],
+                vals.get('description'),
+                json.dumps(vals.get('message_payload'), ensure_ascii=False, default=str),
+                vals.get('action'),
+                vals.get('source'),
+                vals.get('destination'),
+                vals['state'],
+                vals['state'] == 'draft',  # is_active_request (stored compute)
+                vals['message_uid'],
+                self.env.uid,
+                self.env.uid,
+            ])
+        # 💡 NOTE(assistant): Message đã chuyển vào kho lạnh (retention) cũng được coi là đã ingest
+        self.env.cr.execute(f"""
+            INSERT INTO vnfield_sync_request
+                (activity_name, description, message_payload, action, source, destination, state, active, is_active_request,
+                 message_uid, create_uid, create_date, write_uid, write_date)
+            SELECT * FROM (VALUES {', '.join(rows)}) AS v
+                (activity_name, description, message_payload, action, source, destination, state, active, is_active_request,
+                 message_uid, create_uid, create_date, write_uid, write_date)
+             WHERE NOT EXISTS (
+                    SELECT 1 FROM vnfield_sync_request_archive archive
+                     WHERE archive.message_uid = v.message_uid
+             )
+            ON CONFLICT (message_uid) DO NOTHING
+            RETURNING message_uid, id
+        """, params)
+        return dict(self.env.cr.fetchall())
+
+    def _prepare_sync_request_vals(self, value, headers=None, message_info=None):
+        """
+        📝 Dựng vals cho sync_request từ nội dung message
         
+        Returns:
+            dict: vals cho create() (state draft để chờ approve/reject)
+        """
         action_name = value.get('action')
         vals = value.get('vals', {})
         extra = value.get('extra', {})
         
-        # 📝 TẠO SYNC REQUEST MỚI từ thông tin message
+        # Tạo activity name dựa trên action
+        activity_name = f"{action_name.replace('_', ' ').title()} - {value.get('destination')}"
+        
+        # Tạo description từ vals và extra
+        description_parts = []
+        if vals:
+            description_parts.append(f"Message data: {str(vals)}")
+        if extra:
+            description_parts.append(f"Extra info: {str(extra)}")
+        
+        description = "\n".join(description_parts) if description_parts else f"Action: {action_name}"
+        
+        return {
+            'activity_name': activity_name,
+            'description': description,
+            'message_payload': value,  # Lưu toàn bộ message content (jsonb)
+            'action': action_name,
+            'source': value.get('source'),
+            'destination': value.get('destination'),
+            'state': 'draft',  # Tạo ở trạng thái draft để chờ approve/reject
+            'message_uid': self._get_message_uid(headers, value, message_info),
+        }
+
+    def message_handler(self, headers, value, message_info=None):
+        """
+        Xử lý message: lọc message theo destination, chia nhánh action name để gọi handler_* với handle_type='consume'.
+        Chỉ xử lý message có destination trùng với system_name hiện tại.
+        message_info (topic/partition/offset) giúp message cũ không có message_id nhận
+        cùng uid như ở nhánh batch.
+        """
+        current_system_name = self.env['vnfield.pubsub.service']._get_settings().get(
+            'vnfield.system_name', 'Unknown System'
+        )
+        ignored = self._check_message_destination(value, current_system_name)
+        if ignored:
+            return ignored
+        
+        action_name = value.get('action')
+        
+        # 📝 TẠO SYNC REQUEST MỚI từ thông tin message (bỏ qua nếu đã ingest)
         try:
-            # Tạo activity name dựa trên action
-            activity_name = f"{action_name.replace('_', ' ').title()} - {message_destination}"
-            
-            # Tạo description từ vals và extra
-            description_parts = []
-            if vals:
-                description_parts.append(f"Message data: {str(vals)}")
-            if extra:
-                description_parts.append(f"Extra info: {str(extra)}")
-            
-            description = "\n".join(description_parts) if description_parts else f"Action: {action_name}"
-            
-            # Tạo sync_request record
-            sync_request = self.env['vnfield.sync.request'].sudo().create({
-                'activity_name': activity_name,
-                'description': description,
-                'message_payload': str(value),  # Lưu toàn bộ message content
-                'state': 'draft',  # Tạo ở trạng thái draft để chờ approve/reject
-            })
+            vals = self._prepare_sync_request_vals(value, headers, message_info)
+            inserted = self.env['vnfield.sync.request'].sudo()._insert_sync_requests([vals])
+            if not inserted:
+                return self._duplicate_result(vals['message_uid'], action_name)
+            sync_request_id = inserted[vals['message_uid']]
             
-            _logger.info(f"✅ Created sync_request ID: {sync_request.id} for action: {action_name}")
+            _logger.info(f"✅ Created sync_request ID: {sync_request_id} for action: {action_name}")
+            self._after_ingest([(action_name, sync_request_id)],
+                               replies=self._reply_info(value, message_info, sync_request_id))
             
-            # � CHỈ TẠO SYNC_REQUEST - không xử lý logic business tại đây
+            # 💡 CHỈ TẠO SYNC_REQUEST - không xử lý logic business tại đây
             return {
                 'result': 'success',
                 'action': action_name,
                 'message': f'Created sync_request for action: {action_name}',
-                'sync_request_id': sync_request.id
+                'sync_request_id': sync_request_id
             }
                 
         except Exception as e:
             _logger.error(f"❌ Failed to create sync_request: {str(e)}")
-            return {
-                'result': 'error',
-                'reason': f'Failed to create sync_request: {str(e)}',
-                'action': action_name
-            }
+            # ⚠️ Raise để caller rollback savepoint và đưa message vào retry queue
+            raise
+
+    @api.model
+    def _reply_info(self, value, message_info, sync_request_id):
+        """🔗 Thông tin reply (correlation_id) để nối với request đang chờ — [] nếu không phải reply"""
+        correlation_id = value.get('correlation_id')
+        if not correlation_id:
+            return []
+        return [{
+            'correlation_id': correlation_id,
+            'action': value.get('action'),
+            'timestamp': (message_info or {}).get('timestamp'),
+            'sync_request_id': sync_request_id,
+        }]
+
+    @api.model
+    def _after_ingest(self, created, replies=None):
+        """
+        ⚡ Sau khi ingest: nối reply với request đang chờ, đếm theo action
+        + approve ngay các action auto_approve
+        
+        Args:
+            created (list): List tuple (action_name, sync_request_id) vừa được tạo
+            replies (list, optional): Thông tin reply từ _reply_info
+        """
+        if replies:
+            self.env['vnfield.kafka.pending.reply']._resolve_replies(replies)
+        counts = {}
+        auto_approve_ids = []
+        for action_name, sync_request_id in created:
+            counts[action_name] = counts.get(action_name, 0) + 1
+            if kafka_dispatch.is_auto_approve(action_name):
+                auto_approve_ids.append(sync_request_id)
+        for action_name, count in counts.items():
+            kafka_metrics.incr('actions_ingested', count, dbname=self.env.cr.dbname, action=action_name or '')
+        if auto_approve_ids:
+            self.sudo().browse(auto_approve_ids).action_approve()
+
+    @api.model
+    def _duplicate_result(self, message_uid, action_name):
+        """♻️ Kết quả cho message đã được ingest trước đó"""
+        _logger.debug(f"Skipped already ingested message {message_uid}")
+        return {
+            'result': 'message_duplicate',
+            'reason': 'Message already ingested',
+            'message_uid': message_uid,
+            'action': action_name,
+        }
+
+    def message_batch_handler(self, batch):
+        """
+        📦 Xử lý cả batch message: lọc destination rồi tạo tất cả sync_request
+        bằng MỘT câu INSERT ... ON CONFLICT DO NOTHING thay vì một create()
+        cho mỗi message (message deliver lại bị bỏ qua theo message_uid).
+        
+        Args:
+            batch (list): List tuple (headers, value, message_info)
+            
+        Returns:
+            list: Kết quả cho từng message (cùng format với message_handler)
+        """
+        current_system_name = self.env['vnfield.pubsub.service']._get_settings().get(
+            'vnfield.system_name', 'Unknown System'
+        )
+        
+        results = [None] * len(batch)
+        vals_list = []
+        accepted = []  # index trong batch ứng với từng phần tử của vals_list
+        for index, (headers, value, message_info) in enumerate(batch):
+            if not isinstance(value, dict):
+                results[index] = {'result': 'message_ignored', 'reason': 'Message is not a JSON object'}
+                continue
+            ignored = self._check_message_destination(value, current_system_name)
+            if ignored:
+                results[index] = ignored
+                continue
+            # ⚠️ Message lỗi làm batch raise → caller fallback từng message, message lỗi vào retry queue
+            vals_list.append(self._prepare_sync_request_vals(value, headers, message_info))
+            accepted.append(index)
+        
+        if vals_list:
+            # ⚠️ Lỗi ở đây để caller xử lý (rollback savepoint / fallback từng message)
+            inserted = self.env['vnfield.sync.request'].sudo()._insert_sync_requests(vals_list)
+            created = []
+            replies = []
+            for index, vals in zip(accepted, vals_list):
+                _headers, value, message_info = batch[index]
+                action_name = value.get('action')
+                sync_request_id = inserted.get(vals['message_uid'])
+                if not sync_request_id:
+                    results[index] = self._duplicate_result(vals['message_uid'], action_name)
+                    continue
+                created.append((action_name, sync_request_id))
+                replies.extend(self._reply_info(value, message_info, sync_request_id))
+                results[index] = {
+                    'result': 'success',
+                    'action': action_name,
+                    'message': f'Created sync_request for action: {action_name}',
+                    'sync_request_id': sync_request_id
+                }
+            self._after_ingest(created, replies=replies)
+            _logger.info(
+                f"✅ Created {len(inserted)} sync_requests from batch of {len(batch)} messages "
+                f"({len(vals_list) - len(inserted)} duplicates skipped)"
+            )
+        
+        return results
         
         
     # ==========================================
-    # 🔍 OVERRIDE METHODS - GHI ĐÈ PHƯƠNG THỨC
+    # 🧊 RETENTION - ARCHIVE & KHO LẠNH
     # ==========================================
     
+    def init(self):
+        """
+        📇 Index khớp với các query mặc định
+        
+        - List view: active = true ORDER BY create_date desc
+        - Lọc theo người tạo (create_uid) + sắp xếp create_date
+        - Cron retention: request đã xử lý xong theo write_date
+        """
+        tools.create_index(
+            self.env.cr, 'vnfield_sync_request_active_create_date_idx', self._table,
+            ['create_date DESC', 'id DESC'], where='active',
+        )
+        tools.create_index(
+            self.env.cr, 'vnfield_sync_request_create_uid_create_date_idx', self._table,
+            ['create_uid', 'create_date DESC'],
+        )
+        tools.create_index(
+            self.env.cr, 'vnfield_sync_request_retention_idx', self._table,
+            ['active', 'write_date'], where="state IN ('approved', 'rejected')",
+        )
+    
+    @api.model
+    def _get_retention_settings(self):
+        """🔧 Đọc cấu hình retention từ system parameters (0 ngày = tắt bước đó)"""
+        settings = self.env['vnfield.pubsub.service']._get_settings()
+        return {
+            'archive_after_days': settings.get_int('vnfield.sync_request.archive_after_days', 30),
+            'cold_after_days': settings.get_int('vnfield.sync_request.cold_after_days', 90),
+            'chunk_size': settings.get_int('vnfield.sync_request.retention_chunk_size', 1000),
+        }
+    
     @api.model
-    def create(self, vals):
+    def _archive_processed_requests(self, cutoff, limit):
+        """
+        📁 Archive (active = false) một chunk request approved / rejected
+        không thay đổi từ trước cutoff
+        
+        Row đang bị khoá (approve / reject đang chạy) được bỏ qua (SKIP LOCKED).
+        
+        Returns:
+            int: Số request đã archive
+        """
+        self.flush_model()
+        self.env.cr.execute("""
+            UPDATE vnfield_sync_request
+               SET active = false,
+                   write_uid = %(uid)s,
+                   write_date = (now() AT TIME ZONE 'UTC')
+             WHERE id IN (
+                    SELECT id FROM vnfield_sync_request
+                     WHERE active = true
+                       AND state IN ('approved', 'rejected')
+                       AND write_date < %(cutoff)s
+                     ORDER BY write_date, id
+                     LIMIT %(limit)s
+                       FOR UPDATE SKIP LOCKED
+             )
+        """, {'cutoff': cutoff, 'limit': limit, 'uid': self.env.uid})
+        archived = self.env.cr.rowcount
+        if archived:
+            self.invalidate_model(['active', 'write_uid', 'write_date'])
+        return archived
+    
+    @api.model
+    def _cron_apply_retention(self, max_chunks=50):
+        """
+        ⏰ Cron: áp dụng retention theo chunk
+        
+        1. Request approved / rejected quá archive_after_days → active = false
+        2. Request đã archive quá cold_after_days → chuyển sang
+           vnfield.sync.request.archive (xoá khỏi bảng chính)
+        
+        Mỗi chunk được commit riêng: lock chỉ giữ trong một chunk và kết quả
+        được giữ lại nếu chunk sau lỗi.
+        
+        Args:
+            max_chunks (int): Số chunk tối đa cho mỗi bước trong một lần chạy cron
+            
+        Returns:
+            dict: {'archived': int, 'moved': int}
+        """
+        settings = self._get_retention_settings()
+        chunk_size = max(settings['chunk_size'], 1)
+        now = fields.Datetime.now()
+        steps = []
+        if settings['archive_after_days'] > 0:
+            steps.append(('archived', self._archive_processed_requests,
+                          now - timedelta(days=settings['archive_after_days'])))
+        if settings['cold_after_days'] > 0:
+            steps.append(('moved', self.env['vnfield.sync.request.archive']._move_sync_requests,
+                          now - timedelta(days=settings['cold_after_days'])))
+        
+        result = {'archived': 0, 'moved': 0}
+        for key, step, cutoff in steps:
+            for _i in range(max_chunks):
+                count = step(cutoff, chunk_size)
+                self.env.cr.commit()
+                result[key] += count
+                if count < chunk_size:
+                    break
+        
+        if result['archived'] or result['moved']:
+            _logger.info(
+                f"🧊 Sync request retention: {result['archived']} archived, "
+                f"{result['moved']} moved to cold archive"
+            )
+        return result
+    
+    @api.model
+    def action_apply_retention_now(self):
+        """
+        🚀 Yêu cầu cron retention chạy ngay (không chờ lịch)
+        
+        Retention commit theo từng chunk và có thể chạy lâu → chạy trong cron
+        worker, không giữ cursor và HTTP worker của request UI.
+        """
+        self.env.ref('vnfield.cron_sync_request_retention').sudo()._trigger()
+        return {
+            'type': 'ir.actions.client',
+            'tag': 'display_notification',
+            'params': {
+                'title': _('Retention Scheduled'),
+                'message': _('The sync request retention cron will run shortly'),
+                'type': 'info',
+                'sticky': False,
+            }
+        }
+    
+    # ==========================================
+    # 🔍 OVERRIDE METHODS - GHI ĐÈ PHƯƠNG THỨC
+    # ==========================================
+    
+    @api.model_create_multi
+    def create(self, vals_list):
         """Override create để log thông tin"""
-        result = super(SyncRequest, self).create(vals)
-        _logger.info(f"📝 New sync request created: '{result.activity_name}'")
+        result = super(SyncRequest, self).create(vals_list)
+        if len(result) == 1:
+            _logger.info(f"📝 New sync request created: '{result.activity_name}'")
+        else:
+            _logger.info(f"📝 {len(result)} new sync requests created")
         return result
     
     def unlink(self):
@@ -0,0 +1,128 @@
+# -*- coding: utf-8 -*-
+
+# ===========================================
+# =     🧊 SYNC REQUEST COLD ARCHIVE TABLE     =
+# ===========================================
+
+"""
+┌────────────────────────────────────────────┐
+│  🧰 CHỨC NĂNG: KHO LẠNH CHO SYNC REQUEST    │
+│                                            │
+│ - Giữ sync_request đã xử lý xong (approved │
+│   / rejected) sau thời gian retention      │
+│ - Bảng vnfield_sync_request giữ nhỏ → list │
+│   view, record rule, ingest luôn nhanh     │
+│ - Chuyển theo chunk: DELETE ... RETURNING  │
+│   → INSERT trong MỘT câu lệnh, SKIP LOCKED │
+│ - message_uid vẫn được dedupe khi ingest   │
+└────────────────────────────────────────────┘
+
+Dữ liệu chỉ được ghi bằng SQL từ cron retention của vnfield.sync.request
+(_cron_apply_retention); UI chỉ đọc.
+"""
+
+import json
+import logging
+
+from odoo import api, fields, models
+
+_logger = logging.getLogger(__name__)
+
+
+class SyncRequestArchive(models.Model):
+    """
+    🧊 Sync Request Archive
+
+    Mỗi record là một vnfield.sync.request đã được chuyển khỏi bảng chính.
+    Người tạo / thời gian tạo gốc được giữ ở request_create_uid / request_create_date.
+    """
+
+    _name = 'vnfield.sync.request.archive'
+    _description = 'Archived Sync Request'
+    _order = 'request_create_date desc, id desc'
+    _rec_name = 'activity_name'
+
+    # ─────────────────────────────────────────────
+    # ▶ Fields
+    # ─────────────────────────────────────────────
+
+    request_id = fields.Integer(string='Original ID', readonly=True, index=True,
+                                help='ID của vnfield.sync.request trước khi chuyển vào kho lạnh')
+    activity_name = fields.Char(string='Activity Name', readonly=True)
+    description = fields.Text(string='Description', readonly=True)
+    message_payload = fields.Json(string='Message Payload', readonly=True)
+    message_payload_display = fields.Text(string='Message Payload (JSON)',
+                                          compute='_compute_message_payload_display')
+    action = fields.Char(string='Action', readonly=True, index=True)
+    source = fields.Char(string='Source', readonly=True)
+    destination = fields.Char(string='Destination', readonly=True)
+    message_uid = fields.Char(string='Message ID', readonly=True, index=True)
+    state = fields.Selection([
+        ('draft', 'Draft'),
+        ('approved', 'Approved'),
+        ('rejected', 'Rejected'),
+    ], string='Status', readonly=True)
+    request_create_uid = fields.Many2one('res.users', string='Created by', readonly=True,
+                                         ondelete='set null')
+    request_create_date = fields.Datetime(string='Created on', readonly=True, index=True)
+    request_write_date = fields.Datetime(string='Last Updated', readonly=True)
+    archived_at = fields.Datetime(string='Moved to Archive', readonly=True,
+                                  default=fields.Datetime.now)
+
+    @api.depends('message_payload')
+    def _compute_message_payload_display(self):
+        """📦 Payload dạng JSON dễ đọc"""
+        for record in self:
+            record.message_payload_display = json.dumps(
+                record.message_payload, indent=2, ensure_ascii=False, default=str
+            ) if record.message_payload else False
+
+    # ─────────────────────────────────────────────
+    # ▶ Move từ bảng chính
+    # ─────────────────────────────────────────────
+
+    @api.model
+    def _move_sync_requests(self, cutoff, limit):
+        """
+        🧊 Chuyển một chunk sync_request đã archive vào kho lạnh
+
+        Chỉ lấy request approved / rejected, active = false và không thay đổi
+        từ trước cutoff. Row đang bị transaction khác khoá bị bỏ qua (SKIP
+        LOCKED) nên cron không chờ lock của ingest / approve.
+
+        Args:
+            cutoff (datetime): write_date tối đa của request được chuyển
+            limit (int): Số request tối đa trong chunk
+
+        Returns:
+            int: Số request đã chuyển
+        """
+        self.env['vnfield.sync.request'].flush_model()
+        self.env.cr.execute("""
+            WITH moved AS (
+                DELETE FROM vnfield_sync_request
+                 WHERE id IN (
+                        SELECT id FROM vnfield_sync_request
+                         WHERE active = false
+                           AND state IN ('approved', 'rejected')
+                           AND write_date < %(cutoff)s
+                         ORDER BY write_date, id
+                         LIMIT %(limit)s
+                           FOR UPDATE SKIP LOCKED
+                 )
+                RETURNING *
+            )
+            INSERT INTO vnfield_sync_request_archive
+                (request_id, activity_name, description, message_payload, action, source, destination,
+                 message_uid, state, request_create_uid, request_create_date, request_write_date,
+                 archived_at, create_uid, create_date, write_uid, write_date)
+            SELECT id, activity_name, description, message_payload, action, source, destination,
+                   message_uid, state, create_uid, create_date, write_date,
+                   (now() AT TIME ZONE 'UTC'), %(uid)s, (now() AT TIME ZONE 'UTC'),
+                   %(uid)s, (now() AT TIME ZONE 'UTC')
+              FROM moved
+        """, {'cutoff': cutoff, 'limit': limit, 'uid': self.env.uid})
+        moved = self.env.cr.rowcount
+        if moved:
+            self.env['vnfield.sync.request'].invalidate_model()
+        return moved
@@ -0,0 +1,9 @@
+# -*- coding: utf-8 -*-
+
+# ═══════════════════════════════════════════════
+# ═           🧰 SHARED UTILS PACKAGE            ═
+# ═══════════════════════════════════════════════
+
+# 💡 NOTE(assistant): Package chứa các helper thuần Python (không phải Odoo model)
+# dùng chung cho Kafka pipeline. Các module được import trực tiếp khi cần,
+# ví dụ: from ..utils import kafka_producer_pool
@@ -0,0 +1,346 @@
+# -*- coding: utf-8 -*-
+
+# ===========================================
+# =      ⏱️ KAFKA SYNC PIPELINE BENCHMARK     =
+# ===========================================
+
+"""
+┌────────────────────────────────────────────┐
+│  🧰 CHỨC NĂNG: ĐO THROUGHPUT PIPELINE       │
+│                                            │
+│ - Sinh message giả lập: match_capacity_    │
+│   profile / register_user_map / create_user│
+│ - produce_message → consume_messages →     │
+│   message_batch_handler → action_approve   │
+│ - Broker giả lập in-memory (không cần      │
+│   Kafka server)                            │
+│ - Báo cáo msg/s, p50/p95/p99, SQL/message  │
+│ - Rollback toàn bộ khi kết thúc            │
+└────────────────────────────────────────────┘
+
+Chạy qua `odoo-bin vnfield-kafka-bench` (cli/kafka_bench.py). Cấu hình
+benchmark (transport memory, topic riêng, auto commit ...) được ghi bằng
+set_param trong chính transaction của benchmark và bị rollback cùng dữ liệu
+sync_request / project sinh ra, nên database không thay đổi sau khi chạy.
+"""
+
+import logging
+import time
+import uuid
+
+from . import kafka_memory_broker, kafka_transport
+
+_logger = logging.getLogger(__name__)
+
+ACTIONS = ('match_capacity_profile', 'register_user_map', 'create_user')
+
+# 💡 NOTE(assistant): Partition concurrency = 1 vì thread song song mở cursor riêng
+# (tự commit, không thấy cấu hình chưa commit của benchmark)
+BENCH_SETTINGS = {
+    'kafka.transport': kafka_transport.TRANSPORT_MEMORY,
+    'kafka.consumer_auto_commit': 'true',
+    'kafka.consumer_auto_offset_reset': 'earliest',
+    'kafka.consumer_catchup_policy': 'reset',
+    'kafka.consumer_max_no_message_retries': '1',
+    'kafka.consumer_concurrency': '1',
+    'vnfield.kafka.routing_mode': 'shared',
+}
+
+
+def percentile(values, pct):
+    """
+    📐 Percentile (nearest-rank) của list số
+
+    Args:
+        values (list): Giá trị đo được
+        pct (float): 0-100
+
+    Returns:
+        float: Giá trị percentile (0.0 nếu list rỗng)
+    """
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(int(round(pct / 100.0 * len(ordered))) - 1, 0)
+    return ordered[min(rank, len(ordered) - 1)]
+
+
+def make_message(action, destination, payload_size=0, seq=0):
+    """
+    🧪 Sinh một message giả lập cùng format với message thật
+
+    Args:
+        action (str): Một trong ACTIONS
+        destination (str): system_name của site nhận
+        payload_size (int): Số byte padding thêm vào extra (mô phỏng payload lớn)
+        seq (int): Số thứ tự, dùng để sinh id giả
+
+    Returns:
+        dict: Payload message
+    """
+    if action == 'match_capacity_profile':
+        vals = {
+            'requirement_id': seq + 1,
+            'capacity_profile_id': seq + 1,
+            'requirement_title': f'Benchmark requirement {seq}',
+            'task_id': seq + 1,
+        }
+    elif action == 'register_user_map':
+        vals = {'user_id': seq + 1, 'remote_user_id': seq + 1, 'login': f'bench{seq}@example.com'}
+    else:
+        vals = {'name': f'Benchmark User {seq}', 'login': f'bench{seq}@example.com'}
+    return {
+        'message_id': uuid.uuid4().hex,
+        'action': action,
+        'source': 'vnfield-bench',
+        'destination': destination,
+        'vals': vals,
+        'extra': {'padding': 'x' * payload_size} if payload_size else {},
+    }
+
+
+def _stage(count, seconds, latencies, queries):
+    """📊 Số liệu của một giai đoạn"""
+    return {
+        'count': count,
+        'seconds': seconds,
+        'throughput': count / seconds if seconds else 0.0,
+        'p50': percentile(latencies, 50),
+        'p95': percentile(latencies, 95),
+        'p99': percentile(latencies, 99),
+        'queries_per_message': queries / count if count else 0.0,
+    }
+
+
+class KafkaBenchmark(object):
+    """
+    ⏱️ Benchmark pipeline sync trên một environment
+
+    Producer gửi theo tick (tối đa batch_size message mỗi tick, giới hạn theo
+    rate), sau mỗi tick consumer lấy hết message đang chờ qua
+    consume_messages() như cron. Latency ingest là thời gian từ lúc produce
+    đến khi batch handler xử lý xong message.
+
+    Args:
+        env: Environment (cursor sẽ bị rollback khi kết thúc)
+        messages (int): Tổng số message
+        rate (float): Message/giây của producer (0 = nhanh nhất có thể)
+        payload_size (int): Byte padding mỗi message
+        actions (list): Action được sinh luân phiên
+        batch_size (int): Message tối đa mỗi tick / mỗi batch consume
+        approve (bool): Chạy action_approve cho sync_request được tạo
+    """
+
+    def __init__(self, env, messages=1000, rate=0, payload_size=256, actions=ACTIONS,
+                 batch_size=100, approve=True):
+        self.env = env
+        self.messages = messages
+        self.rate = rate
+        self.payload_size = payload_size
+        self.actions = list(actions) or list(ACTIONS)
+        self.batch_size = max(batch_size, 1)
+        self.approve = approve
+        self._sent_at = {}
+        self._produce_latencies = []
+        self._ingest_latencies = []
+        self._approve_latencies = []
+        self._sync_request_ids = []
+
+    # ─────────────────────────────────────────────
+    # ▶ Setup
+    # ─────────────────────────────────────────────
+
+    def _apply_settings(self):
+        """🔧 Ghi cấu hình benchmark (trong transaction, sẽ bị rollback)"""
+        config_param = self.env['ir.config_parameter'].sudo()
+        settings = dict(BENCH_SETTINGS, **{
+            'vnfield.kafka.topic': f'vnfield_bench_{uuid.uuid4().hex[:8]}',
+            'kafka.consumer_batch_size': str(self.batch_size),
+        })
+        for key, value in settings.items():
+            config_param.set_param(key, value)
+        kafka_memory_broker.get_broker().reset()
+
+    def _query_count(self):
+        return self.env.cr.sql_log_count
+
+    # ─────────────────────────────────────────────
+    # ▶ Stages
+    # ─────────────────────────────────────────────
+
+    def _batch_handler(self, batch):
+        """🎯 message_batch_handler + ghi latency produce → xử lý xong"""
+        results = self.env['vnfield.sync.request'].message_batch_handler(batch)
+        now = time.perf_counter()
+        for (_headers, value, _info), result in zip(batch, results):
+            sent_at = self._sent_at.pop(isinstance(value, dict) and value.get('message_id'), None)
+            if sent_at is not None:
+                self._ingest_latencies.append(now - sent_at)
+            if result and result.get('sync_request_id'):
+                self._sync_request_ids.append(result['sync_request_id'])
+        return results
+
+    def _consume_pending(self, pubsub_service, topics, group_id, destination):
+        """📥 Một lần consume_messages() cho các message đã gửi mà chưa xử lý"""
+        pending = len(self._sent_at)
+        if not pending:
+            return
+        pubsub_service.consume_messages(
+            topics, group_id=group_id, timeout=0.05, max_messages=pending,
+            message_handler=self.env['vnfield.sync.request'].message_handler,
+            batch_handler=self._batch_handler,
+            batch_size=self.batch_size,
+            destination_filter=destination,
+            concurrency=1,
+        )
+
+    def _run_pipeline(self, pubsub_service, topics, group_id, destination):
+        """
+        🔁 Produce theo rate + consume sau mỗi tick
+
+        Returns:
+            tuple: (produce seconds, produce queries, ingest seconds, ingest queries)
+        """
+        produce_seconds = ingest_seconds = 0.0
+        produce_queries = ingest_queries = 0
+        started = time.perf_counter()
+        produced = 0
+        # 🧭 Produce vào topic gốc: produce_message tự routing theo destination (topics đã là topic của site)
+        base_topic = pubsub_service._get_settings().get('vnfield.kafka.topic', 'vnfield')
+        while produced < self.messages:
+            due = self.messages
+            if self.rate > 0:
+                due = min(self.messages, int((time.perf_counter() - started) * self.rate) + 1)
+            chunk = min(due - produced, self.batch_size)
+            if chunk <= 0:
+                time.sleep(min(1.0 / self.rate, 0.05))
+                continue
+
+            queries = self._query_count()
+            tick = time.perf_counter()
+            for seq in range(produced, produced + chunk):
+                message = make_message(self.actions[seq % len(self.actions)], destination, self.payload_size, seq)
+                sent_at = time.perf_counter()
+                pubsub_service.produce_message(base_topic, message)
+                self._produce_latencies.append(time.perf_counter() - sent_at)
+                self._sent_at[message['message_id']] = sent_at
+            produce_seconds += time.perf_counter() - tick
+            produce_queries += self._query_count() - queries
+            produced += chunk
+
+            queries = self._query_count()
+            tick = time.perf_counter()
+            self._consume_pending(pubsub_service, topics, group_id, destination)
+            ingest_seconds += time.perf_counter() - tick
+            ingest_queries += self._query_count() - queries
+
+        # 🧹 Xử lý nốt message còn lại
+        for _i in range(3):
+            if not self._sent_at:
+                break
+            queries = self._query_count()
+            tick = time.perf_counter()
+            self._consume_pending(pubsub_service, topics, group_id, destination)
+            ingest_seconds += time.perf_counter() - tick
+            ingest_queries += self._query_count() - queries
+        return produce_seconds, produce_queries, ingest_seconds, ingest_queries
+
+    def _run_approve(self):
+        """
+        ✅ action_approve từng sync_request vừa tạo (còn ở draft)
+
+        Returns:
+            tuple: (seconds, queries)
+        """
+        # Action auto_approve (kafka_dispatch) đã được approve ngay lúc ingest
+        records = self.env['vnfield.sync.request'].sudo().browse(self._sync_request_ids).filtered(
+            lambda record: record.state == 'draft'
+        )
+        queries = self._query_count()
+        started = time.perf_counter()
+        for record in records:
+            tick = time.perf_counter()
+            record.action_approve()
+            record.flush_recordset()
+            self._approve_latencies.append(time.perf_counter() - tick)
+        return time.perf_counter() - started, self._query_count() - queries
+
+    # ─────────────────────────────────────────────
+    # ▶ Entry Point
+    # ─────────────────────────────────────────────
+
+    def run(self):
+        """
+        ▶️ Chạy benchmark rồi rollback transaction
+
+        Returns:
+            dict: Báo cáo (xem format_report)
+        """
+        try:
+            self._apply_settings()
+            sync_request = self.env['vnfield.sync.request']
+            topics, destination = sync_request._get_consumer_subscription()
+            group_id = f'vnfield_bench_{uuid.uuid4().hex[:8]}'
+            pubsub_service = self.env['vnfield.pubsub.service'].create({})
+            _logger.info(f'Kafka benchmark: {self.messages} messages to {topics} (rate={self.rate or "max"})')
+
+            started = time.perf_counter()
+            produce_seconds, produce_queries, ingest_seconds, ingest_queries = self._run_pipeline(
+                pubsub_service, topics, group_id, destination,
+            )
+            approve_seconds, approve_queries = self._run_approve() if self.approve else (0.0, 0)
+            total_seconds = time.perf_counter() - started
+
+            return {
+                'messages': self.messages,
+                'rate': self.rate,
+                'payload_size': self.payload_size,
+                'actions': self.actions,
+                'batch_size': self.batch_size,
+                'lost': len(self._sent_at),
+                'stages': {
+                    'produce': _stage(self.messages, produce_seconds, self._produce_latencies, produce_queries),
+                    'ingest': _stage(len(self._ingest_latencies), ingest_seconds,
+                                     self._ingest_latencies, ingest_queries),
+                    'approve': _stage(len(self._approve_latencies), approve_seconds,
+                                      self._approve_latencies, approve_queries),
+                },
+                'total': {
+                    'seconds': total_seconds,
+                    'throughput': self.messages / total_seconds if total_seconds else 0.0,
+                },
+            }
+        finally:
+            # 🧹 Không để lại dữ liệu / cấu hình benchmark
+            self.env.cr.rollback()
+            self.env.registry.clear_cache()
+            kafka_memory_broker.get_broker().reset()
+
+
+def format_report(report):
+    """
+    📝 Báo cáo dạng bảng text
+
+    Args:
+        report (dict): Kết quả KafkaBenchmark.run()
+
+    Returns:
+        str: Nội dung in ra console
+    """
+    lines = [
+        f"messages={report['messages']} rate={report['rate'] or 'max'}/s "
+        f"payload={report['payload_size']}B batch={report['batch_size']} "
+        f"actions={','.join(report['actions'])}",
+        f"{'stage':<10}{'count':>8}{'msg/s':>12}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'SQL/msg':>10}",
+    ]
+    for name, stage in report['stages'].items():
+        lines.append(
+            f"{name:<10}{stage['count']:>8}{stage['throughput']:>12.1f}"
+            f"{stage['p50'] * 1000:>10.2f}{stage['p95'] * 1000:>10.2f}{stage['p99'] * 1000:>10.2f}"
+            f"{stage['queries_per_message']:>10.2f}"
+        )
+    lines.append(f"{'total':<10}{report['messages']:>8}{report['total']['throughput']:>12.1f}"
+                 f"  ({report['total']['seconds']:.2f}s)")
+    if report['lost']:
+        lines.append(f"⚠️ {report['lost']} messages were produced but not processed")
+    return '\n'.join(lines)
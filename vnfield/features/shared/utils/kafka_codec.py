@@ -0,0 +1,113 @@
+# -*- coding: utf-8 -*-
+
+# ===========================================
+# =        🗜️ KAFKA PAYLOAD CODECS           =
+# ===========================================
+
+"""
+┌────────────────────────────────────────────┐
+│  🧰 CHỨC NĂNG: SERIALIZE / DESERIALIZE      │
+│                                            │
+│ - json    : orjson nếu có, fallback json   │
+│ - msgpack : cần thư viện msgpack           │
+│ - Header content-type cho biết codec để    │
+│   consumer decode đúng                     │
+└────────────────────────────────────────────┘
+
+Message không có header content-type (producer cũ) được coi là JSON.
+Nén (lz4/zstd/...) do librdkafka đảm nhận qua `compression.type`, không
+nằm ở đây.
+"""
+
+import json
+import logging
+
+_logger = logging.getLogger(__name__)
+
+# 💡 NOTE(assistant): Thư viện tuỳ chọn, thiếu thì fallback / báo lỗi rõ ràng
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+CONTENT_TYPE_HEADER = 'content-type'
+
+CODEC_JSON = 'json'
+CODEC_MSGPACK = 'msgpack'
+
+CONTENT_TYPES = {
+    CODEC_JSON: 'application/json',
+    CODEC_MSGPACK: 'application/msgpack',
+}
+CODECS_BY_CONTENT_TYPE = {content_type: codec for codec, content_type in CONTENT_TYPES.items()}
+
+
+def is_available(codec):
+    """✅ Codec có dùng được trong môi trường hiện tại không"""
+    if codec == CODEC_JSON:
+        return True
+    if codec == CODEC_MSGPACK:
+        return msgpack is not None
+    return False
+
+
+def _json_default(value):
+    return str(value)
+
+
+def encode(value, codec=CODEC_JSON):
+    """
+    📦 Serialize payload
+
+    Args:
+        value (dict|list): Payload
+        codec (str): 'json' hoặc 'msgpack'
+
+    Returns:
+        tuple: (bytes payload, str content_type)
+    """
+    if codec == CODEC_MSGPACK:
+        if msgpack is None:
+            raise ValueError('msgpack codec selected but the msgpack library is not installed')
+        return msgpack.packb(value, use_bin_type=True, default=_json_default), CONTENT_TYPES[CODEC_MSGPACK]
+    if codec != CODEC_JSON:
+        raise ValueError(f'Unknown Kafka codec: {codec}')
+    if orjson is not None:
+        return orjson.dumps(value, default=_json_default, option=orjson.OPT_NON_STR_KEYS), CONTENT_TYPES[CODEC_JSON]
+    return json.dumps(value, ensure_ascii=False, default=_json_default).encode('utf-8'), CONTENT_TYPES[CODEC_JSON]
+
+
+def decode(data, content_type=None):
+    """
+    📭 Deserialize payload theo content-type
+
+    Args:
+        data (bytes): Payload thô
+        content_type (str|bytes, optional): Header content-type (None = JSON)
+
+    Returns:
+        any: Giá trị đã decode; string gốc nếu payload JSON không hợp lệ
+    """
+    if not data:
+        return None
+    if isinstance(content_type, bytes):
+        content_type = content_type.decode('utf-8', errors='replace')
+    codec = CODECS_BY_CONTENT_TYPE.get(content_type, CODEC_JSON)
+
+    if codec == CODEC_MSGPACK:
+        if msgpack is None:
+            raise ValueError('Received a msgpack message but the msgpack library is not installed')
+        return msgpack.unpackb(data, raw=False)
+
+    try:
+        if orjson is not None:
+            return orjson.loads(data)
+        return json.loads(data.decode('utf-8'))
+    except (ValueError, UnicodeDecodeError):
+        # Giữ nguyên string nếu không parse được JSON
+        return data.decode('utf-8', errors='replace')
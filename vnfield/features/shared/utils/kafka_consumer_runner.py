@@ -0,0 +1,541 @@
+# -*- coding: utf-8 -*-
+
+# ===========================================
+# =     🏃 PERSISTENT KAFKA CONSUMER RUNNER  =
+# ===========================================
+
+"""
+┌────────────────────────────────────────────┐
+│  🧰 CHỨC NĂNG: LONG-RUNNING CONSUMER        │
+│                                            │
+│ - Giữ một Consumer subscribe liên tục      │
+│   (không join/leave group mỗi phút)        │
+│ - Static membership + cooperative-sticky   │
+│ - Dispatch tới handler hiện có             │
+│ - Chạy như background thread hoặc qua      │
+│   `odoo-bin vnfield-kafka-consumer`        │
+└────────────────────────────────────────────┘
+
+Khác với cron `env["vnfield.sync.request"].consume()` (mỗi lần chạy tạo
+Consumer mới → rebalance), runner giữ kết nối suốt vòng đời và mở một
+cursor ngắn cho mỗi batch message.
+"""
+
+import logging
+import os
+import socket
+import threading
+import time
+
+from odoo import api, fields, SUPERUSER_ID
+from odoo.modules.registry import Registry
+
+from . import kafka_metrics, kafka_partition_pool, kafka_transport
+from ..models.pubsub_service import PubSubService
+
+_logger = logging.getLogger(__name__)
+
+# 💡 NOTE(assistant): System parameter bật/tắt runner (wizard + odoo-bin command dùng chung)
+ENABLED_PARAM = 'vnfield.kafka.consumer_runner_enabled'
+
+# 💡 NOTE(assistant): Tên cron universal consumer (Kafka Consumer Manager tạo cron này)
+CRON_CONSUMER_NAME = 'Kafka Consumer - VNField Universal'
+
+# 💡 NOTE(assistant): 'true' khi enable_runner() đã tắt cron (chỉ khi đó cron mới được bật lại)
+PAUSED_CRON_PARAM = 'vnfield.kafka.consumer_runner_paused_cron'
+
+
+class KafkaConsumerRunner(object):
+    """
+    🏃 Runner giữ một Consumer sống lâu cho một database
+
+    Args:
+        dbname (str): Database cần consume
+        mode (str): 'thread' (background thread) hoặc 'command' (odoo-bin)
+        instance_id (str, optional): group.instance.id (mặc định: vnfield.kafka.consumer_instance_id
+            hoặc '<hostname>-<dbname>-<mode>')
+    """
+
+    def __init__(self, dbname, mode='thread', instance_id=None):
+        self.dbname = dbname
+        self.mode = mode
+        self.instance_id = instance_id
+        self.name = None
+        self.messages_processed = 0
+        self.messages_skipped = 0
+        self._stop_event = threading.Event()
+        self._thread = None
+        self._lanes = None
+
+    # ─────────────────────────────────────────────
+    # ▶ Lifecycle
+    # ─────────────────────────────────────────────
+
+    def start_thread(self):
+        """▶️ Chạy runner trong daemon thread"""
+        self._thread = threading.Thread(
+            target=self.run,
+            name=f'vnfield.kafka.consumer.{self.dbname}',
+            daemon=True,
+        )
+        self._thread.start()
+        return self._thread
+
+    def stop(self):
+        """⏹️ Yêu cầu runner dừng ở vòng poll kế tiếp"""
+        self._stop_event.set()
+
+    def is_alive(self):
+        return bool(self._thread and self._thread.is_alive())
+
+    # ─────────────────────────────────────────────
+    # ▶ Configuration
+    # ─────────────────────────────────────────────
+
+    def _load_settings(self, env):
+        """
+        🔧 Đọc cấu hình runner + consumer config
+
+        Returns:
+            dict: transport, topics, consumer_config, poll_timeout, batch_size, concurrency, heartbeat
+        """
+        settings = env['vnfield.pubsub.service']._get_settings()
+        transport_name = settings.get('kafka.transport', kafka_transport.TRANSPORT_KAFKA)
+        topics, group_id = env['vnfield.sync.request']._get_consumer_subscription()
+
+        instance_id = self.get_instance_name(env)
+
+        consumer_config = env['vnfield.pubsub.service']._get_consumer_config(group_id)
+        consumer_config.update({
+            # 🧷 Static membership: restart cùng instance id không gây rebalance
+            'group.instance.id': instance_id,
+            # 🔄 Cooperative rebalance: chỉ di chuyển partition cần thiết
+            'partition.assignment.strategy': 'cooperative-sticky',
+        })
+
+        return {
+            'name': instance_id,
+            'transport': transport_name,
+            'topics': topics,
+            'group_id': group_id,
+            # group_id là system_name → dùng để pre-filter theo header destination
+            'destination_filter': group_id,
+            # keyed routing → assign partition riêng thay vì subscribe
+            'partition_key': env['vnfield.sync.request']._get_consumer_partition_key(),
+            # ✅ kafka.consumer_auto_commit = false → commit offset sau DB commit
+            'manual_commit': PubSubService._is_manual_commit(consumer_config),
+            'consumer_config': consumer_config,
+            'poll_timeout': settings.get_float('vnfield.kafka.consumer_runner_poll_timeout', 1.0),
+            'batch_size': settings.get_int('kafka.consumer_batch_size', 100),
+            'concurrency': env['vnfield.pubsub.service']._get_partition_concurrency(),
+            'heartbeat': settings.get_int('vnfield.kafka.consumer_runner_heartbeat', 10),
+        }
+
+    def get_instance_name(self, env):
+        """🧷 group.instance.id của runner (cũng là name trong vnfield.kafka.consumer.status)"""
+        return self.instance_id or \
+            env['vnfield.pubsub.service']._get_settings().get('vnfield.kafka.consumer_instance_id') or \
+            f'{socket.gethostname()}-{self.dbname}-{self.mode}'
+
+    def _is_enabled(self, env):
+        return env['vnfield.pubsub.service']._get_settings().get_bool(ENABLED_PARAM)
+
+    # ─────────────────────────────────────────────
+    # ▶ Main Loop
+    # ─────────────────────────────────────────────
+
+    def run(self):
+        """
+        🔁 Vòng lặp chính: poll → dispatch → commit → heartbeat
+
+        Dừng khi stop() được gọi hoặc system parameter
+        vnfield.kafka.consumer_runner_enabled khác 'true'.
+        """
+        threading.current_thread().dbname = self.dbname
+        registry = Registry(self.dbname)
+        with registry.cursor() as cr:
+            env = api.Environment(cr, SUPERUSER_ID, {})
+            settings = self._load_settings(env)
+            duplicate = find_live_runner(env, settings['name'])
+        self.name = settings['name']
+        if duplicate:
+            # 🧷 Hai consumer cùng group.instance.id → broker fence lẫn nhau liên tục
+            _logger.error(
+                f"Kafka consumer runner '{self.name}' is already running on {duplicate.hostname} "
+                f"(pid {duplicate.pid}), not started. Use a different instance id "
+                f"(--instance-id or vnfield.kafka.consumer_instance_id)"
+            )
+            return
+        if not kafka_transport.is_available(settings['transport']):
+            _logger.error(
+                f"Kafka transport '{settings['transport']}' is not available "
+                f"(confluent_kafka not installed?), consumer runner not started"
+            )
+            return
+
+        consumer = kafka_transport.get_transport(settings['transport']).Consumer(settings['consumer_config'])
+        with registry.cursor() as cr:
+            env = api.Environment(cr, SUPERUSER_ID, {})
+            env['vnfield.pubsub.service']._attach_consumer(
+                consumer, settings['topics'], settings['partition_key'],
+                offset_loader=self._make_offset_loader(settings) if settings['manual_commit'] else None,
+                checkpoint_loader=self._make_checkpoint_loader(),
+            )
+            # 🚦 Giữ trạng thái lane suốt vòng đời consumer (pause bulk khi interactive bận)
+            self._lanes = env['vnfield.pubsub.service']._make_lane_scheduler()
+        _logger.info(
+            f"Kafka consumer runner '{self.name}' subscribed to {settings['topics']} "
+            f"with group {settings['group_id']}"
+        )
+        self._report(registry, settings, {
+            'state': 'running',
+            'started_at': fields.Datetime.now(),
+            'messages_processed': 0,
+            'messages_skipped': 0,
+            'last_error': False,
+        })
+
+        last_heartbeat = time.time()
+        last_processed = 0
+        last_error = False
+        try:
+            while not self._stop_event.is_set():
+                first_offsets = {}
+                try:
+                    messages, offsets, first_offsets = self._poll_batch(consumer, settings)
+                    if messages:
+                        self._dispatch(registry, consumer, settings, messages, offsets)
+                    elif settings['manual_commit']:
+                        # Chỉ có message của system khác → không cần ghi DB
+                        PubSubService._commit_kafka_offsets(consumer, offsets)
+                except Exception as e:
+                    last_error = str(e)
+                    _logger.exception(f"Kafka consumer runner '{self.name}' error: {e}")
+                    if settings['manual_commit'] and first_offsets:
+                        # ⏪ Batch chưa được commit → đọc lại từ đầu batch (at-least-once),
+                        # không để batch sau commit offset cao hơn và bỏ qua batch lỗi
+                        PubSubService._seek_partitions(consumer, first_offsets)
+                    time.sleep(settings['poll_timeout'])
+
+                if time.time() - last_heartbeat >= settings['heartbeat']:
+                    elapsed = time.time() - last_heartbeat
+                    last_heartbeat = time.time()
+                    throughput = (self.messages_processed - last_processed) / elapsed
+                    last_processed = self.messages_processed
+                    registry = registry.check_signaling()
+                    with registry.cursor() as cr:
+                        if not self._is_enabled(api.Environment(cr, SUPERUSER_ID, {})):
+                            _logger.info(f"Kafka consumer runner '{self.name}' disabled by configuration")
+                            break
+                    self._report(registry, settings, dict(
+                        self._collect_lag(consumer),
+                        state='running',
+                        messages_processed=self.messages_processed,
+                        messages_skipped=self.messages_skipped,
+                        throughput=throughput,
+                        last_error=last_error,
+                    ))
+        finally:
+            consumer.close()
+            self._report(registry, settings, {
+                'state': 'stopped',
+                'messages_processed': self.messages_processed,
+                'messages_skipped': self.messages_skipped,
+            })
+            _logger.info(f"Kafka consumer runner '{self.name}' stopped")
+            self._restore_cron_consumer(registry)
+
+    def _restore_cron_consumer(self, registry):
+        """⏯️ Runner cuối cùng dừng (do bị tắt) → bật lại cron consumer mà enable_runner đã tắt"""
+        try:
+            with registry.cursor() as cr:
+                restore_cron_consumer(api.Environment(cr, SUPERUSER_ID, {}))
+        except Exception as e:
+            _logger.warning(f'Could not reactivate the Kafka cron consumer: {e}')
+
+    def _poll_batch(self, consumer, settings):
+        """
+        📥 Lấy tối đa batch_size message bằng một lần consumer.consume()
+
+        Lane interactive / bulk: LaneScheduler quyết định bulk có bị pause ở lượt này không.
+
+        Returns:
+            tuple: (list message cần xử lý, dict {(topic, partition): offset cuối cùng đã đọc},
+                dict {(topic, partition): offset đầu tiên đã đọc} — để seek lại khi dispatch lỗi)
+        """
+        KafkaError = kafka_transport.for_client(consumer).KafkaError
+        messages = []
+        offsets = {}
+        first_offsets = {}
+        skipped = 0
+        if self._lanes:
+            raw_messages = self._lanes.consume(consumer, settings['batch_size'], settings['poll_timeout'])
+        else:
+            raw_messages = consumer.consume(num_messages=settings['batch_size'], timeout=settings['poll_timeout'])
+        for msg in raw_messages:
+            if msg.error():
+                if msg.error().code() == KafkaError._PARTITION_EOF:
+                    continue
+                _logger.error(f'Consumer error: {msg.error()}')
+                continue
+            offsets[(msg.topic(), msg.partition())] = msg.offset()
+            first_offsets.setdefault((msg.topic(), msg.partition()), msg.offset())
+            # 🚦 Message của system khác: bỏ qua từ header, không decode, không mở cursor
+            destination = PubSubService._get_header(msg, 'destination')
+            if destination is not None and destination != settings['destination_filter']:
+                skipped += 1
+                continue
+            messages.append(msg)
+        self.messages_skipped += skipped
+        kafka_metrics.incr('messages_skipped', skipped, dbname=self.dbname)
+        return messages, offsets, first_offsets
+
+    def _dispatch(self, registry, consumer, settings, messages, offsets):
+        """
+        🎯 Dispatch batch message tới batch handler trong một cursor
+
+        Cả batch được tạo bằng một lần create([...]) trong savepoint; nếu lỗi
+        thì fallback xử lý từng message với savepoint riêng để message lỗi
+        không làm mất kết quả của các message khác.
+
+        Manual commit: offset được ghi vào vnfield.kafka.offset trong cùng
+        transaction, và chỉ commit lên Kafka sau khi cursor commit.
+        """
+        if settings['concurrency'] > 1:
+            groups = kafka_partition_pool.group_by_partition(
+                messages, lambda msg: (msg.topic(), msg.partition())
+            )
+            if len(groups) > 1:
+                return self._dispatch_partitions(consumer, settings, groups, offsets)
+        with registry.cursor() as cr:
+            env = api.Environment(cr, SUPERUSER_ID, {})
+            pubsub_service = env['vnfield.pubsub.service']
+            sync_request = env['vnfield.sync.request']
+            # Message không decode được → DLQ trong cùng cursor, không chặn partition
+            batch = pubsub_service._decode_batch(messages)
+            try:
+                if batch:
+                    with cr.savepoint(), kafka_metrics.timer('batch_handler_seconds', dbname=self.dbname):
+                        sync_request.message_batch_handler(batch)
+            except Exception as e:
+                _logger.error(f'Batch handler error for {len(batch)} messages, retrying one by one: {e}')
+                pubsub_service._handle_one_by_one(batch, sync_request.message_handler)
+            if settings['manual_commit']:
+                env['vnfield.kafka.offset']._record_offsets(settings['group_id'], offsets)
+        # Cursor đã commit khi ra khỏi with
+        self.messages_processed += len(batch)
+        kafka_metrics.incr('messages_processed', len(batch), dbname=self.dbname)
+        if settings['manual_commit']:
+            PubSubService._commit_kafka_offsets(consumer, offsets)
+
+    def _dispatch_partitions(self, consumer, settings, groups, offsets):
+        """
+        🧵 Dispatch song song theo partition: mỗi partition một thread + cursor riêng
+
+        Message của một partition vẫn chạy tuần tự trong một thread, và batch
+        kế tiếp chỉ được poll khi mọi partition đã xong → thứ tự được giữ.
+        Offset được commit theo từng partition thành công; partition lỗi được
+        seek lại offset đầu tiên để nhận lại.
+        """
+        worker = PubSubService._make_partition_worker(
+            ('vnfield.sync.request', 'message_batch_handler', 'message_handler'),
+            group_id=settings['group_id'],
+            offsets=offsets if settings['manual_commit'] else None,
+            decode=True,
+        )
+        outcomes = kafka_partition_pool.dispatch(self.dbname, groups, worker, settings['concurrency'])
+
+        committed = {}
+        failed = {}
+        for topic_partition, (ok, _outcome) in outcomes.items():
+            if ok:
+                self.messages_processed += len(groups[topic_partition])
+                kafka_metrics.incr('messages_processed', len(groups[topic_partition]), dbname=self.dbname)
+                committed[topic_partition] = offsets[topic_partition]
+            else:
+                failed[topic_partition] = groups[topic_partition][0].offset()
+        if settings['manual_commit']:
+            # Partition chỉ có message của system khác cũng được commit
+            committed.update({
+                topic_partition: offset for topic_partition, offset in offsets.items()
+                if topic_partition not in groups
+            })
+            PubSubService._commit_kafka_offsets(consumer, committed)
+        if failed:
+            PubSubService._seek_partitions(consumer, failed)
+
+    def _collect_lag(self, consumer):
+        """
+        📉 Lag theo partition cho heartbeat
+
+        Gauge consumer_lag chỉ được xuất từ database (_get_pipeline_gauges),
+        không đặt gauge in-process để tránh hai series cho cùng partition.
+
+        Returns:
+            dict: vals total_lag / partition_lag cho vnfield.kafka.consumer.status
+        """
+        return PubSubService._collect_lag_vals(consumer)
+
+    def _make_offset_loader(self, settings):
+        """📍 Loader đọc offset đã áp dụng (mở cursor riêng, gọi từ on_assign)"""
+        def offset_loader(topic_partitions):
+            with Registry(self.dbname).cursor() as cr:
+                env = api.Environment(cr, SUPERUSER_ID, {})
+                return env['vnfield.kafka.offset']._get_offsets(settings['group_id'], topic_partitions)
+        return offset_loader
+
+    def _make_checkpoint_loader(self):
+        """📌 Loader đọc checkpoint cho catch-up policy (mở cursor riêng, gọi từ on_assign)"""
+        def checkpoint_loader(topic_partitions):
+            with Registry(self.dbname).cursor() as cr:
+                env = api.Environment(cr, SUPERUSER_ID, {})
+                return env['vnfield.kafka.offset']._get_checkpoints(topic_partitions)
+        return checkpoint_loader
+
+    def _report(self, registry, settings, vals):
+        """💓 Ghi heartbeat vào vnfield.kafka.consumer.status"""
+        try:
+            with registry.cursor() as cr:
+                env = api.Environment(cr, SUPERUSER_ID, {})
+                env['vnfield.kafka.consumer.status']._report(settings['name'], dict(
+                    vals,
+                    hostname=socket.gethostname(),
+                    pid=os.getpid(),
+                    mode=self.mode,
+                    group_id=settings['group_id'],
+                    topics=', '.join(settings['topics']),
+                ))
+                # 📊 Counter / timing của runner → nhìn được từ /vnfield/metrics
+                env['vnfield.kafka.metric.snapshot']._publish()
+        except Exception as e:
+            _logger.warning(f'Could not report Kafka consumer runner status: {e}')
+
+
+def find_live_runner(env, name):
+    """
+    🔍 Runner của process KHÁC còn heartbeat với cùng instance name
+
+    Returns:
+        vnfield.kafka.consumer.status: Record (rỗng nếu không có)
+    """
+    records = env['vnfield.kafka.consumer.status']._get_live_runners().filtered(lambda record: record.name == name)
+    current = (socket.gethostname(), os.getpid())
+    return records.filtered(lambda record: (record.hostname, record.pid) != current)[:1]
+
+
+def enable_runner(env):
+    """
+    ▶️ Bật runner cho database và tắt cron universal consumer
+
+    Runner (cooperative-sticky) và consumer của cron (assignor mặc định) không
+    thể cùng ở một group → cron phải tắt trước khi runner join group.
+    """
+    config_param = env['ir.config_parameter'].sudo()
+    config_param.set_param(ENABLED_PARAM, 'true')
+    cron_jobs = env['ir.cron'].sudo().search([('cron_name', '=', CRON_CONSUMER_NAME), ('active', '=', True)])
+    if cron_jobs:
+        cron_jobs.write({'active': False})
+        # Ghi nhớ: cron do runner tắt → disable_runner() được bật lại
+        config_param.set_param(PAUSED_CRON_PARAM, 'true')
+        _logger.info(f'Deactivated cron consumer {CRON_CONSUMER_NAME} in favour of persistent runner')
+
+
+def disable_runner(env):
+    """
+    ⏹️ Tắt runner cho database, bật lại cron universal consumer khi runner đã dừng
+
+    Runner chỉ thấy flag ở heartbeat kế tiếp; nếu bật cron ngay thì consumer
+    của cron join group trong khi runner vẫn còn (INCONSISTENT_GROUP_PROTOCOL).
+    Cron chỉ được bật ở đây nếu không còn runner nào sống; nếu còn, runner
+    cuối cùng bật lại cron khi dừng (xem KafkaConsumerRunner.run).
+
+    Returns:
+        bool: True nếu cron đã được bật lại ngay
+    """
+    env['ir.config_parameter'].sudo().set_param(ENABLED_PARAM, 'false')
+    return restore_cron_consumer(env)
+
+
+def restore_cron_consumer(env):
+    """
+    ⏯️ Bật lại cron universal consumer nếu enable_runner() đã tắt nó
+
+    Không làm gì khi runner vẫn được bật, cron bị admin tắt từ trước, hoặc
+    còn runner có heartbeat (state running, chưa quá hạn).
+
+    Returns:
+        bool: True nếu cron đã được bật lại
+    """
+    config_param = env['ir.config_parameter'].sudo()
+    if config_param.get_param(ENABLED_PARAM) == 'true' or config_param.get_param(PAUSED_CRON_PARAM) != 'true':
+        return False
+    live_runners = env['vnfield.kafka.consumer.status']._get_live_runners()
+    if live_runners:
+        _logger.info(
+            f"Cron consumer {CRON_CONSUMER_NAME} will be reactivated once runners "
+            f"{', '.join(live_runners.mapped('name'))} stop"
+        )
+        return False
+    cron_jobs = env['ir.cron'].sudo().with_context(active_test=False).search([
+        ('cron_name', '=', CRON_CONSUMER_NAME), ('active', '=', False),
+    ])
+    cron_jobs.write({'active': True})
+    config_param.set_param(PAUSED_CRON_PARAM, 'false')
+    _logger.info(f'Reactivated cron consumer {CRON_CONSUMER_NAME} after stopping persistent runner')
+    return True
+
+
+# ─────────────────────────────────────────────
+# ▶ In-process thread registry
+# ─────────────────────────────────────────────
+
+_lock = threading.Lock()
+_runners = {}
+
+
+def _reset_after_fork():
+    """🍴 Thread không sống qua fork → process con bắt đầu với registry rỗng"""
+    global _lock, _runners
+    _lock = threading.Lock()
+    _runners = {}
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def get_thread_runner(dbname):
+    """🔍 Runner thread đang sống trong process hiện tại (hoặc None)"""
+    runner = _runners.get(dbname)
+    return runner if runner and runner.is_alive() else None
+
+
+def start_thread_runner(dbname):
+    """
+    ▶️ Khởi động runner thread cho database nếu chưa chạy
+
+    Returns:
+        KafkaConsumerRunner: Runner đang chạy
+    """
+    with _lock:
+        runner = get_thread_runner(dbname)
+        if runner is None:
+            runner = KafkaConsumerRunner(dbname, mode='thread')
+            runner.start_thread()
+            _runners[dbname] = runner
+        return runner
+
+
+def stop_thread_runner(dbname):
+    """
+    ⏹️ Dừng runner thread của database (nếu đang chạy trong process này)
+
+    Returns:
+        bool: True nếu có runner được yêu cầu dừng
+    """
+    with _lock:
+        runner = _runners.pop(dbname, None)
+    if runner and runner.is_alive():
+        runner.stop()
+        return True
+    return False
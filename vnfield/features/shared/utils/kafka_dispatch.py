@@ -0,0 +1,130 @@
+# -*- coding: utf-8 -*-
+
+# ===========================================
+# =      🧭 KAFKA ACTION DISPATCH REGISTRY    =
+# ===========================================
+
+"""
+┌────────────────────────────────────────────┐
+│  🧰 CHỨC NĂNG: REGISTRY HANDLER THEO ACTION │
+│                                            │
+│ - Module đăng ký handler cho từng action   │
+│   (model + method), tra cứu O(1)           │
+│ - Một consumer duy nhất (sync_request)     │
+│   ingest mọi message, approve gọi handler  │
+│ - auto_approve: áp dụng ngay khi ingest    │
+│ - Đếm số lần + thời gian theo action       │
+│   (kafka_metrics, label action)            │
+└────────────────────────────────────────────┘
+
+Đăng ký ở cuối file model của module sở hữu handler:
+
+    kafka_dispatch.register('register_user_map', 'res.users',
+                            '_kafka_apply_register_user_map', auto_approve=True)
+
+Handler signature: handler(sync_request, vals, extra) -> str | None
+(chuỗi trả về được ghi thêm vào description của sync_request).
+Batch handler (batch=True): handler(sync_requests) -> {sync_request.id: str}
+— dùng khi handler có thể gom thao tác của nhiều request (vd: một create([...])).
+"""
+
+import logging
+from collections import namedtuple
+
+from . import kafka_metrics
+
+_logger = logging.getLogger(__name__)
+
+ActionHandler = namedtuple('ActionHandler', ['action', 'model', 'method', 'auto_approve', 'batch'])
+
+# 💡 NOTE(assistant): Prefix ghi chú khi handler lỗi (ghi vào description)
+ERROR_PREFIX = '❌ ERROR: '
+
+_handlers = {}
+
+
+def register(action, model, method, auto_approve=False, batch=False):
+    """
+    📝 Đăng ký handler cho một action
+
+    Args:
+        action (str): Tên action trong payload message
+        model (str): Model chứa handler
+        method (str): Tên method, signature: method(sync_request, vals, extra)
+            hoặc method(sync_requests) nếu batch=True
+        auto_approve (bool): Approve sync_request ngay khi ingest (không chờ duyệt tay)
+        batch (bool): Handler nhận cả recordset của action
+
+    Raises:
+        ValueError: Action đã được đăng ký cho handler khác
+    """
+    handler = ActionHandler(action, model, method, auto_approve, batch)
+    existing = _handlers.get(action)
+    if existing is not None and existing != handler:
+        raise ValueError(f'Kafka action {action!r} is already handled by {existing.model}.{existing.method}')
+    _handlers[action] = handler
+
+
+def get_handler(action):
+    """🔍 Handler của action (None nếu chưa đăng ký)"""
+    return _handlers.get(action)
+
+
+def registered_actions():
+    """📋 Danh sách action đã đăng ký"""
+    return sorted(_handlers)
+
+
+def is_auto_approve(action):
+    """⚡ True nếu action được approve ngay khi ingest"""
+    handler = _handlers.get(action)
+    return bool(handler and handler.auto_approve)
+
+
+def _call(env, handler, sync_requests):
+    """🎯 Gọi handler cho recordset (raise nếu lỗi)"""
+    method = getattr(env[handler.model], handler.method)
+    if handler.batch:
+        return method(sync_requests) or {}
+    notes = {}
+    for sync_request in sync_requests:
+        payload = sync_request._load_message_payload()
+        notes[sync_request.id] = method(sync_request, payload.get('vals', {}), payload.get('extra', {}))
+    return notes
+
+
+def dispatch(env, action, sync_requests):
+    """
+    🎯 Gọi handler của action cho các sync_request cùng action
+
+    Cả nhóm chạy trong một savepoint; nếu lỗi thì chạy lại từng record với
+    savepoint riêng để lỗi của một request không làm hỏng cả batch. Model
+    không có trong registry của database (module chưa cài) được coi như
+    action chưa đăng ký.
+
+    Returns:
+        dict: {sync_request.id: ghi chú} (lỗi → ghi chú bắt đầu bằng ERROR_PREFIX)
+    """
+    handler = _handlers.get(action)
+    dbname = env.cr.dbname
+    if handler is None or handler.model not in env:
+        kafka_metrics.incr('actions_unhandled', len(sync_requests), dbname=dbname, action=action or '')
+        _logger.info(f"📝 Approved {len(sync_requests)} '{action}' sync_requests without a registered handler")
+        return {}
+
+    try:
+        with env.cr.savepoint(), kafka_metrics.timer('action_handler_seconds', dbname=dbname, action=action):
+            notes = _call(env, handler, sync_requests)
+        kafka_metrics.incr('actions_dispatched', len(sync_requests), dbname=dbname, action=action)
+        return notes
+    except Exception as e:
+        if len(sync_requests) == 1:
+            kafka_metrics.incr('actions_failed', dbname=dbname, action=action)
+            _logger.error(f"❌ Error during approve processing of sync_request ID: {sync_requests.id}: {e}")
+            return {sync_requests.id: f'{ERROR_PREFIX}{e}'}
+        _logger.warning(f"Batch approve of {len(sync_requests)} '{action}' requests failed, retrying one by one: {e}")
+
+    notes = {}
+    for sync_request in sync_requests:
+        notes.update(dispatch(env, action, sync_request))
+    return notes
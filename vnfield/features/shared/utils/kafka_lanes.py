@@ -0,0 +1,149 @@
+# -*- coding: utf-8 -*-
+
+# ===========================================
+# =     🚦 KAFKA PRIORITY LANES (TOPICS)     =
+# ===========================================
+
+"""
+┌────────────────────────────────────────────┐
+│  🧰 CHỨC NĂNG: TÁCH LUỒNG INTERACTIVE / BULK│
+│                                            │
+│ - interactive: approval, map user, match   │
+│   notification → topic gốc (như trước)     │
+│ - bulk: sync hàng loạt / backfill → topic  │
+│   '<topic><suffix>' (mặc định '.bulk')     │
+│ - Consumer subscribe cả hai lane; khi lane │
+│   interactive có message, bulk bị pause    │
+│   theo lượt có trọng số (weighted turns)   │
+│ - Lane interactive rảnh → bulk chạy full   │
+└────────────────────────────────────────────┘
+
+Suffix được gắn vào topic gốc TRƯỚC khi routing theo destination, nên ở
+topic mode topic bulk là '<prefix>.<destination>.<topic>.bulk' — cùng kết
+quả dù gắn suffix trước hay sau routing.
+
+Pause / resume chỉ xảy ra khi trạng thái lane đổi (không pause/resume mỗi
+vòng poll) vì librdkafka bỏ các message đã fetch của partition bị pause.
+"""
+
+import logging
+
+_logger = logging.getLogger(__name__)
+
+PRIORITY_INTERACTIVE = 'interactive'
+PRIORITY_BULK = 'bulk'
+# 💡 NOTE(assistant): Thứ tự = thứ tự ưu tiên (outbox drain lane đầu trước)
+PRIORITIES = (PRIORITY_INTERACTIVE, PRIORITY_BULK)
+
+DEFAULT_BULK_SUFFIX = '.bulk'
+
+# 💡 NOTE(assistant): Timeout tối đa của lượt chỉ poll lane interactive (giây) —
+# lane hết message thì lượt sau resume bulk ngay, không chờ đủ poll timeout
+INTERACTIVE_TURN_TIMEOUT = 0.1
+
+
+def normalize_priority(priority):
+    """
+    🏷️ Priority hợp lệ (None / không biết → interactive)
+
+    Args:
+        priority (str): 'interactive' | 'bulk' | None
+
+    Returns:
+        str: Một trong PRIORITIES
+    """
+    if priority in PRIORITIES:
+        return priority
+    if priority:
+        _logger.warning(f'Unknown Kafka priority {priority!r}, using {PRIORITY_INTERACTIVE}')
+    return PRIORITY_INTERACTIVE
+
+
+def lane_topic(base_topic, priority, bulk_suffix=DEFAULT_BULK_SUFFIX):
+    """
+    🧭 Topic của lane cho một topic gốc
+
+    Args:
+        base_topic (str): Topic gốc (vnfield.kafka.topic hoặc topic đã routing)
+        priority (str): 'interactive' | 'bulk'
+        bulk_suffix (str): vnfield.kafka.bulk_topic_suffix
+
+    Returns:
+        str: base_topic (interactive) hoặc base_topic + bulk_suffix (bulk)
+    """
+    if normalize_priority(priority) == PRIORITY_BULK and bulk_suffix:
+        return f'{base_topic}{bulk_suffix}'
+    return base_topic
+
+
+def is_bulk_topic(topic, bulk_suffix=DEFAULT_BULK_SUFFIX):
+    """🔍 True nếu topic thuộc lane bulk"""
+    return bool(topic and bulk_suffix and topic.endswith(bulk_suffix))
+
+
+class LaneScheduler(object):
+    """
+    🚦 Chia lượt poll giữa lane interactive và bulk cho MỘT consumer
+
+    Khi vòng poll trước có message interactive (lane đang bận), trong mỗi
+    chu kỳ interactive_weight + bulk_weight lượt, interactive_weight lượt
+    đầu pause partition bulk (chỉ đọc interactive), bulk_weight lượt sau
+    đọc cả hai lane → bulk không bao giờ bị bỏ đói. Lane interactive rảnh
+    → bulk được resume và dùng toàn bộ budget của mỗi lượt.
+
+    Args:
+        bulk_suffix (str): Suffix nhận diện topic bulk
+        interactive_weight (int): Số lượt ưu tiên interactive mỗi chu kỳ
+        bulk_weight (int): Số lượt đọc cả bulk mỗi chu kỳ
+    """
+
+    def __init__(self, bulk_suffix=DEFAULT_BULK_SUFFIX, interactive_weight=4, bulk_weight=1):
+        self.bulk_suffix = bulk_suffix
+        self.interactive_weight = max(int(interactive_weight), 1)
+        self.bulk_weight = max(int(bulk_weight), 1)
+        self.interactive_busy = False
+        self.bulk_paused = False
+        self._turn = 0
+
+    def _set_bulk_paused(self, consumer, bulk_partitions, paused):
+        """⏯️ Pause / resume partition bulk (chỉ khi đổi trạng thái, pause lại sau rebalance)"""
+        if paused:
+            # Pause lại mỗi lượt: partition vừa được assign lại sau rebalance không còn bị pause
+            consumer.pause(bulk_partitions)
+            if not self.bulk_paused:
+                _logger.debug(f'Interactive lane busy, pausing {len(bulk_partitions)} bulk partitions')
+        elif self.bulk_paused:
+            consumer.resume(bulk_partitions)
+            _logger.debug(f'Resumed {len(bulk_partitions)} bulk partitions')
+        self.bulk_paused = paused
+
+    def consume(self, consumer, num_messages, timeout):
+        """
+        📥 consumer.consume() theo lượt ưu tiên của lane
+
+        Args:
+            consumer: Consumer đã subscribe / assign
+            num_messages (int): Budget message của lượt poll
+            timeout (float): Poll timeout (giây)
+
+        Returns:
+            list: Message (cùng format consumer.consume())
+        """
+        bulk_partitions = [tp for tp in consumer.assignment() if is_bulk_topic(tp.topic, self.bulk_suffix)]
+        if not bulk_partitions:
+            return consumer.consume(num_messages=num_messages, timeout=timeout)
+
+        interactive_turn = self._turn < self.interactive_weight
+        self._turn = (self._turn + 1) % (self.interactive_weight + self.bulk_weight)
+        pause_bulk = self.interactive_busy and interactive_turn
+        self._set_bulk_paused(consumer, bulk_partitions, pause_bulk)
+        if pause_bulk:
+            timeout = min(timeout, INTERACTIVE_TURN_TIMEOUT)
+
+        messages = consumer.consume(num_messages=num_messages, timeout=timeout)
+        self.interactive_busy = any(
+            not msg.error() and not is_bulk_topic(msg.topic(), self.bulk_suffix) for msg in messages
+        )
+        if not self.interactive_busy:
+            self._turn = 0
+        return messages
@@ -0,0 +1,579 @@
+# -*- coding: utf-8 -*-
+
+# ===========================================
+# =       🧪 IN-MEMORY KAFKA BROKER          =
+# ===========================================
+
+"""
+┌────────────────────────────────────────────┐
+│  🧰 CHỨC NĂNG: BROKER GIẢ LẬP TRONG PROCESS │
+│                                            │
+│ - Topic nhiều partition, offset tăng dần   │
+│ - Consumer group: chia partition, commit   │
+│   offset, auto.offset.reset                │
+│ - Headers, key, timestamp như Kafka        │
+│ - API con của confluent_kafka (Producer,   │
+│   Consumer, TopicPartition, ...)           │
+└────────────────────────────────────────────┘
+
+Dùng khi kafka.transport = memory: chạy/đo toàn bộ pipeline
+produce → consume → sync_request mà không cần broker thật (CI, laptop).
+Dữ liệu chỉ sống trong process hiện tại: producer và consumer phải chạy
+cùng process (ví dụ `odoo-bin vnfield-kafka-bench` hoặc odoo shell).
+
+Rebalance theo kiểu EAGER: khi member join/leave, partition của cả group
+được chia lại (range theo từng topic) và mỗi consumer nhận on_revoke /
+on_assign ở lần consume() kế tiếp, giống librdkafka.
+"""
+
+import threading
+import time
+import zlib
+
+# 💡 NOTE(assistant): Hằng số trùng giá trị với confluent_kafka
+OFFSET_BEGINNING = -2
+OFFSET_END = -1
+OFFSET_INVALID = -1001
+TIMESTAMP_CREATE_TIME = 1
+
+DEFAULT_PARTITIONS = 3
+
+
+# ─────────────────────────────────────────────
+# ▶ Kiểu dữ liệu tương thích confluent_kafka
+# ─────────────────────────────────────────────
+
+class KafkaError(object):
+    """❌ Mã lỗi (chỉ các hằng số mà pipeline dùng tới)"""
+
+    _PARTITION_EOF = -191
+    UNKNOWN_TOPIC_OR_PART = 3
+
+    def __init__(self, code, reason=''):
+        self._code = code
+        self._reason = reason
+
+    def code(self):
+        return self._code
+
+    def str(self):
+        return self._reason
+
+    def __str__(self):
+        return f'KafkaError({self._code}, {self._reason!r})'
+
+
+class KafkaException(Exception):
+    """❌ Lỗi của broker giả lập"""
+
+
+class TopicPartition(object):
+    """📍 (topic, partition, offset) như confluent_kafka.TopicPartition"""
+
+    __slots__ = ('topic', 'partition', 'offset', 'error')
+
+    def __init__(self, topic, partition=-1, offset=OFFSET_INVALID):
+        self.topic = topic
+        self.partition = partition
+        self.offset = offset
+        self.error = None
+
+    def __eq__(self, other):
+        return (self.topic, self.partition) == (other.topic, other.partition)
+
+    def __hash__(self):
+        return hash((self.topic, self.partition))
+
+    def __repr__(self):
+        return f'TopicPartition{{topic={self.topic},partition={self.partition},offset={self.offset}}}'
+
+
+class Message(object):
+    """📨 Message đã lưu trong partition log"""
+
+    __slots__ = ('_topic', '_partition', '_offset', '_key', '_value', '_headers', '_timestamp')
+
+    def __init__(self, topic, partition, offset, key, value, headers, timestamp):
+        self._topic = topic
+        self._partition = partition
+        self._offset = offset
+        self._key = key
+        self._value = value
+        self._headers = headers
+        self._timestamp = timestamp
+
+    def topic(self):
+        return self._topic
+
+    def partition(self):
+        return self._partition
+
+    def offset(self):
+        return self._offset
+
+    def key(self):
+        return self._key
+
+    def value(self):
+        return self._value
+
+    def headers(self):
+        return list(self._headers) if self._headers else None
+
+    def timestamp(self):
+        return TIMESTAMP_CREATE_TIME, self._timestamp
+
+    def error(self):
+        return None
+
+    def __len__(self):
+        return len(self._value or b'')
+
+
+class _PartitionMetadata(object):
+    def __init__(self, partition_id):
+        self.id = partition_id
+        self.leader = 0
+        self.replicas = [0]
+        self.isrs = [0]
+        self.error = None
+
+
+class _TopicMetadata(object):
+    def __init__(self, topic, num_partitions):
+        self.topic = topic
+        self.partitions = {index: _PartitionMetadata(index) for index in range(num_partitions)}
+        self.error = None
+
+
+class _ClusterMetadata(object):
+    def __init__(self, topics):
+        self.cluster_id = 'vnfield-memory'
+        self.controller_id = 0
+        self.brokers = {0: 'memory:0'}
+        self.topics = topics
+        self.orig_broker_name = 'memory:0'
+
+
+# ─────────────────────────────────────────────
+# ▶ Broker
+# ─────────────────────────────────────────────
+
+class MemoryBroker(object):
+    """
+    🗄️ Broker dùng chung cho mọi Producer/Consumer trong process
+
+    Attributes:
+        _logs (dict): {topic: [list Message của từng partition]}
+        _committed (dict): {(group, topic, partition): offset kế tiếp cần đọc}
+        _groups (dict): {group: [MemoryConsumer đang là member]}
+    """
+
+    def __init__(self):
+        self._condition = threading.Condition(threading.RLock())
+        self._logs = {}
+        self._committed = {}
+        self._groups = {}
+
+    # ─── ▶ Topics ───
+
+    def _ensure_topic(self, topic, num_partitions=DEFAULT_PARTITIONS):
+        log = self._logs.get(topic)
+        if log is None:
+            log = self._logs[topic] = [[] for _i in range(max(1, num_partitions))]
+        return log
+
+    def create_topic(self, topic, num_partitions=DEFAULT_PARTITIONS):
+        """🆕 Tạo topic với số partition chỉ định (không đổi nếu đã tồn tại)"""
+        with self._condition:
+            return len(self._ensure_topic(topic, num_partitions))
+
+    def metadata(self, topic=None, num_partitions=DEFAULT_PARTITIONS):
+        """📊 Metadata kiểu ClusterMetadata (topic được tạo nếu chưa có)"""
+        with self._condition:
+            if topic is not None:
+                self._ensure_topic(topic, num_partitions)
+                names = [topic]
+            else:
+                names = list(self._logs)
+            return _ClusterMetadata({
+                name: _TopicMetadata(name, len(self._logs[name])) for name in names
+            })
+
+    def watermarks(self, topic, partition):
+        """🌊 (low, high) watermark của partition"""
+        with self._condition:
+            log = self._ensure_topic(topic)
+            return 0, len(log[partition])
+
+    def offset_for_time(self, topic, partition, timestamp):
+        """⏱️ Offset đầu tiên có timestamp >= timestamp (ms), OFFSET_END nếu không có"""
+        with self._condition:
+            for message in self._ensure_topic(topic)[partition]:
+                if message.timestamp()[1] >= timestamp:
+                    return message.offset()
+            return OFFSET_END
+
+    # ─── ▶ Produce / Fetch ───
+
+    def append(self, topic, key, value, headers, partition=None, num_partitions=DEFAULT_PARTITIONS):
+        """
+        ➕ Ghi message vào partition log
+
+        Partition: chỉ định → dùng; có key → crc32(key) % n; không → round-robin.
+
+        Returns:
+            Message: Message đã ghi (có offset)
+        """
+        with self._condition:
+            log = self._ensure_topic(topic, num_partitions)
+            if partition is None or partition < 0:
+                if key is not None:
+                    partition = zlib.crc32(key) % len(log)
+                else:
+                    partition = sum(len(entries) for entries in log) % len(log)
+            if partition >= len(log):
+                raise KafkaException(KafkaError(KafkaError.UNKNOWN_TOPIC_OR_PART, f'{topic}[{partition}]'))
+            entries = log[partition]
+            message = Message(topic, partition, len(entries), key, value, headers, int(time.time() * 1000))
+            entries.append(message)
+            self._condition.notify_all()
+            return message
+
+    def fetch(self, positions, max_messages):
+        """
+        📥 Đọc tối đa max_messages từ các vị trí, lần lượt từng partition
+
+        Args:
+            positions (dict): {(topic, partition): offset kế tiếp} (được cập nhật tại chỗ)
+            max_messages (int): Số message tối đa
+
+        Returns:
+            list: Message theo thứ tự offset trong mỗi partition
+        """
+        with self._condition:
+            messages = []
+            pending = [tp for tp in positions]
+            while pending and len(messages) < max_messages:
+                still_pending = []
+                for topic, partition in pending:
+                    entries = self._ensure_topic(topic)[partition]
+                    offset = positions[(topic, partition)]
+                    if offset < len(entries):
+                        messages.append(entries[offset])
+                        positions[(topic, partition)] = offset + 1
+                        if len(messages) >= max_messages:
+                            break
+                        still_pending.append((topic, partition))
+                pending = still_pending
+            return messages
+
+    def wait(self, timeout):
+        """⏳ Chờ message mới (hoặc rebalance) tối đa timeout giây"""
+        with self._condition:
+            self._condition.wait(timeout)
+
+    # ─── ▶ Consumer Groups ───
+
+    def commit(self, group_id, offsets):
+        """✅ Lưu committed offset {(topic, partition): offset kế tiếp}"""
+        with self._condition:
+            for (topic, partition), offset in offsets.items():
+                self._committed[(group_id, topic, partition)] = offset
+
+    def committed(self, group_id, topic, partition):
+        """🔍 Committed offset (OFFSET_INVALID nếu chưa commit)"""
+        return self._committed.get((group_id, topic, partition), OFFSET_INVALID)
+
+    def join(self, consumer):
+        """👋 Consumer join group → chia lại partition"""
+        with self._condition:
+            members = self._groups.setdefault(consumer.group_id, [])
+            if consumer not in members:
+                members.append(consumer)
+            self._rebalance(consumer.group_id)
+
+    def leave(self, consumer):
+        """🚪 Consumer rời group → chia lại partition cho các member còn lại"""
+        with self._condition:
+            members = self._groups.get(consumer.group_id, [])
+            if consumer in members:
+                members.remove(consumer)
+                self._rebalance(consumer.group_id)
+
+    def _rebalance(self, group_id):
+        """🔄 Range assignment theo từng topic cho các member đang subscribe"""
+        members = self._groups.get(group_id, [])
+        assignments = {member: [] for member in members}
+        topics = sorted({topic for member in members for topic in member.subscription})
+        for topic in topics:
+            subscribers = [member for member in members if topic in member.subscription]
+            num_partitions = len(self._ensure_topic(topic))
+            for partition in range(num_partitions):
+                owner = subscribers[partition * len(subscribers) // num_partitions]
+                assignments[owner].append(TopicPartition(topic, partition))
+        for member, partitions in assignments.items():
+            member._pending_assignment = partitions
+        self._condition.notify_all()
+
+    def reset(self):
+        """🧹 Xoá toàn bộ topic, offset và group (dùng giữa các lần benchmark)"""
+        with self._condition:
+            self._logs.clear()
+            self._committed.clear()
+            self._groups.clear()
+
+
+_broker = MemoryBroker()
+
+
+def get_broker():
+    """🗄️ Broker của process hiện tại"""
+    return _broker
+
+
+def _num_partitions(config):
+    return int(config.get('num.partitions', DEFAULT_PARTITIONS))
+
+
+# ─────────────────────────────────────────────
+# ▶ Producer
+# ─────────────────────────────────────────────
+
+class Producer(object):
+    """
+    📤 Producer ghi thẳng vào MemoryBroker
+
+    Delivery callback được gọi ở poll()/flush() như librdkafka.
+    """
+
+    def __init__(self, config):
+        self._config = dict(config)
+        self._num_partitions = _num_partitions(config)
+        self._lock = threading.Lock()
+        self._callbacks = []
+
+    def produce(self, topic, value=None, key=None, partition=-1, callback=None, on_delivery=None,
+                timestamp=0, headers=None):
+        if isinstance(value, str):
+            value = value.encode('utf-8')
+        if isinstance(key, str):
+            key = key.encode('utf-8')
+        if isinstance(headers, dict):
+            headers = list(headers.items())
+        headers = [
+            (name, header.encode('utf-8') if isinstance(header, str) else header)
+            for name, header in headers or ()
+        ]
+        message = _broker.append(topic, key, value, headers, partition, self._num_partitions)
+        callback = callback or on_delivery
+        if callback is not None:
+            with self._lock:
+                self._callbacks.append((callback, message))
+
+    def poll(self, timeout=None):
+        """📬 Phục vụ delivery callbacks; trả về số callback đã gọi"""
+        with self._lock:
+            callbacks, self._callbacks = self._callbacks, []
+        for callback, message in callbacks:
+            callback(None, message)
+        return len(callbacks)
+
+    def flush(self, timeout=None):
+        """⏳ Mọi message đã nằm trong broker → chỉ cần phục vụ callbacks"""
+        self.poll(0)
+        return 0
+
+    def list_topics(self, topic=None, timeout=-1):
+        return _broker.metadata(topic, self._num_partitions)
+
+    def __len__(self):
+        return len(self._callbacks)
+
+
+# ─────────────────────────────────────────────
+# ▶ Consumer
+# ─────────────────────────────────────────────
+
+class Consumer(object):
+    """
+    📥 Consumer thuộc một group của MemoryBroker
+
+    Hỗ trợ subscribe (group rebalance) hoặc assign thủ công, commit
+    sync/async, committed(), seek(), pause/resume, watermark và auto commit.
+    """
+
+    def __init__(self, config):
+        self._config = dict(config)
+        self.group_id = config.get('group.id')
+        self._num_partitions = _num_partitions(config)
+        self._auto_commit = str(config.get('enable.auto.commit', True)).lower() != 'false'
+        self._offset_reset = config.get('auto.offset.reset', 'latest')
+        self.subscription = []
+        self._on_assign = None
+        self._on_revoke = None
+        self._positions = {}
+        self._paused = set()
+        self._pending_assignment = None
+        self._closed = False
+
+    # ─── ▶ Subscription / Assignment ───
+
+    def subscribe(self, topics, on_assign=None, on_revoke=None, on_lost=None):
+        for topic in topics:
+            _broker.create_topic(topic, self._num_partitions)
+        self.subscription = list(topics)
+        self._on_assign = on_assign
+        self._on_revoke = on_revoke
+        _broker.join(self)
+
+    def unsubscribe(self):
+        self.subscription = []
+        _broker.leave(self)
+        self._positions = {}
+
+    def rebalance_protocol(self):
+        return 'EAGER'
+
+    def assign(self, partitions):
+        self._positions = {}
+        self._paused = set()
+        self.incremental_assign(partitions)
+
+    def incremental_assign(self, partitions):
+        for tp in partitions:
+            self._positions[(tp.topic, tp.partition)] = self._start_offset(tp)
+
+    def incremental_unassign(self, partitions):
+        for tp in partitions:
+            self._positions.pop((tp.topic, tp.partition), None)
+            self._paused.discard((tp.topic, tp.partition))
+
+    def unassign(self):
+        self._positions = {}
+        self._paused = set()
+
+    def assignment(self):
+        return [TopicPartition(topic, partition) for topic, partition in self._positions]
+
+    def _start_offset(self, tp):
+        """📍 Offset bắt đầu: chỉ định → committed → auto.offset.reset"""
+        if tp.offset >= 0:
+            return tp.offset
+        if tp.offset == OFFSET_BEGINNING:
+            return 0
+        low, high = _broker.watermarks(tp.topic, tp.partition)
+        if tp.offset == OFFSET_END:
+            return high
+        committed = _broker.committed(self.group_id, tp.topic, tp.partition)
+        if committed >= 0:
+            return committed
+        return low if self._offset_reset in ('earliest', 'smallest', 'beginning') else high
+
+    def _serve_rebalance(self):
+        """🔄 Áp dụng assignment mới của group (gọi on_revoke / on_assign)"""
+        partitions, self._pending_assignment = self._pending_assignment, None
+        if partitions is None:
+            return
+        if self._positions:
+            if self._auto_commit:
+                self._commit_positions()
+            if self._on_revoke:
+                self._on_revoke(self, self.assignment())
+        self._positions = {}
+        self._paused = set()
+        if self._on_assign:
+            self._on_assign(self, partitions)
+        else:
+            self.assign(partitions)
+
+    def pause(self, partitions):
+        """⏸️ Ngừng trả message của các partition (vị trí được giữ nguyên)"""
+        self._paused.update((tp.topic, tp.partition) for tp in partitions)
+
+    def resume(self, partitions):
+        """▶️ Tiếp tục trả message của các partition đã pause"""
+        self._paused.difference_update((tp.topic, tp.partition) for tp in partitions)
+
+    # ─── ▶ Consume ───
+
+    def consume(self, num_messages=1, timeout=-1):
+        if self._closed:
+            raise RuntimeError('Consumer closed')
+        if self._auto_commit:
+            # Giống auto commit của librdkafka: commit vị trí đã trả về trước đó
+            self._commit_positions()
+        deadline = time.time() + (timeout if timeout is not None and timeout >= 0 else 3600)
+        while True:
+            self._serve_rebalance()
+            active = {tp: offset for tp, offset in self._positions.items() if tp not in self._paused}
+            messages = _broker.fetch(active, num_messages)
+            self._positions.update(active)
+            if messages:
+                return messages
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                return []
+            _broker.wait(min(remaining, 0.1))
+
+    def poll(self, timeout=None):
+        messages = self.consume(1, timeout if timeout is not None else -1)
+        return messages[0] if messages else None
+
+    # ─── ▶ Offsets ───
+
+    def _commit_positions(self):
+        if self.group_id and self._positions:
+            _broker.commit(self.group_id, dict(self._positions))
+
+    def commit(self, message=None, offsets=None, asynchronous=True):
+        if message is not None:
+            commit_offsets = {(message.topic(), message.partition()): message.offset() + 1}
+        elif offsets is not None:
+            commit_offsets = {(tp.topic, tp.partition): tp.offset for tp in offsets}
+        else:
+            commit_offsets = dict(self._positions)
+        _broker.commit(self.group_id, commit_offsets)
+        if asynchronous:
+            return None
+        return [TopicPartition(topic, partition, offset) for (topic, partition), offset in commit_offsets.items()]
+
+    def committed(self, partitions, timeout=None):
+        return [
+            TopicPartition(tp.topic, tp.partition, _broker.committed(self.group_id, tp.topic, tp.partition))
+            for tp in partitions
+        ]
+
+    def position(self, partitions):
+        return [
+            TopicPartition(tp.topic, tp.partition, self._positions.get((tp.topic, tp.partition), OFFSET_INVALID))
+            for tp in partitions
+        ]
+
+    def seek(self, partition):
+        key = (partition.topic, partition.partition)
+        if key not in self._positions:
+            raise KafkaException(KafkaError(KafkaError.UNKNOWN_TOPIC_OR_PART, 'Partition not assigned'))
+        self._positions[key] = self._start_offset(partition)
+
+    def offsets_for_times(self, partitions, timeout=None):
+        """⏱️ TopicPartition.offset = timestamp (ms) → offset đầu tiên từ thời điểm đó"""
+        return [
+            TopicPartition(tp.topic, tp.partition, _broker.offset_for_time(tp.topic, tp.partition, tp.offset))
+            for tp in partitions
+        ]
+
+    def get_watermark_offsets(self, partition, timeout=None, cached=False):
+        return _broker.watermarks(partition.topic, partition.partition)
+
+    def list_topics(self, topic=None, timeout=-1):
+        return _broker.metadata(topic, self._num_partitions)
+
+    def close(self):
+        if self._closed:
+            return
+        if self._auto_commit:
+            self._commit_positions()
+        if self.subscription:
+            _broker.leave(self)
+        self._closed = True
@@ -0,0 +1,359 @@
+# -*- coding: utf-8 -*-
+
+# ===========================================
+# =         📊 KAFKA PIPELINE METRICS        =
+# ===========================================
+
+"""
+┌────────────────────────────────────────────┐
+│  🧰 CHỨC NĂNG: IN-PROCESS METRICS           │
+│                                            │
+│ - Counter: message skipped / processed ... │
+│ - Timing : decode / handler (count + sum)  │
+│ - Histogram: phân bố latency theo bucket   │
+│ - Gauge  : giá trị tức thời                │
+│ - Rate   : message/giây trong cửa sổ 60s   │
+│ - Export dạng Prometheus text              │
+│ - Thread-safe, không chạm database         │
+│ - Reset sau fork (mỗi worker đếm riêng)    │
+└────────────────────────────────────────────┘
+
+Metric được định danh bởi tên + labels (ví dụ dbname). Số liệu cần nhìn
+xuyên process (lag của runner, độ sâu outbox) được đọc từ database ở
+vnfield.kafka.consumer.status._get_pipeline_status(). Counter / timing /
+histogram của từng process (cron worker, runner, thread sender) được ghi
+định kỳ vào vnfield.kafka.metric.snapshot và gộp bằng merge_snapshots()
+trước khi export.
+"""
+
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+# 💡 NOTE(assistant): Cửa sổ tính rate (giây)
+RATE_WINDOW = 60
+
+# 💡 NOTE(assistant): Bucket mặc định (giây) cho histogram latency cross-site
+LATENCY_BUCKETS = (0.1, 0.5, 1, 2.5, 5, 10, 30, 60, 300, 900, 3600)
+
+_lock = threading.Lock()
+_counters = {}
+_timings = {}
+_histograms = {}
+_gauges = {}
+_recent = {}
+_started_at = time.time()
+
+
+def _key(name, labels):
+    return name, tuple(sorted(labels.items()))
+
+
+def incr(name, amount=1, **labels):
+    """
+    ➕ Tăng counter
+
+    Args:
+        name (str): Tên counter, ví dụ 'messages_skipped'
+        amount (int): Giá trị cộng thêm
+        **labels: Labels phân biệt counter (ví dụ dbname='prod')
+    """
+    if not amount:
+        return
+    key = _key(name, labels)
+    second = int(time.time())
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + amount
+        # 🪣 Bucket theo giây cho rate()
+        buckets = _recent.setdefault(key, deque())
+        if buckets and buckets[-1][0] == second:
+            buckets[-1][1] += amount
+        else:
+            buckets.append([second, amount])
+        while buckets and buckets[0][0] <= second - RATE_WINDOW:
+            buckets.popleft()
+
+
+def get(name, **labels):
+    """🔍 Giá trị hiện tại của một counter (0 nếu chưa có)"""
+    return _counters.get(_key(name, labels), 0)
+
+
+def rate(name, **labels):
+    """
+    ⚡ Tốc độ trung bình của counter (đơn vị/giây) trong RATE_WINDOW giây gần nhất
+
+    Returns:
+        float: Rate; process mới chạy thì chia cho thời gian đã chạy
+    """
+    now = time.time()
+    window = min(RATE_WINDOW, max(now - _started_at, 1))
+    with _lock:
+        buckets = list(_recent.get(_key(name, labels), ()))
+    total = sum(amount for second, amount in buckets if second > now - RATE_WINDOW)
+    return total / window
+
+
+def observe(name, seconds, **labels):
+    """
+    ⏱️ Ghi một lần đo thời gian (tích luỹ count, sum, max)
+
+    Args:
+        name (str): Tên timing, ví dụ 'handler_seconds'
+        seconds (float): Thời gian đo được
+    """
+    key = _key(name, labels)
+    with _lock:
+        count, total, maximum = _timings.get(key, (0, 0.0, 0.0))
+        _timings[key] = (count + 1, total + seconds, max(maximum, seconds))
+
+
+def observe_histogram(name, seconds, buckets=LATENCY_BUCKETS, **labels):
+    """
+    📶 Ghi một lần đo vào histogram (bucket cộng dồn kiểu Prometheus)
+
+    Args:
+        name (str): Tên histogram, ví dụ 'reply_roundtrip_seconds'
+        seconds (float): Giá trị đo được
+        buckets (tuple): Cận trên các bucket (tăng dần), chỉ dùng lần đầu cho mỗi key
+    """
+    key = _key(name, labels)
+    with _lock:
+        histogram = _histograms.get(key)
+        if histogram is None:
+            histogram = _histograms[key] = {'buckets': tuple(buckets), 'counts': [0] * len(buckets),
+                                            'count': 0, 'sum': 0.0}
+        for index, bound in enumerate(histogram['buckets']):
+            if seconds <= bound:
+                histogram['counts'][index] += 1
+        histogram['count'] += 1
+        histogram['sum'] += seconds
+
+
+@contextmanager
+def timer(name, **labels):
+    """⏱️ Context manager: observe() thời gian chạy của khối lệnh"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(name, time.perf_counter() - started, **labels)
+
+
+def set_gauge(name, value, **labels):
+    """📌 Đặt giá trị tức thời"""
+    with _lock:
+        _gauges[_key(name, labels)] = value
+
+
+def snapshot():
+    """
+    📸 Chụp toàn bộ counter của process hiện tại
+
+    Returns:
+        list: List tuple (name, dict labels, value)
+    """
+    with _lock:
+        items = list(_counters.items())
+    return [(name, dict(labels), value) for (name, labels), value in sorted(items)]
+
+
+def snapshot_all():
+    """
+    📸 Chụp counter + timing + gauge + histogram của process hiện tại
+
+    Returns:
+        dict: {'counters': [...], 'timings': [...], 'gauges': [...], 'histograms': [...], 'uptime': float}
+    """
+    with _lock:
+        timings = list(_timings.items())
+        gauges = list(_gauges.items())
+        histograms = [
+            (key, dict(value, counts=list(value['counts']))) for key, value in _histograms.items()
+        ]
+    return {
+        'uptime': time.time() - _started_at,
+        'counters': [
+            {'name': name, 'labels': labels, 'value': value, 'rate': rate(name, **labels)}
+            for name, labels, value in snapshot()
+        ],
+        'timings': [
+            {'name': name, 'labels': dict(labels), 'count': count, 'sum': total,
+             'avg': total / count if count else 0.0, 'max': maximum}
+            for (name, labels), (count, total, maximum) in sorted(timings)
+        ],
+        'gauges': [
+            {'name': name, 'labels': dict(labels), 'value': value}
+            for (name, labels), value in sorted(gauges)
+        ],
+        'histograms': [
+            {'name': name, 'labels': dict(labels), 'count': value['count'], 'sum': value['sum'],
+             'buckets': list(zip(value['buckets'], value['counts']))}
+            for (name, labels), value in sorted(histograms, key=lambda item: item[0])
+        ],
+    }
+
+
+def merge_snapshots(snapshots):
+    """
+    🧮 Gộp snapshot_all() của nhiều process thành một
+
+    Counter / timing / histogram cùng tên + labels được cộng dồn (max lấy
+    lớn nhất); gauge lấy giá trị của snapshot đứng sau (truyền theo thứ tự
+    cũ → mới).
+
+    Args:
+        snapshots (list): List tuple (dict process info, dict snapshot_all())
+
+    Returns:
+        dict: Cùng format snapshot_all(), thêm 'processes' (list process info + uptime)
+    """
+    counters, timings, histograms, gauges = {}, {}, {}, {}
+    processes = []
+    for process, data in snapshots:
+        processes.append(dict(process, uptime=data.get('uptime', 0.0)))
+        for item in data.get('counters', ()):
+            key = _key(item['name'], item['labels'])
+            counters[key] = counters.get(key, 0) + item['value']
+        for item in data.get('timings', ()):
+            key = _key(item['name'], item['labels'])
+            count, total, maximum = timings.get(key, (0, 0.0, 0.0))
+            timings[key] = (count + item['count'], total + item['sum'], max(maximum, item['max']))
+        for item in data.get('histograms', ()):
+            key = _key(item['name'], item['labels'])
+            merged = histograms.setdefault(key, {'buckets': {}, 'count': 0, 'sum': 0.0})
+            for bound, count in item['buckets']:
+                merged['buckets'][bound] = merged['buckets'].get(bound, 0) + count
+            merged['count'] += item['count']
+            merged['sum'] += item['sum']
+        for item in data.get('gauges', ()):
+            gauges[_key(item['name'], item['labels'])] = item['value']
+    return {
+        'uptime': max((process['uptime'] for process in processes), default=0.0),
+        'processes': processes,
+        'counters': [
+            {'name': name, 'labels': dict(labels), 'value': value}
+            for (name, labels), value in sorted(counters.items())
+        ],
+        'timings': [
+            {'name': name, 'labels': dict(labels), 'count': count, 'sum': total,
+             'avg': total / count if count else 0.0, 'max': maximum}
+            for (name, labels), (count, total, maximum) in sorted(timings.items())
+        ],
+        'gauges': [
+            {'name': name, 'labels': dict(labels), 'value': value}
+            for (name, labels), value in sorted(gauges.items())
+        ],
+        'histograms': [
+            {'name': name, 'labels': dict(labels), 'count': value['count'], 'sum': value['sum'],
+             'buckets': sorted(value['buckets'].items())}
+            for (name, labels), value in sorted(histograms.items(), key=lambda item: item[0])
+        ],
+    }
+
+
+def reset():
+    """🧹 Xoá toàn bộ metric"""
+    with _lock:
+        _counters.clear()
+        _timings.clear()
+        _histograms.clear()
+        _gauges.clear()
+        _recent.clear()
+
+
+# ─────────────────────────────────────────────
+# ▶ Prometheus text format
+# ─────────────────────────────────────────────
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    parts = []
+    for name, value in sorted(labels.items()):
+        value = str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        parts.append(f'{name}="{value}"')
+    return '{' + ','.join(parts) + '}'
+
+
+def render_prometheus(extra_gauges=None, prefix='vnfield_kafka', data=None):
+    """
+    📈 Xuất metric dạng Prometheus text (version 0.0.4)
+
+    Args:
+        extra_gauges (list, optional): List tuple (name, dict labels, value) bổ sung
+            (ví dụ số liệu đọc từ database)
+        prefix (str): Prefix cho tên metric
+        data (dict, optional): Kết quả merge_snapshots() (mặc định: process hiện tại)
+
+    Returns:
+        str: Nội dung exposition
+    """
+    lines = []
+    data = data or snapshot_all()
+
+    def emit(name, metric_type, samples):
+        lines.append(f'# TYPE {prefix}_{name} {metric_type}')
+        for suffix, labels, value in samples:
+            lines.append(f'{prefix}_{name}{suffix}{_format_labels(labels)} {value}')
+
+    counters = {}
+    for item in data['counters']:
+        counters.setdefault(item['name'], []).append(('', item['labels'], item['value']))
+    for name, samples in sorted(counters.items()):
+        emit(f'{name}_total', 'counter', samples)
+
+    timings = {}
+    for item in data['timings']:
+        timings.setdefault(item['name'], []).extend([
+            ('_count', item['labels'], item['count']),
+            ('_sum', item['labels'], item['sum']),
+        ])
+    for name, samples in sorted(timings.items()):
+        emit(name, 'summary', samples)
+
+    histograms = {}
+    for item in data['histograms']:
+        samples = histograms.setdefault(item['name'], [])
+        for bound, count in item['buckets']:
+            samples.append(('_bucket', dict(item['labels'], le=bound), count))
+        samples.extend([
+            ('_bucket', dict(item['labels'], le='+Inf'), item['count']),
+            ('_count', item['labels'], item['count']),
+            ('_sum', item['labels'], item['sum']),
+        ])
+    for name, samples in sorted(histograms.items()):
+        emit(name, 'histogram', samples)
+
+    gauges = {}
+    for item in data['gauges']:
+        gauges.setdefault(item['name'], []).append(('', item['labels'], item['value']))
+    for name, labels, value in extra_gauges or ():
+        gauges.setdefault(name, []).append(('', labels, value))
+    for name, samples in sorted(gauges.items()):
+        emit(name, 'gauge', samples)
+
+    processes = data.get('processes') or [{'pid': os.getpid(), 'uptime': data['uptime']}]
+    emit('process_uptime_seconds', 'gauge', [
+        ('', {key: value for key, value in process.items() if key != 'uptime'}, process['uptime'])
+        for process in processes
+    ])
+    return '\n'.join(lines) + '\n'
+
+
+def _reset_after_fork():
+    """🍴 Worker con bắt đầu đếm từ 0 (không kế thừa metric của process cha)"""
+    global _lock, _counters, _timings, _histograms, _gauges, _recent, _started_at
+    _lock = threading.Lock()
+    _counters = {}
+    _timings = {}
+    _histograms = {}
+    _gauges = {}
+    _recent = {}
+    _started_at = time.time()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_after_fork)
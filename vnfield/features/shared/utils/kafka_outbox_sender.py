@@ -0,0 +1,155 @@
+# -*- coding: utf-8 -*-
+
+# ===========================================
+# =     🚚 KAFKA OUTBOX POST-COMMIT SENDER    =
+# ===========================================
+
+"""
+┌────────────────────────────────────────────┐
+│  🧰 CHỨC NĂNG: GỬI OUTBOX NGAY SAU COMMIT   │
+│                                            │
+│ - enqueue() đăng ký cr.postcommit: chỉ     │
+│   transaction commit thành công mới gửi    │
+│ - Rollback → Odoo bỏ postcommit → không    │
+│   có gì được gửi                           │
+│ - Thread nền (mỗi process một thread) gửi  │
+│   bằng cursor riêng → request UI không chờ │
+│   broker                                   │
+│ - Queue giới hạn: đầy thì bỏ qua, cron     │
+│   drain gửi sau (không mất message)        │
+└────────────────────────────────────────────┘
+
+Outbox vẫn là nguồn dữ liệu chính: thread chỉ nhận danh sách id đã commit,
+khoá các row còn pending (SKIP LOCKED) rồi publish như cron drain. Message
+nào thread không gửi được (queue đầy, process thoát, broker lỗi) vẫn nằm
+pending và được cron "Kafka Outbox Drain" xử lý.
+"""
+
+import logging
+import os
+import queue
+import threading
+
+from odoo import api, SUPERUSER_ID
+from odoo.modules.registry import Registry
+
+from . import kafka_metrics
+
+_logger = logging.getLogger(__name__)
+
+# 💡 NOTE(assistant): Số transaction tối đa chờ gửi trong một process
+DEFAULT_QUEUE_SIZE = 1000
+
+# 💡 NOTE(assistant): Thời gian tối đa postcommit chờ chỗ trống trong queue (giây) —
+# backpressure nhẹ, sau đó nhường cho cron thay vì chặn request
+PUT_TIMEOUT = 0.05
+
+# 💡 NOTE(assistant): Số id tối đa gom vào một lần publish của thread
+MAX_SEND_BATCH = 500
+
+_lock = threading.Lock()
+_queue = None
+_thread = None
+_owner_pid = os.getpid()
+
+
+def _reset_after_fork():
+    """🍴 Process con không thừa kế thread của cha → tạo queue/thread mới khi cần"""
+    global _lock, _queue, _thread, _owner_pid
+    _lock = threading.Lock()
+    _queue = None
+    _thread = None
+    _owner_pid = os.getpid()
+
+
+def _ensure_started(queue_size):
+    """🚀 Tạo queue + thread sender của process hiện tại (lazy)"""
+    global _queue, _thread
+    if _owner_pid != os.getpid():
+        _reset_after_fork()
+    if _thread is not None and _thread.is_alive():
+        return _queue
+    with _lock:
+        if _thread is None or not _thread.is_alive():
+            if _queue is None:
+                _queue = queue.Queue(maxsize=max(queue_size, 1))
+            _thread = threading.Thread(target=_run, name='vnfield-outbox-sender', daemon=True)
+            _thread.start()
+            _logger.info(f'Started Kafka outbox sender thread (pid={os.getpid()})')
+    return _queue
+
+
+def submit(dbname, outbox_ids, queue_size=DEFAULT_QUEUE_SIZE):
+    """
+    📨 Giao id outbox vừa commit cho thread sender
+
+    Gọi từ cr.postcommit. Không bao giờ raise: queue đầy hoặc lỗi đều chỉ
+    ghi log, cron drain sẽ gửi sau.
+
+    Args:
+        dbname (str): Database chứa các outbox record
+        outbox_ids (list): ID outbox đã commit
+        queue_size (int): Kích thước queue (chỉ dùng khi tạo queue lần đầu)
+
+    Returns:
+        bool: True nếu đã đưa vào queue
+    """
+    if not outbox_ids:
+        return False
+    try:
+        _ensure_started(queue_size).put((dbname, list(outbox_ids)), timeout=PUT_TIMEOUT)
+        return True
+    except queue.Full:
+        kafka_metrics.incr('outbox_sender_overflow', len(outbox_ids), dbname=dbname)
+        _logger.warning(f'Kafka outbox sender queue is full, {len(outbox_ids)} messages left for the drain cron')
+    except Exception as e:
+        _logger.warning(f'Could not hand outbox messages to the sender thread: {e}')
+    return False
+
+
+def pending():
+    """📊 Số transaction đang chờ trong queue của process hiện tại"""
+    if _owner_pid != os.getpid() or _queue is None:
+        return 0
+    return _queue.qsize()
+
+
+def _collect(first):
+    """📦 Gom các item đang chờ thành {dbname: [ids]} (tối đa MAX_SEND_BATCH id mỗi db)"""
+    batches = {}
+    dbname, ids = first
+    batches.setdefault(dbname, []).extend(ids)
+    while sum(len(ids) for ids in batches.values()) < MAX_SEND_BATCH:
+        try:
+            dbname, ids = _queue.get_nowait()
+        except queue.Empty:
+            break
+        batches.setdefault(dbname, []).extend(ids)
+    return batches
+
+
+def _send(dbname, outbox_ids):
+    """🚚 Publish các outbox id bằng cursor riêng (commit khi xong)"""
+    with Registry(dbname).cursor() as cr:
+        env = api.Environment(cr, SUPERUSER_ID, {})
+        env['vnfield.kafka.outbox']._send_committed(outbox_ids)
+
+
+def _run():
+    """🔁 Vòng lặp của thread sender"""
+    while True:
+        item = _queue.get()
+        for dbname, outbox_ids in _collect(item).items():
+            try:
+                _send(dbname, outbox_ids)
+            except Exception as e:
+                # Message vẫn pending trong outbox → cron drain thử lại
+                _logger.warning(f'Kafka outbox sender failed for {len(outbox_ids)} messages on {dbname}: {e}')
+
+
+# ─────────────────────────────────────────────
+# ▶ Process lifecycle hooks
+# ─────────────────────────────────────────────
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_after_fork)
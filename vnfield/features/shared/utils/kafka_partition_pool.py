@@ -0,0 +1,140 @@
+# -*- coding: utf-8 -*-
+
+# ===========================================
+# =    🧵 KAFKA PARTITION-PARALLEL POOL      =
+# ===========================================
+
+"""
+┌────────────────────────────────────────────┐
+│  🧰 CHỨC NĂNG: XỬ LÝ SONG SONG PARTITION    │
+│                                            │
+│ - Chia batch theo (topic, partition)       │
+│ - Mỗi partition = một task, chạy tuần tự   │
+│   trong một thread → giữ thứ tự partition  │
+│ - Mỗi task mở cursor riêng, commit riêng   │
+│ - Thread pool giới hạn, fork-safe          │
+└────────────────────────────────────────────┘
+
+dispatch() chờ mọi partition của batch xong trước khi trả về, nên batch
+kế tiếp của cùng partition không bao giờ chạy chồng lên batch trước.
+Caller commit offset cho partition thành công và seek lại partition lỗi.
+"""
+
+import atexit
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from odoo import api, SUPERUSER_ID
+from odoo.modules.registry import Registry
+
+_logger = logging.getLogger(__name__)
+
+# 💡 NOTE(assistant): Giới hạn trên của kafka.consumer_concurrency
+MAX_CONCURRENCY = 32
+
+_lock = threading.Lock()
+_executors = {}
+_owner_pid = os.getpid()
+
+
+def _reset_after_fork():
+    """🍴 Thread của pool không sống qua fork → process con tạo pool mới"""
+    global _lock, _executors, _owner_pid
+    _lock = threading.Lock()
+    _executors = {}
+    _owner_pid = os.getpid()
+
+
+def _get_executor(max_workers):
+    """🧵 ThreadPoolExecutor dùng chung trong process cho mỗi mức concurrency"""
+    if _owner_pid != os.getpid():
+        _reset_after_fork()
+    with _lock:
+        executor = _executors.get(max_workers)
+        if executor is None:
+            executor = ThreadPoolExecutor(
+                max_workers=max_workers,
+                thread_name_prefix='vnfield.kafka.partition',
+            )
+            _executors[max_workers] = executor
+        return executor
+
+
+def group_by_partition(items, key):
+    """
+    🗂️ Gom item theo partition, giữ nguyên thứ tự trong mỗi partition
+
+    Args:
+        items (list): Message (thô hoặc đã decode)
+        key (callable): key(item) -> (topic, partition)
+
+    Returns:
+        dict: {(topic, partition): [item, ...]} theo thứ tự xuất hiện
+    """
+    groups = {}
+    for item in items:
+        groups.setdefault(key(item), []).append(item)
+    return groups
+
+
+def dispatch(dbname, groups, worker, max_workers, uid=SUPERUSER_ID, context=None):
+    """
+    🚀 Chạy worker cho mỗi partition trên thread pool, mỗi task một cursor
+
+    Args:
+        dbname (str): Database
+        groups (dict): {(topic, partition): [item, ...]}
+        worker (callable): worker(env, topic_partition, items) -> result,
+            chạy trong transaction riêng (commit khi worker trả về)
+        max_workers (int): Số thread tối đa
+        uid (int): User của environment trong worker
+        context (dict, optional): Context của environment trong worker
+
+    Returns:
+        dict: {(topic, partition): (True, result) | (False, exception)}
+    """
+    max_workers = max(1, min(int(max_workers), MAX_CONCURRENCY))
+    executor = _get_executor(max_workers)
+    futures = {
+        topic_partition: executor.submit(_run_partition, dbname, topic_partition, items, worker, uid, context)
+        for topic_partition, items in groups.items()
+    }
+    outcomes = {}
+    for (topic, partition), future in futures.items():
+        try:
+            outcomes[(topic, partition)] = (True, future.result())
+        except Exception as e:
+            _logger.exception(f'Partition worker failed for {topic}[{partition}]: {e}')
+            outcomes[(topic, partition)] = (False, e)
+    return outcomes
+
+
+def _run_partition(dbname, topic_partition, items, worker, uid, context):
+    """🧵 Một task: cursor riêng → worker → commit (rollback nếu lỗi)"""
+    threading.current_thread().dbname = dbname
+    with Registry(dbname).cursor() as cr:
+        env = api.Environment(cr, uid, dict(context or {}))
+        return worker(env, topic_partition, items)
+
+
+def shutdown():
+    """🧹 Dừng các pool của process hiện tại (không chờ task đang chạy)"""
+    if _owner_pid != os.getpid():
+        return
+    with _lock:
+        executors = list(_executors.values())
+        _executors.clear()
+    for executor in executors:
+        executor.shutdown(wait=False)
+
+
+# ─────────────────────────────────────────────
+# ▶ Process lifecycle hooks
+# ─────────────────────────────────────────────
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+atexit.register(shutdown)
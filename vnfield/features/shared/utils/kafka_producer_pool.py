@@ -0,0 +1,164 @@
+# -*- coding: utf-8 -*-
+
+# ===========================================
+# =       🏊 KAFKA PRODUCER POOL             =
+# ===========================================
+
+"""
+┌────────────────────────────────────────────┐
+│  🧰 CHỨC NĂNG: PROCESS-WIDE PRODUCER POOL   │
+│                                            │
+│ - Giữ một Producer sống lâu cho mỗi config │
+│ - An toàn với prefork worker (fork-safe)   │
+│ - Flush + đóng producer khi worker thoát   │
+└────────────────────────────────────────────┘
+
+Mỗi process (worker) giữ một registry riêng, key là config hiệu lực
+(dict từ PubSubService._get_kafka_config + cấu hình producer). Nhờ vậy
+các lần produce liên tiếp dùng lại cùng TCP connection / metadata và
+`linger.ms` / `batch.size` thực sự gom batch giữa các lần gọi.
+"""
+
+import atexit
+import logging
+import os
+import threading
+
+_logger = logging.getLogger(__name__)
+
+# 💡 NOTE(assistant): Timeout flush khi worker thoát (giây)
+SHUTDOWN_FLUSH_TIMEOUT = 10
+
+# 💡 NOTE(assistant): Key phụ trong config phân biệt transport (kafka / memory),
+# không truyền xuống Producer
+TRANSPORT_KEY = '__transport__'
+
+_lock = threading.RLock()
+_producers = {}
+_owner_pid = os.getpid()
+
+
+def _config_key(config):
+    """
+    🔑 Tạo key hashable từ dict config
+
+    Args:
+        config (dict): Cấu hình producer
+
+    Returns:
+        tuple: Key ổn định (đã sort) cho registry
+    """
+    return tuple(sorted((str(k), str(v)) for k, v in config.items()))
+
+
+def client_config(config):
+    """🧹 Config truyền cho Producer (bỏ các key nội bộ của pool)"""
+    return {k: v for k, v in config.items() if k != TRANSPORT_KEY}
+
+
+def _reset_after_fork():
+    """
+    🍴 Reset registry trong process con sau khi fork
+
+    Producer của librdkafka không dùng được qua fork (thread nội bộ không
+    được nhân bản), nên process con phải bỏ các instance thừa kế từ cha
+    mà KHÔNG flush/close chúng.
+    """
+    global _lock, _producers, _owner_pid
+    _lock = threading.RLock()
+    _producers = {}
+    _owner_pid = os.getpid()
+
+
+def _ensure_owner():
+    """✅ Phòng hờ trường hợp fork không đi qua os.register_at_fork"""
+    if _owner_pid != os.getpid():
+        _reset_after_fork()
+
+
+def get_producer(config, factory):
+    """
+    🏊 Lấy (hoặc tạo) Producer dùng chung cho config này
+
+    Args:
+        config (dict): Cấu hình producer hiệu lực
+        factory (callable): Hàm tạo Producer, signature: factory(config) -> Producer
+
+    Returns:
+        Producer: Instance dùng chung trong process hiện tại
+    """
+    _ensure_owner()
+    key = _config_key(config)
+    producer = _producers.get(key)
+    if producer is not None:
+        return producer
+
+    with _lock:
+        producer = _producers.get(key)
+        if producer is None:
+            producer = factory(dict(config))
+            _producers[key] = producer
+            _logger.info(f'Created pooled Kafka producer (pid={os.getpid()}, pool size={len(_producers)})')
+        return producer
+
+
+def discard_producer(config):
+    """
+    🗑️ Loại bỏ producer khỏi pool (ví dụ sau lỗi fatal)
+
+    Args:
+        config (dict): Cấu hình producer đã dùng để tạo instance
+    """
+    _ensure_owner()
+    with _lock:
+        producer = _producers.pop(_config_key(config), None)
+    if producer is not None:
+        _flush_quietly(producer, timeout=0)
+
+
+def shutdown(timeout=SHUTDOWN_FLUSH_TIMEOUT):
+    """
+    🧹 Flush và giải phóng toàn bộ producer của process hiện tại
+
+    Args:
+        timeout (float): Thời gian tối đa chờ flush cho mỗi producer
+
+    Returns:
+        int: Số message chưa được deliver sau khi flush
+    """
+    if _owner_pid != os.getpid():
+        # Process con chưa từng tạo producer riêng → không có gì để flush
+        return 0
+    with _lock:
+        producers = list(_producers.values())
+        _producers.clear()
+    remaining = 0
+    for producer in producers:
+        remaining += _flush_quietly(producer, timeout=timeout)
+    if producers:
+        _logger.info(f'Kafka producer pool shut down (pid={os.getpid()}, undelivered={remaining})')
+    return remaining
+
+
+def pool_size():
+    """📊 Số producer đang sống trong process hiện tại"""
+    _ensure_owner()
+    return len(_producers)
+
+
+def _flush_quietly(producer, timeout):
+    try:
+        return producer.flush(timeout) or 0
+    except Exception as e:
+        _logger.warning(f'Error flushing pooled Kafka producer: {e}')
+        return 0
+
+
+# ─────────────────────────────────────────────
+# ▶ Process lifecycle hooks
+# ─────────────────────────────────────────────
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+atexit.register(shutdown)
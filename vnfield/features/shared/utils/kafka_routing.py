@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+
+# ===========================================
+# =        🧭 KAFKA DESTINATION ROUTING      =
+# ===========================================
+
+"""
+┌────────────────────────────────────────────┐
+│  🧰 CHỨC NĂNG: ROUTING THEO DESTINATION     │
+│                                            │
+│ - shared: một topic chung (như trước)      │
+│ - keyed : key = destination, partition ổn  │
+│           định = crc32(destination) % n    │
+│ - topic : topic riêng mỗi site theo format │
+│           <prefix>.<destination>.<base>    │
+└────────────────────────────────────────────┘
+
+Producer và consumer dùng chung các hàm thuần ở đây để luôn tính ra
+cùng một topic / partition cho một destination.
+"""
+
+import threading
+import time
+import zlib
+
+ROUTING_SHARED = 'shared'
+ROUTING_KEYED = 'keyed'
+ROUTING_TOPIC = 'topic'
+ROUTING_MODES = (ROUTING_SHARED, ROUTING_KEYED, ROUTING_TOPIC)
+
+# 💡 NOTE(assistant): Metadata số partition được cache trong process (giây)
+PARTITION_COUNT_TTL = 300
+
+_lock = threading.Lock()
+_partition_counts = {}
+
+
+def destination_topic(prefix, destination, base_topic):
+    """
+    🏗️ Tên topic riêng của một destination (cùng format KafkaUtil.build_topic_name)
+
+    Args:
+        prefix (str): vnfield.kafka.topic_prefix
+        destination (str): system_name của site đích
+        base_topic (str): Topic gốc (vnfield.kafka.topic)
+
+    Returns:
+        str: '<prefix>.<destination>.<base_topic>'
+    """
+    return f'{prefix}.{destination}.{base_topic}'
+
+
+def partition_for(key, num_partitions):
+    """
+    🎯 Partition ổn định cho một key (không phụ thuộc partitioner của client)
+
+    Args:
+        key (str): Destination
+        num_partitions (int): Số partition của topic
+
+    Returns:
+        int: Partition index
+    """
+    if num_partitions <= 0:
+        raise ValueError('num_partitions must be > 0')
+    return zlib.crc32(key.encode('utf-8')) % num_partitions
+
+
+def get_partition_count(client, topic, timeout=5):
+    """
+    📊 Số partition của topic (đọc metadata từ Producer/Consumer, có cache)
+
+    Args:
+        client: confluent_kafka Producer hoặc Consumer
+        topic (str): Tên topic
+        timeout (float): Timeout request metadata
+
+    Returns:
+        int: Số partition
+    """
+    now = time.time()
+    cached = _partition_counts.get(topic)
+    if cached and cached[1] > now:
+        return cached[0]
+
+    metadata = client.list_topics(topic, timeout=timeout)
+    topic_metadata = metadata.topics.get(topic)
+    if topic_metadata is None or topic_metadata.error is not None or not topic_metadata.partitions:
+        raise ValueError(f'Cannot read partition metadata for topic {topic}')
+    count = len(topic_metadata.partitions)
+    with _lock:
+        _partition_counts[topic] = (count, now + PARTITION_COUNT_TTL)
+    return count
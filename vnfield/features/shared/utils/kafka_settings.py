@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+
+# ===========================================
+# =       ⚡ KAFKA SETTINGS SNAPSHOT         =
+# ===========================================
+
+"""
+┌────────────────────────────────────────────┐
+│  🧰 CHỨC NĂNG: SNAPSHOT CẤU HÌNH BẤT BIẾN   │
+│                                            │
+│ - Toàn bộ kafka.* / vnfield.* parameters   │
+│   đọc bằng MỘT query                       │
+│ - Memoize qua ormcache (mỗi database)      │
+│ - Tự invalidate khi set_param / wizard lưu │
+└────────────────────────────────────────────┘
+
+Snapshot được tạo bởi PubSubService._get_settings(). ir.config_parameter
+gọi registry.clear_cache() mỗi khi create/write/unlink, nên mọi thay đổi
+(set_param, kafka_config_wizard.action_save_configuration, ...) làm
+snapshot được nạp lại ở lần đọc kế tiếp, kể cả trên các worker khác qua
+registry signaling.
+"""
+
+from types import MappingProxyType
+
+# 💡 NOTE(assistant): Các prefix được nạp vào snapshot (pattern LIKE)
+KEY_PATTERNS = ('kafka.%', 'vnfield.%')
+
+
+class KafkaSettings(object):
+    """
+    ⚡ Snapshot bất biến của system parameters cho Kafka pipeline
+
+    Getter có cùng ngữ nghĩa với ir.config_parameter.get_param: giá trị
+    rỗng được thay bằng default.
+    """
+
+    __slots__ = ('_params',)
+
+    def __init__(self, params):
+        object.__setattr__(self, '_params', MappingProxyType(dict(params)))
+
+    def __setattr__(self, name, value):
+        raise AttributeError('KafkaSettings is immutable')
+
+    def __contains__(self, key):
+        return key in self._params
+
+    def __len__(self):
+        return len(self._params)
+
+    def get(self, key, default=False):
+        """🔍 Giá trị string của parameter (default nếu không có / rỗng)"""
+        return self._params.get(key) or default
+
+    def get_int(self, key, default):
+        """🔢 Parameter dạng int"""
+        return int(self.get(key, default))
+
+    def get_float(self, key, default):
+        """🔢 Parameter dạng float"""
+        return float(self.get(key, default))
+
+    def get_bool(self, key, default=False):
+        """✅ Parameter dạng 'true'/'false'"""
+        value = self.get(key)
+        if not value:
+            return default
+        return str(value).lower() == 'true'
@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+
+# ===========================================
+# =        🔌 KAFKA TRANSPORT FACTORY        =
+# ===========================================
+
+"""
+┌────────────────────────────────────────────┐
+│  🧰 CHỨC NĂNG: CHỌN TRANSPORT               │
+│                                            │
+│ - kafka  : confluent_kafka (broker thật)   │
+│ - memory : kafka_memory_broker (in-process)│
+│ - Cùng bộ API: Producer, Consumer,         │
+│   TopicPartition, KafkaException, ...      │
+└────────────────────────────────────────────┘
+
+Transport được chọn bằng system parameter kafka.transport
+(PubSubService._get_transport). Code nhận client có sẵn (runner, commit
+offset, seek) dùng for_client() để lấy đúng TopicPartition / exception.
+"""
+
+from collections import namedtuple
+
+from . import kafka_memory_broker
+
+# 💡 NOTE(assistant): confluent_kafka là tuỳ chọn khi dùng transport memory
+try:
+    import confluent_kafka
+except ImportError:
+    confluent_kafka = None
+
+TRANSPORT_KAFKA = 'kafka'
+TRANSPORT_MEMORY = 'memory'
+TRANSPORTS = (TRANSPORT_KAFKA, TRANSPORT_MEMORY)
+
+Transport = namedtuple('Transport', [
+    'name', 'Producer', 'Consumer', 'TopicPartition', 'KafkaException', 'KafkaError',
+])
+
+MEMORY = Transport(
+    TRANSPORT_MEMORY,
+    kafka_memory_broker.Producer,
+    kafka_memory_broker.Consumer,
+    kafka_memory_broker.TopicPartition,
+    kafka_memory_broker.KafkaException,
+    kafka_memory_broker.KafkaError,
+)
+
+KAFKA = Transport(
+    TRANSPORT_KAFKA,
+    confluent_kafka.Producer,
+    confluent_kafka.Consumer,
+    confluent_kafka.TopicPartition,
+    confluent_kafka.KafkaException,
+    confluent_kafka.KafkaError,
+) if confluent_kafka is not None else None
+
+
+def is_available(name):
+    """✅ Transport có dùng được trong môi trường hiện tại không"""
+    if name == TRANSPORT_MEMORY:
+        return True
+    if name == TRANSPORT_KAFKA:
+        return KAFKA is not None
+    return False
+
+
+def get_transport(name=TRANSPORT_KAFKA):
+    """
+    🔌 Transport theo tên
+
+    Returns:
+        Transport: Bộ class của transport
+
+    Raises:
+        ValueError: Tên transport không hợp lệ
+        ImportError: Chọn kafka nhưng confluent_kafka chưa được cài
+    """
+    if name == TRANSPORT_MEMORY:
+        return MEMORY
+    if name != TRANSPORT_KAFKA:
+        raise ValueError(f'Unknown Kafka transport: {name}')
+    if KAFKA is None:
+        raise ImportError('confluent_kafka library is not installed')
+    return KAFKA
+
+
+def for_client(client):
+    """🔍 Transport của một Producer/Consumer đã tạo"""
+    if isinstance(client, (kafka_memory_broker.Producer, kafka_memory_broker.Consumer)):
+        return MEMORY
+    return get_transport(TRANSPORT_KAFKA)
@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+"""
+Migration: vnfield_sync_request.message_payload text → jsonb,
+tách action / source / destination thành cột riêng (có index)
+"""
+
+import ast
+import json
+
+
+def _to_json_text(text):
+    """
+    Payload cũ → JSON text hợp lệ (None nếu đã là JSON)
+
+    Record cũ lưu str(dict) (repr Python) → parse bằng literal_eval một lần
+    ở đây; payload không parse được được giữ lại dưới key 'raw'.
+    """
+    try:
+        json.loads(text)
+        return None
+    except ValueError:
+        pass
+    try:
+        value = ast.literal_eval(text)
+    except (ValueError, SyntaxError):
+        value = {'raw': text}
+    return json.dumps(value, ensure_ascii=False, default=str)
+
+
+def migrate(cr, version):
+    """Convert message_payload sang jsonb và backfill cột action/source/destination"""
+    if not version:
+        return
+
+    cr.execute("""
+        SELECT data_type
+        FROM information_schema.columns
+        WHERE table_name = 'vnfield_sync_request'
+        AND column_name = 'message_payload'
+    """)
+    row = cr.fetchone()
+    if not row or row[0] == 'jsonb':
+        return
+
+    print("=== Converting sync request payloads to jsonb ===")
+
+    # 1. Payload repr Python → JSON text
+    cr.execute("SELECT id, message_payload FROM vnfield_sync_request WHERE message_payload IS NOT NULL")
+    converted = 0
+    for record_id, text in cr.fetchall():
+        json_text = _to_json_text(text)
+        if json_text is not None:
+            cr.execute(
+                "UPDATE vnfield_sync_request SET message_payload = %s WHERE id = %s",
+                (json_text, record_id),
+            )
+            converted += 1
+    print(f"Converted {converted} legacy payloads to JSON")
+
+    # 2. text → jsonb
+    cr.execute("""
+        ALTER TABLE vnfield_sync_request
+        ALTER COLUMN message_payload TYPE jsonb USING message_payload::jsonb
+    """)
+
+    # 3. Cột action / source / destination (index được Odoo tạo khi update module)
+    cr.execute("""
+        ALTER TABLE vnfield_sync_request
+        ADD COLUMN IF NOT EXISTS action varchar,
+        ADD COLUMN IF NOT EXISTS source varchar,
+        ADD COLUMN IF NOT EXISTS destination varchar
+    """)
+    cr.execute("""
+        UPDATE vnfield_sync_request
+        SET action = message_payload->>'action',
+            source = message_payload->>'source',
+            destination = message_payload->>'destination'
+        WHERE jsonb_typeof(message_payload) = 'object'
+    """)
+    print(f"Backfilled action/source/destination for {cr.rowcount} sync requests")
+    print("=== Sync request payload migration completed ===")